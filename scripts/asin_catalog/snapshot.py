@@ -0,0 +1,347 @@
+import re
+import os
+import sys
+import time
+import hashlib
+import warnings
+import threading
+import datetime
+import pytz
+import pandas as pd
+from dotenv import load_dotenv
+
+sys.path.append(
+    re.search(
+        f'.*{re.escape("market_data_platform")}',
+        __file__,
+    ).group()
+)
+
+warnings.filterwarnings('ignore')
+
+from scripts.utils.minio_pd \
+    import MinioUtils                       # noqa: E402
+from scripts.utils.ggsheet \
+    import GGSheetUtils                     # noqa: E402
+from scripts.utils.config_loader \
+    import load_minio_json                  # noqa: E402
+from scripts.utils.logger \
+    import Logger                           # noqa: E402
+
+# country codes used in the ASIN sheets
+MARKETPLACE = {
+    'US': 'USA',
+    'UK': 'GBR',
+    'IN': 'IND',
+    'MX': 'MEX',
+    'IT': 'ITA',
+    'FR': 'FRA',
+    'ES': 'ESP',
+    'JP': 'JPN',
+    'CA': 'CAN',
+    'DE': 'DEU',
+}
+
+# one build at a time per snapshot in the process,
+# e.g. countries started together by the orchestrator
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+
+
+def _get_build_lock(key: tuple) -> threading.Lock:
+    with _build_locks_lock:
+        return _build_locks.setdefault(key, threading.Lock())
+
+
+class AsinCatalogSnapshot:
+    """
+    Snapshot of the ASIN catalog Google Sheet stored in MinIO,
+    one parquet file per country under a versioned directory
+    and a manifest pointing to the latest version
+    :param minio: MinIO utils to read and write the snapshot
+    :param user_creds: the credentials of the Google Sheet,
+        only needed to build the snapshot
+        defaults to None
+    :param sheet_id: id of the ASIN spreadsheet,
+        only needed to build the snapshot
+        defaults to None
+    :param bucket_name: the bucket of the snapshot
+        defaults to 'lakehouse'
+    :param file_path: the directory of the snapshot
+        defaults to 'bronze/amazon/asin_catalog'
+    :param max_age: seconds a snapshot is used before the sheets
+        are read again, None to never rebuild it
+        defaults to 12 hours
+    """
+
+    def __init__(
+        self,
+        minio: MinioUtils,
+        user_creds: dict = None,
+        sheet_id: str = None,
+        bucket_name: str = 'lakehouse',
+        file_path: str = 'bronze/amazon/asin_catalog',
+        max_age: int = 12 * 3600,
+    ) -> None:
+        self.minio = minio
+        self.user_creds = user_creds
+        self.sheet_id = sheet_id
+        self.bucket_name = bucket_name
+        self.file_path = file_path
+        self.max_age = max_age
+        self.manifest_name = '_manifest'
+        self.logging = Logger()
+
+    def read_sheets(
+        self,
+        sheet_names: list = ['us', 'int'],
+    ) -> pd.DataFrame:
+        """
+        Read every ASIN sheet in one request
+
+        :param sheet_names: worksheets contain the ASINs
+            defaults to ['us', 'int']
+
+        :return: dataframe with columns asin and country
+        """
+
+        dfs = GGSheetUtils(self.user_creds).batch_get(
+            sheet_id=self.sheet_id,
+            ranges=[f'{name}!A:B' for name in sheet_names],
+            columns_first_row=True,
+        )
+        df = pd.concat(
+            [i[['asin', 'country']] for i in dfs],
+            ignore_index=True,
+        )
+        df['asin'] = df['asin'].str.strip()
+        df['country'] = df['country'].str.strip().apply(
+            lambda x: MARKETPLACE.get(x, x)
+        )
+        df = df[
+            (df['asin'] != '') & (df['country'] != '')
+        ].drop_duplicates().sort_values(
+            ['country', 'asin']
+        ).reset_index(drop=True)
+
+        return df
+
+    @staticmethod
+    def gen_version(df: pd.DataFrame) -> str:
+        content = '\n'.join(
+            df['country'] + ',' + df['asin']
+        )
+
+        return hashlib.sha256(
+            content.encode()
+        ).hexdigest()[:16]
+
+    def get_manifest(self) -> dict:
+        """
+        Get the manifest of the latest snapshot
+
+        :return: the manifest
+            otherwise None if no snapshot is built yet
+        """
+
+        if not self.minio.object_exist(
+            bucket_name=self.bucket_name,
+            object_name=f'{self.file_path}/{self.manifest_name}.json',
+        ):
+            return None
+
+        return self.minio.get_data_json(
+            file_path=self.file_path,
+            file_name=self.manifest_name,
+            bucket_name=self.bucket_name,
+        )
+
+    def build(
+        self,
+        sheet_names: list = ['us', 'int'],
+    ) -> str:
+        """
+        Pull the ASIN sheets once and publish a new snapshot
+        if the catalog changed
+
+        :param sheet_names: worksheets contain the ASINs
+            defaults to ['us', 'int']
+
+        :return: version of the latest snapshot
+        """
+
+        df = self.read_sheets(sheet_names)
+        version = self.gen_version(df)
+
+        manifest = self.get_manifest()
+        if manifest and manifest.get('version') == version:
+            self.logging.info(
+                f'ASIN catalog is unchanged, version {version}'
+            )
+            # the snapshot is up to date as of now
+            self.minio.load_data_json(
+                data={
+                    **manifest,
+                    'checked_at': time.time(),
+                },
+                file_path=self.file_path,
+                file_name=self.manifest_name,
+                bucket_name=self.bucket_name,
+            )
+            return version
+
+        countries = dict()
+        for country, country_df in df.groupby('country'):
+            self.minio.load_data(
+                data=country_df[['asin']],
+                file_path=f'{self.file_path}/{version}/country={country}',
+                file_name='asins',
+                bucket_name=self.bucket_name,
+                hide_log=True,
+            )
+            countries[country] = len(country_df)
+
+        # the manifest is written last so that readers
+        # never see a partially written version
+        self.minio.load_data_json(
+            data={
+                'version': version,
+                'created_at': datetime.datetime.now(
+                    pytz.timezone('Asia/Ho_Chi_Minh')
+                ).strftime('%Y-%m-%d %H:%M:%S'),
+                'checked_at': time.time(),
+                'countries': countries,
+            },
+            file_path=self.file_path,
+            file_name=self.manifest_name,
+            bucket_name=self.bucket_name,
+        )
+        self.logging.info(
+            f'Published ASIN catalog version {version}: {countries}'
+        )
+
+        return version
+
+    def is_stale(
+        self,
+        manifest: dict,
+    ) -> bool:
+        """
+        Check whether a snapshot must be rebuilt
+
+        :param manifest: the manifest of the snapshot
+
+        :return: True if there is no snapshot or it is older
+            than the max age
+            otherwise False
+        """
+
+        if not manifest:
+            return True
+        if self.max_age is None:
+            return False
+        # manifests written before checked_at are rebuilt once
+        checked_at = manifest.get('checked_at', 0)
+
+        return time.time() - checked_at > self.max_age
+
+    def refresh(self) -> dict:
+        """
+        Rebuild the snapshot if it is missing or stale, concurrent
+        callers of the process wait for a single build, a failed
+        build falls back to the previous snapshot
+
+        :return: the manifest of the latest snapshot
+        """
+
+        with _get_build_lock((self.bucket_name, self.file_path)):
+            # built by another caller while waiting for the lock
+            manifest = self.get_manifest()
+            if not self.is_stale(manifest):
+                return manifest
+
+            if not (self.user_creds and self.sheet_id):
+                if manifest:
+                    self.logging.warning(
+                        'ASIN catalog snapshot is stale and no sheet '
+                        'credentials are given to rebuild it'
+                    )
+                    return manifest
+                raise ValueError(
+                    'ASIN catalog snapshot does not exist '
+                    'and no sheet credentials are given to build it'
+                )
+
+            try:
+                self.build()
+            except Exception as e:
+                if not manifest:
+                    raise
+                self.logging.warning(
+                    f'CANNOT REBUILD ASIN CATALOG, USE VERSION '
+                    f'{manifest.get("version")}: {e}'
+                )
+                return manifest
+
+            return self.get_manifest()
+
+    def get_asins(
+        self,
+        country: str,
+    ) -> list:
+        """
+        Get the ASINs of a country from the latest snapshot,
+        the snapshot is built first if there is none yet
+        or it is older than the max age
+
+        :param country: country of the ASINs, e.g. 'USA'
+
+        :return: list of ASINs
+        """
+
+        manifest = self.get_manifest()
+        if self.is_stale(manifest):
+            manifest = self.refresh()
+
+        if country not in manifest.get('countries'):
+            return []
+
+        df = self.minio.get_data(
+            file_path=(
+                f'{self.file_path}/{manifest.get("version")}'
+                f'/country={country}'
+            ),
+            file_name='asins',
+            bucket_name=self.bucket_name,
+        )
+
+        return df['asin'].to_list()
+
+
+if __name__ == '__main__':
+    start = time.time()
+
+    load_dotenv(
+        re.search(
+            f'.*{re.escape("market_data_platform")}',
+            __file__,
+        ).group() + '/.env'
+    )
+
+    snapshot = AsinCatalogSnapshot(
+        minio=MinioUtils(
+            endpoint=os.getenv('MINIO_HOST'),
+            access_key=os.getenv('MINIO_ACCESS_KEY'),
+            secret=os.getenv('MINIO_SECRET_KEY'),
+        ),
+        user_creds=load_minio_json(
+            file_path='google_sheet',
+            file_name='iykyk101',
+            bucket_name='credentials',
+        ),
+        sheet_id=os.getenv('ASIN_SHEET_ID'),
+    )
+    snapshot.build()
+
+    end = time.time()
+    print(f'Total time {end - start}')
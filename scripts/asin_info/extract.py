@@ -16,22 +16,26 @@ sys.path.append(
 
 warnings.filterwarnings('ignore')
 
-from scripts.utils.browser_headers \
-    import HEADERS                          # noqa : E402
-from scripts.utils.minio_pd \
-    import MinioUtils                       # noqa: E402
+from scripts.utils.config_loader \
+    import load_minio_json                  # noqa: E402
 from scripts.utils.telegram_alert \
     import send_message                     # noqa: E402
-from scripts.utils.ggsheet \
-    import GGSheetUtils                     # noqa: E402
+from scripts.utils.minio_pd \
+    import MinioUtils                       # noqa: E402
+from scripts.asin_catalog.snapshot \
+    import AsinCatalogSnapshot              # noqa: E402
 from scripts.asin_info.scraper \
     import AsinInfoScraper                  # noqa: E402
+from scripts.asin_info.page_types \
+    import PAGE_TYPES                       # noqa: E402
 
 
 class AsinInfoExtract:
     def __init__(
         self,
         rundate_path: str,
+        page_types: list = ['asin_info'],
+        categories: list = None,
     ) -> None:
         load_dotenv(
             re.search(
@@ -41,9 +45,17 @@ class AsinInfoExtract:
         )
 
         self.rundate_path = rundate_path
+        # page types fetched in the same run
+        self.page_types = page_types
+        # keys of the page types not keyed by ASIN,
+        # e.g. 'electronics/172541' for best_sellers
+        self.categories = categories or []
 
     def get_asins(self) -> list:
-        creds = MinioUtils(
+        creds = load_minio_json(
+            file_path='google_sheet',
+            file_name='iykyk101',
+            bucket_name='credentials',
             endpoint=os.getenv(
                 'MINIO_HOST'
             ),
@@ -52,51 +64,47 @@ class AsinInfoExtract:
             ),
             secret=os.getenv(
                 'MINIO_SECRET_KEY'
-            )
-        ).get_data_json(
-            file_path='google_sheet',
-            file_name='iykyk101',
-            bucket_name='credentials',
+            ),
         )
-        ggsheet = GGSheetUtils(creds)
-
-        df = ggsheet.get_data(
+        snapshot = AsinCatalogSnapshot(
+            minio=MinioUtils(
+                endpoint=os.getenv(
+                    'MINIO_HOST'
+                ),
+                access_key=os.getenv(
+                    'MINIO_ACCESS_KEY'
+                ),
+                secret=os.getenv(
+                    'MINIO_SECRET_KEY'
+                ),
+            ),
+            user_creds=creds,
             sheet_id=os.getenv('ASIN_SHEET_ID'),
-            sheet_name='us',
-            range_from='A1',
-            range_to='B',
-            columns_first_row=True,
         )
-        df = df[
-            df['country'] == 'USA'
-        ].reset_index(drop=True)
 
-        return df['asin'].to_list()
+        return snapshot.get_asins('USA')
 
     def retrieve_params(self) -> list:
         asins = self.get_asins()
-        asins_already = AsinInfoScraper(
+        keys_by_type = dict()
+        for page_type in self.page_types:
+            registered = PAGE_TYPES.get(page_type)
+            # unregistered page types are product pages
+            if registered is None or registered.per_asin:
+                keys_by_type[page_type] = asins
+            elif self.categories:
+                keys_by_type[page_type] = self.categories
+            else:
+                print(f'No category to extract for {page_type}')
+        params = AsinInfoScraper(
             input_li=[],
             rundate_path=self.rundate_path,
             info_type='asin_info',
-        ).get_asins_already()
-        asins_to_req = [
-            i for i in asins
-            if i not in asins_already
-        ]
+            page_types=self.page_types,
+        ).build_requests(keys_by_type)
 
         print(f'Total asin initial: {len(asins)}')
-        print(f'Total asin to extract : {len(asins_to_req)}')
-
-        params = []
-
-        for asin in asins_to_req:
-            params.append(
-                {
-                    'url': f'https://www.amazon.com/dp/{asin}?th=1',
-                    'headers': HEADERS,
-                }
-            )
+        print(f'Total pages to extract : {len(params)}')
 
         return params
 
@@ -115,6 +123,7 @@ class AsinInfoExtract:
                 },
             },
             limit_rate=8/1,
+            page_types=self.page_types,
         )
 
         ainfo.main()
@@ -0,0 +1,134 @@
+class PageType:
+    """
+    A kind of amazon page scraped by `AsinInfoScraper`,
+    pages are stored under bronze/amazon/<name>
+    :param name: name of the page type
+    :param url: template of the url, formatted with
+        base_url and key (the ASIN or the category)
+    :param validate: element proving that the page holds
+        the needed info, as {'name': ..., 'attrs': ...}
+    :param per_asin: whether the page is keyed by ASIN
+        defaults to True
+    :param full_page: whether the page has the amazon header and
+        footer, i.e. the location and footer checks apply
+        defaults to True
+    :param check_redirect: whether to check that the page
+        is still the one of the requested ASIN
+        defaults to False
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        validate: dict,
+        per_asin: bool = True,
+        full_page: bool = True,
+        check_redirect: bool = False,
+    ) -> None:
+        self.name = name
+        self.url = url
+        self.validate = validate
+        self.per_asin = per_asin
+        self.full_page = full_page
+        self.check_redirect = check_redirect
+
+    def get_url(
+        self,
+        base_url: str,
+        key: str,
+    ) -> str:
+        return self.url.format(
+            base_url=base_url,
+            key=key,
+        )
+
+    def get_file_name(
+        self,
+        key: str,
+    ) -> str:
+        """
+        Get the name the page of a key is stored under,
+        a category path is flattened into a single file name
+
+        :param key: the ASIN or the category
+
+        :return: the file name without extension
+        """
+
+        return key.replace('/', '__')
+
+
+PAGE_TYPES = dict()
+
+
+def register_page_type(page_type: PageType) -> PageType:
+    """
+    Make a page type available to the scraper by its name
+
+    :param page_type: the page type
+
+    :return: the registered page type
+    """
+
+    PAGE_TYPES[page_type.name] = page_type
+
+    return page_type
+
+
+# product page
+register_page_type(
+    PageType(
+        name='asin_info',
+        url='{base_url}/dp/{key}?th=1',
+        validate={
+            'name': 'div',
+            'attrs': {
+                'id': 'productDetails_feature_div',
+            },
+        },
+        check_redirect=True,
+    )
+)
+# offers of every seller, an ajax fragment without header
+register_page_type(
+    PageType(
+        name='offers',
+        url='{base_url}/gp/product/ajax/aodAjaxMain/?asin={key}&pc=dp',
+        validate={
+            'name': 'div',
+            'attrs': {
+                'id': 'aod-offer-list',
+            },
+        },
+        full_page=False,
+    )
+)
+# search results of the ASIN, e.g. its sponsored placements
+register_page_type(
+    PageType(
+        name='search_results',
+        url='{base_url}/s?k={key}',
+        validate={
+            'name': 'div',
+            'attrs': {
+                'data-component-type': 's-search-result',
+            },
+        },
+    )
+)
+# best sellers of a category, keyed by category path,
+# e.g. 'electronics/172541'
+register_page_type(
+    PageType(
+        name='best_sellers',
+        url='{base_url}/gp/bestsellers/{key}',
+        validate={
+            'name': 'div',
+            'attrs': {
+                'id': 'gridItemRoot',
+            },
+        },
+        per_asin=False,
+    )
+)
@@ -31,7 +31,15 @@ from scripts.utils.retrieve_proxies \
 from scripts.utils.amz_captcha_solver \
     import async_solve_captcha_cffi                # noqa: E402
 from scripts.utils.retrieve_cookies \
-    import _executor as gen_cookies_by_zipcode     # noqa: E402
+    import _executor_sessions as gen_cookie_sessions   # noqa: E402
+from scripts.utils.cookie_cache \
+    import CookieJarCache, CookieSessionPool       # noqa: E402
+from scripts.utils.captcha_service \
+    import get_captcha_service                     # noqa: E402
+from scripts.utils.country_info \
+    import COUNTRIES_INFO                          # noqa: E402
+from scripts.asin_info.page_types \
+    import PAGE_TYPES, PageType                    # noqa: E402
 
 
 class AsinInfoScraper:
@@ -50,6 +58,9 @@ class AsinInfoScraper:
         local_storage: bool = False,
         zipcode: str = '10001',
         country: str = 'USA',
+        cookie_ttl: int = 6 * 3600,
+        num_sessions: int = 4,
+        page_types: list = None,
     ) -> None:
         load_dotenv(
             re.search(
@@ -71,11 +82,17 @@ class AsinInfoScraper:
         self.batch_data_process = []
         self.info_type = info_type
         self.info_validate = info_validate
-        self.dev_dir = os.path.dirname(__file__) + f'/data/{self.info_type}'
-        self.prod_dir = f'bronze/amazon/{self.info_type}'
+        self.dev_dir, self.prod_dir = self.get_dirs()
+        # page types of the run, they share the limiter,
+        # the cookie sessions and the storage layout
+        self.page_types = {
+            name: self.resolve_page_type(name)
+            for name in (page_types or [self.info_type])
+        }
         self.export_details = export_details
         self.export_details_size = export_details_size
-        self.details_data = list()
+        # details of every page type
+        self.details_data = dict()
         self.minio_u = MinioUtils(
             endpoint=os.getenv(
                 'MINIO_HOST',
@@ -94,11 +111,133 @@ class AsinInfoScraper:
             'chrome110', 'chrome116', 'chrome119', 'chrome120',
             'chrome123', 'chrome124', 'safari17_0', 'edge101',
         ]
+        # cookies pinned to the zipcode, reused across runs
+        if self.local_storage:
+            self.cookie_cache = CookieJarCache(
+                local_dir=os.path.dirname(__file__) + '/data/cookies',
+                ttl=cookie_ttl,
+            )
+        else:
+            self.cookie_cache = CookieJarCache(
+                minio=self.minio_u,
+                ttl=cookie_ttl,
+            )
+        # requests are spread over independent cookie identities
+        self.sessions = CookieSessionPool(
+            country=self.country,
+            zipcode=self.zipcode,
+            size=num_sessions,
+            cache=self.cookie_cache,
+            generate=gen_cookie_sessions,
+            probe=self.probe_cookies,
+        )
+
+    def resolve_page_type(
+        self,
+        name: str,
+    ) -> PageType:
+        """
+        Get a registered page type, the validation given to the
+        scraper overrides the one of the info type
+
+        :param name: name of the page type
+
+        :return: the page type
+        """
+
+        page_type = PAGE_TYPES.get(name)
+        if page_type is None:
+            # unregistered info type, a product page as before
+            return PageType(
+                name=name,
+                url='{base_url}/dp/{key}?th=1',
+                validate=self.info_validate,
+                check_redirect=True,
+            )
+        if name == self.info_type and self.info_validate.get('name'):
+            return PageType(
+                name=name,
+                url=page_type.url,
+                validate=self.info_validate,
+                per_asin=page_type.per_asin,
+                full_page=page_type.full_page,
+                check_redirect=page_type.check_redirect,
+            )
+
+        return page_type
+
+    def get_dirs(
+        self,
+        page_type: str = None,
+    ) -> tuple:
+        """
+        Get the storage directories of a page type
+
+        :param page_type: name of the page type
+            defaults to None, i.e. the info type
+
+        :return: the local and the MinIO directory
+        """
+
+        page_type = page_type or self.info_type
+
+        return (
+            os.path.dirname(__file__) + f'/data/{page_type}',
+            f'bronze/amazon/{page_type}',
+        )
+
+    def build_requests(
+        self,
+        keys_by_type: dict,
+    ) -> list:
+        """
+        Build the requests of several page types, pages already
+        scraped on the run date are skipped
+
+        :param keys_by_type: mapping of page type name and its keys,
+            the ASINs or the categories
+
+        :return: list of request params
+        """
+
+        suffix = COUNTRIES_INFO.get(
+            self.country
+        ).get(
+            'suffix',
+        )
+        base_url = f'https://www.amazon{suffix}'
+
+        params = []
+        for name, keys in keys_by_type.items():
+            page_type = self.page_types[name]
+            keys_already = set(self.get_asins_already(name))
+            keys_to_req = [
+                i for i in keys
+                if page_type.get_file_name(i) not in keys_already
+            ]
+            self.logging.info(
+                f'Page type {name}: {len(keys_to_req)} '
+                f'of {len(keys)} to extract'
+            )
+            for key in keys_to_req:
+                params.append(
+                    {
+                        'url': page_type.get_url(base_url, key),
+                        'page_type': name,
+                        'key': key,
+                    }
+                )
+
+        return params
 
-    def get_asins_already(self) -> list:
+    def get_asins_already(
+        self,
+        page_type: str = None,
+    ) -> list:
+        dev_dir, prod_dir = self.get_dirs(page_type)
         if self.local_storage:
             file_dir = (
-                f'{self.dev_dir}/raw/{self.rundate_path}'
+                f'{dev_dir}/raw/{self.rundate_path}'
                 f'/**/*'
             )
             return [
@@ -113,16 +252,18 @@ class AsinInfoScraper:
             ]
         else:
             return self.minio_u.list_all_objects(
-                file_path=f'{self.prod_dir}/raw/{self.rundate_path}',
+                file_path=f'{prod_dir}/raw/{self.rundate_path}',
                 only_filename=True,
             )
 
     def export_asin_df(
         self,
         data: list,
+        page_type: str = None,
     ) -> None:
         if len(data) == 0:
             return
+        dev_dir, prod_dir = self.get_dirs(page_type)
 
         df = pd.DataFrame(data)
         asins = '_'.join(
@@ -135,7 +276,7 @@ class AsinInfoScraper:
         if len(data) > 0:
             if self.local_storage:
                 filedir = (
-                    f'{self.dev_dir}/conformed/{self.rundate_path}'
+                    f'{dev_dir}/conformed/{self.rundate_path}'
                     f'/{file_name}.parquet'
                 )
                 os.makedirs(
@@ -149,7 +290,7 @@ class AsinInfoScraper:
             else:
                 self.minio_u.load_data(
                     data=df,
-                    file_path=f'{self.prod_dir}/conformed/'
+                    file_path=f'{prod_dir}/conformed/'
                               f'{self.rundate_path}',
                     file_name=file_name,
                 )
@@ -158,9 +299,12 @@ class AsinInfoScraper:
     async def fetch(
         self,
         request_params: dict,
-        cookies: dict,
     ) -> None:
-        asin = request_params.get(
+        page_type = self.page_types[
+            request_params.get('page_type', self.info_type)
+        ]
+        # key of the page, the ASIN for the per-ASIN page types
+        asin = request_params.get('key') or request_params.get(
             'url'
         ).split(
             '/dp/'
@@ -188,13 +332,21 @@ class AsinInfoScraper:
                 f'Total response received: {self.resp_received}'
             )
 
+        session = self.sessions.next()
+        if session is None:
+            # every session drifted, new ones come at the retry round
+            self.to_retries_request.append(
+                request_params
+            )
+            return
+
         self.req_made += 1
         while True:
             try:
                 proxy = generate_proxy_html()
                 random_browser = random.choice(self.browser)
                 async with AsyncSession(
-                    cookies=cookies,
+                    cookies=session.cookies,
                     proxy=proxy,
                     impersonate=random_browser,
                 ) as client:
@@ -303,11 +455,13 @@ class AsinInfoScraper:
             )
             return
         # Navigated page
-        if (
-            "Amazon Clinic is now Amazon One Medical"
-            in resp_text
-        ) or (
-            '© 1996-2024, Amazon.com' not in resp_text
+        if page_type.full_page and (
+            (
+                "Amazon Clinic is now Amazon One Medical"
+                in resp_text
+            ) or (
+                '© 1996-2024, Amazon.com' not in resp_text
+            )
         ):
             self.logging.info(
                 f'Asin {asin} facing navigated page'
@@ -317,7 +471,10 @@ class AsinInfoScraper:
             )
             return
         # Zipcode is wrong
-        if self.country == 'USA':
+        if not page_type.full_page:
+            # fragments have no location header
+            pass
+        elif self.country == 'USA':
             try:
                 current_location = soup.find(
                     name='span',
@@ -330,6 +487,7 @@ class AsinInfoScraper:
                         f"Zipcode location is changed. "
                         f"Current location: {current_location}"
                     )
+                    await self.sessions.retire(session)
                     self.to_retries_request.append(
                         request_params
                     )
@@ -348,7 +506,7 @@ class AsinInfoScraper:
             # TODO: temporary ignored country != USA
             pass
         # Redirected asin
-        current_selected_asin = soup.find(
+        current_selected_asin = page_type.check_redirect and soup.find(
             name='li',
             attrs={
                 "data-csa-c-item-id": asin,
@@ -373,8 +531,8 @@ class AsinInfoScraper:
 
         # Validate needed info
         has_info = soup.find(
-            self.info_validate.get('name'),
-            self.info_validate.get('attrs'),
+            page_type.validate.get('name'),
+            page_type.validate.get('attrs'),
         )
         if not has_info:
             # self.logging.warning(
@@ -386,10 +544,11 @@ class AsinInfoScraper:
             cate_path = ''
 
         # Export data
+        dev_dir, prod_dir = self.get_dirs(page_type.name)
         if self.local_storage:
             filename = (
-                f'{self.dev_dir}/raw/{self.rundate_path}'
-                f'{cate_path}/{asin}.html'
+                f'{dev_dir}/raw/{self.rundate_path}'
+                f'{cate_path}/{page_type.get_file_name(asin)}.html'
             )
             os.makedirs(
                 os.path.dirname(filename),
@@ -403,31 +562,82 @@ class AsinInfoScraper:
         else:
             self.minio_u.load_data_html(
                 data=resp_text,
-                file_path=f'{self.prod_dir}/raw/'
+                file_path=f'{prod_dir}/raw/'
                           f'{self.rundate_path}{cate_path}',
-                file_name=asin,
+                file_name=page_type.get_file_name(asin),
             )
 
         # Export details data
         if self.export_details:
-            self.details_data.append(
+            details_data = self.details_data.setdefault(
+                page_type.name,
+                [],
+            )
+            details_data.append(
                 {
                     'asin': asin,
-                    self.info_type: str(has_info),
+                    page_type.name: str(has_info),
                 }
             )
-            if len(self.details_data) % self.export_details_size == 0:
+            if len(details_data) % self.export_details_size == 0:
                 self.export_asin_df(
-                    self.details_data
+                    details_data,
+                    page_type.name,
                 )
-                del self.details_data
-                self.details_data = []
+                self.details_data[page_type.name] = []
 
-    async def fetchall(self) -> None:
-        cookies = await gen_cookies_by_zipcode(
-            zipcode=self.zipcode,
-            country=self.country,
+    async def probe_cookies(
+        self,
+        cookies: dict,
+    ) -> bool:
+        """
+        Check that cookies still locate amazon at the zipcode
+
+        :param cookies: the cookies to check
+
+        :return: True if the cookies can be used
+            otherwise False
+        """
+
+        if self.country != 'USA':
+            # zipcode is not validated for other countries yet
+            return True
+
+        suffix = COUNTRIES_INFO.get(
+            self.country
+        ).get(
+            'suffix',
         )
+        try:
+            async with AsyncSession(
+                cookies=cookies,
+                proxy=generate_proxy_html(),
+                impersonate=random.choice(self.browser),
+            ) as client:
+                resp = await client.get(
+                    url=f'https://www.amazon{suffix}',
+                    timeout=16,
+                )
+            current_location = BeautifulSoup(
+                resp.text,
+                'html.parser',
+            ).find(
+                name='span',
+                attrs={
+                    "id": "glow-ingress-line2",
+                },
+            )
+        except Exception as e:
+            self.logging.warning(f'Cannot probe cookies: {e}')
+            return False
+
+        return bool(
+            current_location
+        ) and self.zipcode in current_location.text
+
+    async def fetchall(self) -> None:
+        # retired sessions are replaced before every round
+        await self.sessions.refill()
         self.logging.info(
             f'Total requests ahead: {len(self.input_li)}'
         )
@@ -436,7 +646,6 @@ class AsinInfoScraper:
             *(
                 self.fetch(
                     params,
-                    cookies,
                 ) for params in self.input_li
             )
         )
@@ -473,13 +682,18 @@ class AsinInfoScraper:
         await self.fetchall()
         await self.fetch_retries()
         if self.export_details:
-            self.export_asin_df(
-                self.details_data
-            )
-            del self.details_data
+            for name, details_data in self.details_data.items():
+                self.export_asin_df(
+                    details_data,
+                    name,
+                )
+            self.details_data = dict()
         self.logging.info(
             f'Total asins error: {self.num_error_asin}'
         )
+        self.logging.info(
+            f'Captcha metrics: {get_captcha_service().get_metrics()}'
+        )
 
     def main(self) -> None:
         return asyncio.run(
@@ -0,0 +1,215 @@
+import os
+import math
+import tempfile
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+REVIEW_SCHEMA = pa.schema(
+    [
+        pa.field("REVIEW_ID", pa.string()),
+        pa.field("PROFILE_NAME", pa.string()),
+        pa.field("PROFILE_URL", pa.string()),
+        pa.field("VERIFIED_PURCHASE", pa.string()),
+        pa.field("VARIATION_ASIN", pa.string()),
+        pa.field("VARIATION_TEXT", pa.string()),
+        pa.field("RATING_STARS", pa.string()),
+        pa.field("REVIEW_TITLE", pa.string()),
+        pa.field("REVIEW_BODY", pa.string()),
+        pa.field("HELPFUL_VOTE", pa.string()),
+        pa.field("IMAGES_URL", pa.list_(pa.string())),
+        pa.field("LOCATION", pa.string()),
+        pa.field("DATETIME", pa.string()),
+    ]
+)
+
+
+class ReviewColumnAccumulator:
+    """
+    Collect parsed review pages column by column and build
+    a single typed Arrow table at the end, pages can be spilled
+    to a local parquet file as row groups to bound memory
+    :param schema: schema of the reviews
+        defaults to REVIEW_SCHEMA
+    :param spill_every: number of pages buffered in memory before
+        they are written as a row group, None to never spill
+        defaults to None
+    :param spill_dir: directory of the spill file
+        defaults to the system temp directory
+    :param key: column identifying a row, rows whose key
+        was already appended are dropped, None to keep every row
+        defaults to None
+    """
+
+    def __init__(
+        self,
+        schema: pa.Schema = REVIEW_SCHEMA,
+        spill_every: int = None,
+        spill_dir: str = None,
+        key: str = None,
+    ) -> None:
+        self.schema = schema
+        self.spill_every = spill_every
+        self.spill_dir = spill_dir or tempfile.gettempdir()
+        self.columns = {name: [] for name in self.schema.names}
+        self.tables = list()
+        self.num_pages = 0
+        self.num_rows = 0
+        self.spill_path = None
+        self.writer = None
+        self.key = key
+        # hashes of the keys appended so far
+        self.seen = set()
+        self.num_duplicates = 0
+
+    @staticmethod
+    def _clean(value: object) -> object:
+        # missing values may come as NaN from pandas-style producers
+        if isinstance(value, float) and math.isnan(value):
+            return None
+
+        return value
+
+    def _keep_new(
+        self,
+        keys: list,
+    ) -> list:
+        keep = list()
+        for key in keys:
+            # rows without key cannot be matched, they are kept
+            if key is None:
+                keep.append(True)
+                continue
+            key_hash = hash(key)
+            keep.append(key_hash not in self.seen)
+            self.seen.add(key_hash)
+        self.num_duplicates += keep.count(False)
+
+        return keep
+
+    def append(
+        self,
+        page: dict,
+    ) -> None:
+        """
+        Append the columns of a parsed page
+
+        :param page: mapping of column name and its values
+        """
+
+        if self.key and self.key in page:
+            keep = self._keep_new(page[self.key])
+            if not all(keep):
+                page = {
+                    name: [i for i, kept in zip(values, keep) if kept]
+                    for name, values in page.items()
+                }
+        num_rows = len(next(iter(page.values()), []))
+        for name in self.schema.names:
+            values = page.get(name, [None] * num_rows)
+            self.columns[name].extend(
+                self._clean(i) for i in values
+            )
+        self.num_rows += num_rows
+        self.num_pages += 1
+
+        if self.spill_every and self.num_pages % self.spill_every == 0:
+            self._spill()
+
+    def append_table(
+        self,
+        table: pa.Table,
+    ) -> None:
+        """
+        Append rows that are already an Arrow table
+
+        :param table: table with the same columns as the schema
+        """
+
+        if self.key and self.key in table.column_names:
+            keep = self._keep_new(
+                table.column(self.key).to_pylist()
+            )
+            if not all(keep):
+                table = table.filter(pa.array(keep))
+        self._flush_columns()
+        self.tables.append(
+            table.select(self.schema.names).cast(self.schema)
+        )
+        self.num_rows += table.num_rows
+        self.num_pages += 1
+
+        if self.spill_every and self.num_pages % self.spill_every == 0:
+            self._spill()
+
+    def _flush_columns(self) -> None:
+        if len(self.columns[self.schema.names[0]]) == 0:
+            return
+        self.tables.append(
+            pa.Table.from_pydict(
+                self.columns,
+                schema=self.schema,
+            )
+        )
+        self.columns = {name: [] for name in self.schema.names}
+
+    def _spill(self) -> None:
+        self._flush_columns()
+        if not self.tables:
+            return
+        if self.writer is None:
+            fd, self.spill_path = tempfile.mkstemp(
+                dir=self.spill_dir,
+                suffix='.parquet',
+            )
+            os.close(fd)
+            self.writer = pq.ParquetWriter(
+                self.spill_path,
+                self.schema,
+            )
+        self.writer.write_table(
+            pa.concat_tables(self.tables)
+        )
+        self.tables = list()
+
+    def to_table(self) -> pa.Table:
+        """
+        Build the table of every appended page
+
+        :return: the Arrow table
+        """
+
+        if self.spill_path:
+            return pq.read_table(self.finish())
+
+        self._flush_columns()
+        if not self.tables:
+            return self.schema.empty_table()
+
+        return pa.concat_tables(self.tables)
+
+    def finish(self) -> str:
+        """
+        Write every remaining page to the spill file and close it
+
+        :return: path of the spill file
+            otherwise None if nothing was spilled
+        """
+
+        if self.writer is not None:
+            self._spill()
+            self.writer.close()
+            self.writer = None
+
+        return self.spill_path
+
+    def cleanup(self) -> None:
+        """
+        Remove the spill file
+        """
+
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.spill_path and os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+        self.spill_path = None
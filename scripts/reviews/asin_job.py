@@ -0,0 +1,64 @@
+import threading
+from concurrent.futures import Future
+
+
+class AsinJob:
+    """
+    Review crawl of an ASIN split into work units (a filter or
+    a page) that any worker can pick up, the ASIN is reassembled
+    when its last unit ends
+    :param asin: the ASIN to crawl
+    :param idx: index of the ASIN in the run
+    """
+
+    def __init__(
+        self,
+        asin: str,
+        idx: int,
+    ) -> None:
+        self.asin = asin
+        self.idx = idx
+        self.checkpoint = None
+        # latest review date of the previous run, set in incremental mode
+        self.since = None
+        # ids of the reviews of that date already crawled
+        self.known_ids = list()
+        # futures of the pages parsed by this run
+        self.pages = list()
+        self.errors = list()
+        self.num_units = 0
+        self.lock = threading.Lock()
+        # resolved once the ASIN is written, or failed
+        self.result = Future()
+
+    def add_unit(self) -> None:
+        with self.lock:
+            self.num_units += 1
+
+    def finish_unit(
+        self,
+        error: Exception = None,
+    ) -> bool:
+        """
+        Mark a unit of the ASIN as ended
+
+        :param error: the exception raised by the unit
+            defaults to None
+
+        :return: True if it was the last unit of the ASIN
+            otherwise False
+        """
+
+        with self.lock:
+            self.num_units -= 1
+            if error is not None:
+                self.errors.append(error)
+
+            return self.num_units == 0
+
+    def add_page(
+        self,
+        future: Future,
+    ) -> None:
+        with self.lock:
+            self.pages.append(future)
@@ -0,0 +1,190 @@
+import re
+import sys
+import copy
+import threading
+import warnings
+import pyarrow as pa
+
+sys.path.append(
+    re.search(
+        f'.*{re.escape("market_data_platform")}',
+        __file__,
+    ).group()
+)
+
+warnings.filterwarnings('ignore')
+
+from scripts.utils.minio_pd import MinioUtils       # noqa: E402
+from scripts.reviews.accumulator \
+    import REVIEW_SCHEMA                            # noqa: E402
+
+
+class ReviewCheckpoint:
+    """
+    Page-level checkpoint of the review crawl of an ASIN,
+    every parsed page is stored as a small parquet part and
+    a manifest records the finished pages and the page count
+    of every filter, so that a retried ASIN resumes
+    from where it stopped
+    :param minio: MinIO utils to store the checkpoint
+    :param file_path: the directory of the checkpoint of the ASIN
+    :param bucket_name: the name of the bucket
+        defaults to 'raw'
+    """
+
+    def __init__(
+        self,
+        minio: MinioUtils,
+        file_path: str,
+        bucket_name: str = 'raw',
+    ) -> None:
+        self.minio = minio
+        self.file_path = file_path
+        self.bucket_name = bucket_name
+        self.manifest_name = '_manifest'
+        self.lock = threading.Lock()
+        # one manifest upload at a time, held without self.lock
+        # so that readers never wait for the network
+        self.save_lock = threading.Lock()
+        self.version = 0
+        self.saved_version = 0
+        self.manifest = self._load_manifest()
+        # pages finished by previous runs, merged from their parts
+        self.resumed_keys = list(self.manifest['pages'])
+        # futures of the parts being written by this run
+        self.pending = list()
+
+    def _load_manifest(self) -> dict:
+        if self.minio.object_exist(
+            object_name=f'{self.file_path}/{self.manifest_name}.json',
+            bucket_name=self.bucket_name,
+        ):
+            return self.minio.get_data_json(
+                file_path=self.file_path,
+                file_name=self.manifest_name,
+                bucket_name=self.bucket_name,
+            )
+
+        return {
+            'pages': {},
+            'num_pages': {},
+        }
+
+    def _save_manifest(self) -> None:
+        with self.save_lock:
+            with self.lock:
+                # already uploaded by a caller which took the lock first
+                if self.saved_version >= self.version:
+                    return
+                version = self.version
+                manifest = copy.deepcopy(self.manifest)
+            self.minio.load_data_json(
+                data=manifest,
+                file_path=self.file_path,
+                file_name=self.manifest_name,
+                bucket_name=self.bucket_name,
+            )
+            self.saved_version = version
+
+    @staticmethod
+    def page_key(
+        asin: str,
+        filter_key: str,
+        page: int,
+    ) -> str:
+        return f'{asin}__{filter_key}__{page}'
+
+    def is_done(
+        self,
+        page_key: str,
+    ) -> bool:
+        with self.lock:
+            return page_key in self.manifest['pages']
+
+    def get_num_page(
+        self,
+        asin: str,
+        filter_key: str,
+    ) -> int:
+        """
+        Get the page count of a filter found by a previous run
+
+        :return: the page count
+            otherwise None if it is unknown
+        """
+
+        with self.lock:
+            return self.manifest['num_pages'].get(
+                f'{asin}__{filter_key}'
+            )
+
+    def set_num_page(
+        self,
+        asin: str,
+        filter_key: str,
+        num_page: int,
+    ) -> None:
+        with self.lock:
+            self.manifest['num_pages'][f'{asin}__{filter_key}'] = num_page
+            self.version += 1
+        self._save_manifest()
+
+    def save_page(
+        self,
+        page_key: str,
+        reviews: dict,
+    ) -> None:
+        """
+        Store the reviews of a parsed page and mark it as finished
+
+        :param page_key: key of the page, see `page_key`
+        :param reviews: the review columns of the page
+        """
+
+        table = pa.Table.from_pydict(
+            {
+                name: reviews.get(name, [])
+                for name in REVIEW_SCHEMA.names
+            },
+            schema=REVIEW_SCHEMA,
+        )
+        # the part is written before the manifest references it
+        self.minio.load_table(
+            table=table,
+            file_path=self.file_path,
+            file_name=page_key,
+            bucket_name=self.bucket_name,
+            hide_log=True,
+        )
+        with self.lock:
+            self.manifest['pages'][page_key] = table.num_rows
+            self.version += 1
+        self._save_manifest()
+
+    def load_resumed_pages(self) -> callable:
+        """
+        Get the pages finished by previous runs
+
+        :return: Generator contains Arrow tables
+        """
+
+        for page_key in self.resumed_keys:
+            yield pa.Table.from_pandas(
+                self.minio.get_data(
+                    file_path=self.file_path,
+                    file_name=page_key,
+                    bucket_name=self.bucket_name,
+                ),
+                schema=REVIEW_SCHEMA,
+                preserve_index=False,
+            )
+
+    def clear(self) -> None:
+        """
+        Remove the checkpoint once the ASIN is fully written
+        """
+
+        self.minio.truncate_folder(
+            file_path=f'{self.file_path}/',
+            bucket_name=self.bucket_name,
+        )
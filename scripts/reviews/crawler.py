@@ -1,35 +1,31 @@
 import os
 import sys
+import json
 import warnings
 import re
 import math
-import random
 import time
 import datetime
 import threading
-from itertools import cycle
-from concurrent.futures \
-    import ThreadPoolExecutor, as_completed
+import multiprocessing
+import collections
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, \
+    Future, CancelledError, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 
-from pyvirtualdisplay import Display
 import pytz
-import yaml
-from amazoncaptcha import AmazonCaptcha
+import requests
 from bs4 import BeautifulSoup, SoupStrainer
-import pandas as pd
-import numpy as np
-from deep_translator import GoogleTranslator
 from selenium import webdriver
 from selenium.webdriver.chrome.options \
     import Options
 from selenium.webdriver.chrome.service \
     import Service as ChromeService
-from webdriver_manager.chrome \
-    import ChromeDriverManager
-from selenium.webdriver.common.action_chains \
-    import ActionChains
-from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support \
+    import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 
 sys.path.append(
     re.search(
@@ -41,16 +37,125 @@ sys.path.append(
 warnings.filterwarnings('ignore')
 
 from scripts.utils.logger import Logger     # noqa: E402
-from scripts.utils.minio_u import MinioUtils        # noqa: E402
+from scripts.utils.minio_pd import MinioUtils       # noqa: E402
+from scripts.utils.config_loader import load_config     # noqa: E402
+from scripts.reviews.driver_pool import AMZDriverPool   # noqa: E402
+from scripts.reviews.parser \
+    import parse_review_page, parse_review_count, \
+    parse_star_histogram, parse_review_date         # noqa: E402
+from scripts.reviews.accumulator \
+    import ReviewColumnAccumulator                  # noqa: E402
+from scripts.reviews.checkpoint \
+    import ReviewCheckpoint                         # noqa: E402
+from scripts.reviews.asin_job import AsinJob        # noqa: E402
+from scripts.reviews.review_state \
+    import ReviewState                              # noqa: E402
+from scripts.utils.chromedriver \
+    import get_chromedriver_path                    # noqa: E402
+from scripts.utils.browser_lifecycle \
+    import BrowserLifecycle, get_browser_lifecycle  # noqa: E402
+from scripts.utils.captcha_service \
+    import get_captcha_service                      # noqa: E402
+
+# elements showing that a review page (or a captcha) is rendered
+REVIEW_PAGE_SELECTOR = (
+    '[data-hook="review"], '
+    '[data-hook="cr-filter-info-review-rating-count"], '
+    '#captchacharacters'
+)
+STAR_FILTER = {
+    1: "one_star",
+    2: "two_star",
+    3: "three_star",
+    4: "four_star",
+    5: "five_star",
+}
+# reviews reachable through a filter, amazon shows 10 pages of 10
+MAX_FILTER_REVIEW = 100
+# variations probed one by one at most, above it the star
+# filters are used even if they cannot reach every review
+MAX_VARIATION_FILTER = 15
+# requests not needed to read reviews, blocked in lean browsing mode
+BLOCKED_URL_PATTERNS = [
+    # fonts
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    # media, no content setting blocks video or audio
+    '*.mp4', '*.webm', '*.m3u8', '*.m4s', '*.mpd', '*.mp3', '*.m4a',
+    '*.ogg',
+    # ads and tracking
+    '*amazon-adsystem.com*', '*doubleclick.net*',
+    '*googlesyndication.com*', '*fls-na.amazon.*',
+    '*fls-eu.amazon.*', '*fls-fe.amazon.*', '*unagi.amazon.*',
+    '*unagi-na.amazon.*', '*/rd/uedata*', '*/1/batch/1/OE/*',
+]
+
+_parser_pool = None
+_parser_pool_size = None
+_parser_pool_lock = threading.Lock()
+
+
+def get_parser_pool(
+    max_workers: int = None,
+) -> ProcessPoolExecutor:
+    """
+    Get the parser process pool shared by every crawler of the process,
+    it is created on first use and again after it broke
+
+    :param max_workers: number of parser processes,
+        only used on first use
+        defaults to None, i.e. the number of CPUs
+
+    :return: the parser process pool
+    """
+
+    global _parser_pool, _parser_pool_size
+
+    with _parser_pool_lock:
+        if _parser_pool_size is None:
+            _parser_pool_size = max_workers or os.cpu_count()
+        if _parser_pool is None:
+            _parser_pool = ProcessPoolExecutor(
+                max_workers=_parser_pool_size,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+
+    return _parser_pool
+
+
+def reset_parser_pool(
+    pool: ProcessPoolExecutor,
+) -> None:
+    """
+    Drop a broken parser pool, e.g. a parser process killed by
+    the OOM killer, the next page starts a new one
+
+    :param pool: the broken pool
+    """
+
+    global _parser_pool
+
+    with _parser_pool_lock:
+        if _parser_pool is not pool:
+            return
+        _parser_pool = None
+    pool.shutdown(wait=False)
 
 
 class AMZDriver(webdriver.Chrome):
     def __init__(
         self,
         country: str = 'USA',
+        blocked_urls: list = None,
         **kwargs,
     ) -> None:
         super().__init__(**kwargs)
+        if blocked_urls:
+            # drop heavy requests before they reach the proxy
+            self.execute_cdp_cmd('Network.enable', {})
+            self.execute_cdp_cmd(
+                'Network.setBlockedURLs',
+                {'urls': blocked_urls},
+            )
         self.country = country
         self.current_dir = os.path.dirname(__file__)
         self.config_dir = self.current_dir.replace(
@@ -58,10 +163,9 @@ class AMZDriver(webdriver.Chrome):
             'config',
         )
         # load config file
-        with open(
+        self.cfg = load_config(
             f"{self.config_dir}/config.yaml"
-        ) as file:
-            self.cfg = yaml.safe_load(file)
+        )
         # go to the amazon captcha page
         self.base_url = self.cfg["amz_base_url"].get(
             self.country
@@ -77,18 +181,80 @@ class AMZDriver(webdriver.Chrome):
         self.get(
             f"{self.base_url}/product-reviews/B0093CMYSM?pageNumber=1"
         )
-        time.sleep(2)
+        self.wait_for_review_page()
         self.get(
             f"{self.base_url}/product-reviews/B0093CMYSM?pageNumber=2"
         )
-        time.sleep(2)
+        self.wait_for_review_page()
         self.get(
             f"{self.base_url}/product-reviews/B0093CMYSM?pageNumber=3"
         )
+        self.wait_for_review_page()
 
         if self.title == "Page Not Found":
             raise Exception('proxy face page not found, skip')
 
+    def wait_ready(
+        self,
+        timeout: float = 10,
+    ) -> bool:
+        """
+        Wait until the current document is parsed
+
+        :param timeout: max seconds to wait
+            defaults to 10
+
+        :return: True if the document is ready in time
+            otherwise False
+        """
+
+        try:
+            WebDriverWait(
+                self,
+                timeout,
+                poll_frequency=0.1,
+            ).until(
+                lambda d: d.execute_script(
+                    'return document.readyState'
+                ) in ['interactive', 'complete']
+            )
+            return True
+        except TimeoutException:
+            return False
+
+    def wait_for_review_page(
+        self,
+        timeout: float = 10,
+    ) -> bool:
+        """
+        Wait until the review list, the review count or a captcha
+        shows up, or the page finishes loading without any of them
+        (e.g. error pages)
+
+        :param timeout: max seconds to wait
+            defaults to 10
+
+        :return: True if the page is ready in time
+            otherwise False
+        """
+
+        try:
+            WebDriverWait(
+                self,
+                timeout,
+                poll_frequency=0.1,
+            ).until(
+                lambda d: d.find_elements(
+                    By.CSS_SELECTOR,
+                    REVIEW_PAGE_SELECTOR,
+                ) or d.execute_script(
+                    'return document.readyState'
+                ) == 'complete'
+            )
+            return True
+        except TimeoutException:
+            return False
+
     def check_facing_catpcha(self) -> bool:
         try:
             self.find_element(
@@ -104,6 +270,7 @@ class AMZDriver(webdriver.Chrome):
 
     def validate_captcha(self) -> None:
         facing_catpcha = self.check_facing_catpcha()
+        service = get_captcha_service()
 
         while facing_catpcha:
             captcha_box = self.find_element(
@@ -114,29 +281,51 @@ class AMZDriver(webdriver.Chrome):
                 By.TAG_NAME,
                 "img"
             ).get_attribute("src")
-            solution = AmazonCaptcha.fromlink(captcha_url).solve()
+            # solved in the captcha pool, shared by every driver
+            image = requests.get(
+                captcha_url,
+                timeout=10,
+            ).content
+            solution = service.solve(image) or ""
             print(f"CATPCHA SOLUTION: {solution}")
             captcha_box.send_keys(solution)
             self.find_element(
                 By.XPATH,
                 '//button[@type="submit"]',
             ).click()
-            time.sleep(2)
+            # the captcha form is replaced once the solution is submitted
+            try:
+                WebDriverWait(
+                    self,
+                    10,
+                    poll_frequency=0.1,
+                ).until(
+                    EC.staleness_of(captcha_box)
+                )
+            except TimeoutException:
+                pass
             self.get(self.base_url)
-            time.sleep(2)
+            self.wait_ready()
             facing_catpcha = self.check_facing_catpcha()
+            service.report(
+                image,
+                accepted=not facing_catpcha,
+            )
             if self.title == "Sorry! Something went wrong!":
                 raise Exception('proxy facing 503, skip')
 
     def clear_cache(self) -> None:
-        self.get("chrome://settings/clearBrowserData")
-        time.sleep(1)
-        action = ActionChains(self)
-        action.send_keys(
-            Keys.TAB + Keys.ENTER
+        # clear through CDP, which returns once it is done,
+        # instead of driving the settings page
+        self.execute_cdp_cmd('Network.clearBrowserCache', {})
+        self.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        self.execute_cdp_cmd(
+            'Storage.clearDataForOrigin',
+            {
+                'origin': self.base_url,
+                'storageTypes': 'all',
+            },
         )
-        action.perform()
-        time.sleep(2)
 
 
 class AMZReview(object):
@@ -145,19 +334,41 @@ class AMZReview(object):
         num_worker: int,
         rundate_path: str,
         country: str = 'USA',
+        lean_browsing: bool = True,
+        num_parser: int = None,
+        spill_every: int = 20,
+        max_active_asin: int = None,
+        incremental: bool = False,
+        variation_ttl: int = 7 * 24 * 3600,
+        lifecycle: BrowserLifecycle = None,
     ) -> None:
         self.rundate_path = rundate_path
         self.bucket = 'raw'
+        # run headless and block images, fonts, media and ads,
+        # turn it off to watch the browser when debugging
+        self.lean_browsing = lean_browsing
+        # number of processes parsing review pages, the pool is shared
+        # by every crawler of the process and sized by the first one
+        self.num_parser = num_parser
+        # number of pages of an ASIN kept in memory before
+        # they are spilled to a local parquet row group
+        self.spill_every = spill_every
+        # number of ASINs crawled at the same time, their filters
+        # and pages are spread over every worker
+        self.max_active_asin = max_active_asin or num_worker * 2
+        # only crawl the reviews newer than the previous run,
+        # ASINs without a state are still crawled in full
+        self.incremental = incremental
+        self.executor = None
         self.current_dir = os.path.dirname(__file__)
         self.config_dir = self.current_dir.replace(
             'reviews',
             'config',
         )
         # load config file
-        with open(
+        self.cfg = load_config(
             f"{self.config_dir}/config.yaml"
-        ) as file:
-            self.cfg = yaml.safe_load(file)
+        )
         self.run_time = datetime.datetime.now(
             pytz.timezone("Asia/Ho_Chi_Minh")
         ).replace(microsecond=0).replace(tzinfo=None)
@@ -171,25 +382,84 @@ class AMZReview(object):
         self.local_context = threading.local()
         # number worker for multithread
         self.num_worker = num_worker
+        self.driver_pool = None
+        # browsers and displays of every crawler of the process
+        self.lifecycle = lifecycle or get_browser_lifecycle()
 
         self.logging = Logger(
             name=__name__,
             path=f"{self.current_dir}/logs/"
                  f"{self.run_time.strftime('%b_%d_%Y')}.log"
         )
-        self.time_sleep = cycle(
-            range(10)
-        )
         # path for data storage
         self.saving_path = (
             f"amz/review/{self.country}/{self.rundate_path}"
         )
+        # path for page checkpoints of unfinished ASINs
+        self.checkpoint_path = (
+            f"amz/review_checkpoint/{self.country}/{self.rundate_path}"
+        )
+        self.checkpoint_writer = None
         # minIO utils
         self.minio = MinioUtils(
             endpoint=self.cfg['minio'].get('host'),
             access_key=self.cfg['minio'].get('key'),
             secret=self.cfg['minio'].get('secret'),
         )
+        # latest review date of every ASIN over the runs
+        self.state = ReviewState(
+            minio=self.minio,
+            file_path=f"amz/review_state/{self.country}",
+            bucket_name=self.bucket,
+        )
+        # variations of every ASIN, reused until they expire
+        self.variation_store = ReviewState(
+            minio=self.minio,
+            file_path=f"amz/review_variation/{self.country}",
+            bucket_name=self.bucket,
+            ttl=variation_ttl,
+        )
+
+    def update_state(
+        self,
+        job: AsinJob,
+        dates: list,
+        ids: list,
+    ) -> None:
+        """
+        Move the latest review date of an ASIN forward and keep
+        the ids of the reviews of that date, the next incremental
+        run stops at them
+
+        :param job: the written ASIN
+        :param dates: dates of the written reviews
+        :param ids: ids of the written reviews
+        """
+
+        latest = None
+        latest_ids = set()
+        if job.since:
+            latest = datetime.date.fromisoformat(job.since)
+            latest_ids.update(job.known_ids)
+        for date, review_id in zip(map(parse_review_date, dates), ids):
+            if date is None:
+                continue
+            if latest is None or date > latest:
+                latest = date
+                latest_ids = {review_id}
+            elif date == latest:
+                latest_ids.add(review_id)
+        if latest is None:
+            return
+
+        self.state.put(
+            job.asin,
+            {
+                "latest_date": latest.isoformat(),
+                "latest_ids": sorted(latest_ids),
+                "rundate_path": self.rundate_path,
+            },
+        )
 
     def _check_asin_crawled(
         self,
@@ -203,32 +473,47 @@ class AMZReview(object):
 
     def _generate_driver(self) -> AMZDriver:
         chrome_options = Options()
+        # return from get() on DOMContentLoaded, callers wait
+        # for the elements they need instead of the full page load
+        chrome_options.page_load_strategy = 'eager'
         chrome_options.add_argument('--no-sandbox')
         chrome_options.add_argument('--disable-dev-shm-usage')
         chrome_options.add_extension(
             self.current_dir
             + '/assets/rotated_proxy.zip'
         )
+        blocked_urls = None
+        if self.lean_browsing:
+            chrome_options.add_argument('--headless=new')
+            chrome_options.add_argument(
+                '--blink-settings=imagesEnabled=false'
+            )
+            chrome_options.add_experimental_option(
+                'prefs',
+                {
+                    'profile.managed_default_content_settings.images': 2,
+                    'profile.managed_default_content_settings'
+                    '.notifications': 2,
+                },
+            )
+            blocked_urls = BLOCKED_URL_PATTERNS
         driver = AMZDriver(
             country=self.country,
+            blocked_urls=blocked_urls,
             options=chrome_options,
             service=ChromeService(
-                ChromeDriverManager().install()
+                get_chromedriver_path()
             ),
         )
 
         return driver
 
     def init_worker(self) -> None:
-        # generate a unique value for the worker thread
-        time.sleep(
-            next(self.time_sleep)
-        )
         self.logging.info(
-            "Start generate driver"
+            "Start acquire driver"
         )
-        self.local_context.driver = self._generate_driver()
-        # store the unique worker key in a thread local variable
+        # store the driver of the worker in a thread local variable
+        self.local_context.driver = self.driver_pool.acquire()
         self.logging.info(
             f"Initializing {self.local_context.driver} success"
         )
@@ -244,11 +529,7 @@ class AMZReview(object):
         driver.get(f"{self.base_url}/errors/validateCaptcha?")
         driver.validate_captcha()
         driver.get(url)
-        time.sleep(
-            random.choice(
-                [1, 2, 3, 4]
-            )
-        )
+        driver.wait_for_review_page()
 
         while (
             driver.title == self.title_503
@@ -256,36 +537,20 @@ class AMZReview(object):
             or driver.title == self.not_found_title
         ):
             self.logging.info(f"STILL FACING {driver.title}")
-            driver.quit()
-
             self.logging.info(
-                "Start generate driver with different proxy"
+                "Switch to a warmed driver with different proxy"
             )
-            driver = self._generate_driver()
+            driver = self.driver_pool.replace(driver)
             driver.get(url)
+            driver.wait_for_review_page()
 
         self.local_context.driver = driver
         self.logging.info("CHANGE PROXY SUCCESFULLY")
 
-        time.sleep(
-            random.choice(
-                [1, 2, 3, 4]
-            )
-        )
-
-    def quit(
-        self,
-        local: callable,
-    ) -> None:
-        time.sleep(1)
-        driver = local.driver
-        driver.quit()
-
     @staticmethod
     def get_num_review(
         page_source: str,
     ) -> int:
-        num_review = None
         only_rating_count = SoupStrainer(
             attrs={"data-hook": "cr-filter-info-review-rating-count"}
         )
@@ -294,30 +559,8 @@ class AMZReview(object):
             "html.parser",
             parse_only=only_rating_count,
         )
-        if soup.text != "":
-            review_count_text = soup.text.strip()
-            # num_review = int(
-            #     review_count_text.split(
-            #         ", "
-            #     )[1].split()[0].replace(
-            #         ",",
-            #         "",
-            #     )
-            # )
-            num_review = int(
-                re.findall(
-                    '[0-9,\\.]+',
-                    review_count_text,
-                )[-1].replace(
-                    ',',
-                    '',
-                ).replace(
-                    '.',
-                    '',
-                )
-            )
 
-        return num_review
+        return parse_review_count(soup.text)
 
     @staticmethod
     def get_num_page(
@@ -330,6 +573,123 @@ class AMZReview(object):
 
         return total_page
 
+    @staticmethod
+    def get_star_counts(
+        page_source: str,
+    ) -> dict:
+        """
+        Estimate the number of reviews of every star filter
+        from the rating histogram of a review page
+
+        :param page_source: html of the review page
+
+        :return: dictionary of star filter and its number of reviews,
+            None for a star shown as 0% which may still hold a few
+            otherwise an empty dictionary if the histogram is missing
+        """
+
+        only_histogram = SoupStrainer(id="histogramTable")
+        soup = BeautifulSoup(
+            page_source,
+            "html.parser",
+            parse_only=only_histogram,
+        )
+        shares = parse_star_histogram(soup.text)
+        num_review = AMZReview.get_num_review(page_source)
+        if not shares or not num_review:
+            return {}
+
+        # rounded up, a star under 0.5% is shown as 0% and unknown
+        return {
+            STAR_FILTER[star]: (
+                math.ceil(num_review * share / 100) if share else None
+            )
+            for star, share in shares.items()
+        }
+
+    def plan_filters(
+        self,
+        asin: str,
+        star_counts: dict,
+    ) -> tuple:
+        """
+        Choose how to split the reviews of an ASIN above the page
+        limit, star filters are the cheapest and used whenever they
+        reach every review, variations are only looked up when some
+        star holds more than the page limit and used when they reach
+        more reviews than the star filters within the variation cap
+
+        :param asin: the ASIN to plan
+        :param star_counts: estimated reviews of every star filter,
+            see `get_star_counts`
+
+        :return: "star" or "variation"
+            and the ASINs of the variations
+        """
+
+        if star_counts:
+            # a star shown as 0% holds less than 0.5% of the reviews
+            num_unknown = math.ceil(
+                sum(i or 0 for i in star_counts.values()) * 0.005
+            )
+            counts = [
+                num_unknown if i is None else i
+                for i in star_counts.values()
+            ]
+            num_review = sum(counts)
+            star_coverage = sum(
+                min(i, MAX_FILTER_REVIEW) for i in counts
+            )
+            star_pages = sum(
+                math.ceil(min(i, MAX_FILTER_REVIEW) / 10)
+                for i in counts
+            )
+            self.logging.info(
+                f"ASIN: {asin}, STAR FILTERS COVER {star_coverage} "
+                f"OF {num_review} REVIEWS IN {star_pages} PAGES"
+            )
+            if star_coverage >= num_review:
+                return "star", []
+
+        variations = self.get_variations(asin)
+        # the parent ASIN overlaps with its variations
+        variation_asins = [
+            value for key, value in (variations or {}).items()
+            if key != "parentAsin"
+        ]
+        if variation_asins:
+            self.logging.info(
+                f"ASIN: {asin} HAVE {len(variation_asins)} VARIATIONS"
+            )
+        if star_counts:
+            # every variation costs a probe plus up to 10 pages
+            variation_coverage = min(
+                num_review,
+                MAX_FILTER_REVIEW * len(variation_asins),
+            )
+            variation_pages = len(variation_asins) + min(
+                math.ceil(num_review / 10),
+                10 * len(variation_asins),
+            )
+            self.logging.info(
+                f"ASIN: {asin}, VARIATIONS COVER ABOUT "
+                f"{variation_coverage} OF {num_review} REVIEWS "
+                f"IN {variation_pages} PAGES"
+            )
+            by_variation = (
+                2 <= len(variation_asins) <= MAX_VARIATION_FILTER
+            ) and (
+                variation_coverage > star_coverage
+            )
+        else:
+            # no histogram, fall back to the variation count
+            by_variation = 5 <= len(variation_asins) <= MAX_VARIATION_FILTER
+
+        return (
+            "variation" if by_variation else "star",
+            variation_asins,
+        )
+
     def get_redirect_asin(
         self,
         driver: AMZDriver,
@@ -351,589 +711,877 @@ class AMZReview(object):
     ) -> dict:
         variation_data = None
 
-        variation_pattern = r'"dimensionToAsinMap" : ({.+})'
-        variation = re.findall(
-            variation_pattern,
+        variation = re.search(
+            r'"dimensionToAsinMap"\s*:\s*(?={)',
             page_source,
         )
-        parent_asin_pattern = r'"parentAsin" : "(.+)"'
-        parent_asin = re.findall(
-            parent_asin_pattern,
+        parent_asin = re.search(
+            r'"parentAsin"\s*:\s*"(\w+)"',
             page_source,
         )
 
         if variation and parent_asin:
-            variation_data = eval(variation[0])
+            # decode the object in place, the page goes on after it
+            try:
+                variation_data, _ = json.JSONDecoder().raw_decode(
+                    page_source,
+                    variation.end(),
+                )
+            except ValueError:
+                self.logging.warning("CANNOT DECODE VARIATIONS")
+                return None
 
             variation_data.update(
                 {
-                    "parentAsin": parent_asin[0]
+                    "parentAsin": parent_asin.group(1)
                 }
             )
 
         return variation_data
 
-    def process_first_page(
+    def get_variations(
         self,
         asin: str,
-    ) -> tuple:
+    ) -> dict:
+        """
+        Get the variations of an ASIN, the product page is only
+        loaded when the stored variations are missing or expired,
+        variations are only stored when read from a product page
+
+        :param asin: the ASIN
+
+        :return: mapping of dimension and variation ASIN
+            otherwise None if the ASIN has no variation
+            or its product page cannot be read
+        """
+
+        stored = self.variation_store.get(asin)
+        if stored is not None:
+            return stored.get("variations")
+
+        # captcha, 503 and sign-in pages are handled as for reviews
+        page_source = self.load_page(f"{self.base_url}/dp/{asin}?th=1")
         driver = self.local_context.driver
-        url = f"{self.base_url}/product-reviews/{asin}/?pageNumber=1"
-        driver.get(url)
+        if (
+            driver.title in [
+                self.title_503,
+                self.sign_in_title,
+                self.not_found_title,
+            ]
+        ) or (
+            'id="productTitle"' not in page_source
+        ):
+            # a blocked page would hide the variations until they expire
+            self.logging.warning(
+                f"CANNOT READ PRODUCT PAGE OF {asin}, "
+                f"TITLE {driver.title}"
+            )
+            return None
+
+        variations = self.get_variation(page_source)
+        if variations is None and '"dimensionToAsinMap"' in page_source:
+            # the variations are there but cannot be decoded
+            return None
+        self.variation_store.put(
+            asin,
+            {"variations": variations},
+        )
+
+        return variations
+
+    def submit_page(
+        self,
+        page_source: str,
+        since: str = None,
+        known_ids: list = None,
+    ) -> Future:
+        """
+        Hand a review page to the parser process pool
 
+        :param page_source: html of the review page
+        :param since: the latest review date already crawled
+            defaults to None
+        :param known_ids: ids of the crawled reviews of that date
+            defaults to None
+
+        :return: future of the parsed page,
+            see `parse_review_page`
+        """
+
+        args = (
+            parse_review_page,
+            page_source,
+            self.base_url,
+            self.country,
+            since,
+            known_ids,
+        )
+        pool = get_parser_pool(self.num_parser)
+        try:
+            future = pool.submit(*args)
+        except BrokenProcessPool:
+            # the pool broke since the last page, parse in a new one
+            reset_parser_pool(pool)
+            pool = get_parser_pool(self.num_parser)
+            future = pool.submit(*args)
+        future.add_done_callback(
+            lambda i: self.on_page_parsed(pool, i)
+        )
+
+        return future
+
+    @staticmethod
+    def on_page_parsed(
+        pool: ProcessPoolExecutor,
+        future: Future,
+    ) -> None:
+        # the page fails with its unit, the next pages get a new pool
+        if not future.cancelled() and isinstance(
+            future.exception(),
+            BrokenProcessPool,
+        ):
+            reset_parser_pool(pool)
+
+    def load_page(
+        self,
+        url: str,
+    ) -> str:
+        """
+        Load a review page with the driver of the worker,
+        switching driver when it is blocked
+
+        :param url: url of the review page
+
+        :return: page source of the review page
+        """
+
+        driver = self.local_context.driver
+        if self.lifecycle.is_bloated(driver):
+            self.logging.info(f"{driver} IS OVER ITS MEMORY CAP, RECYCLE")
+            driver = self.driver_pool.replace(driver)
+            self.local_context.driver = driver
+        driver.get(url)
+        driver.wait_for_review_page()
         facing_captcha = driver.check_facing_catpcha()
         if (
             driver.title == self.title_503
-            or driver.title == self.sign_in_title
-            or facing_captcha
+        ) or (
+            driver.title == self.sign_in_title
+        ) or facing_captcha or (
+            driver.title == self.not_found_title
         ):
-            self.re_init_driver(
-                driver,
-                url,
-            )
+            self.re_init_driver(driver, url)
             driver = self.local_context.driver
             driver.get(url)
+            driver.wait_for_review_page()
 
-        num_page = self.get_num_page(driver.page_source)
-        redirect_asin = self.get_redirect_asin(driver, asin)
+        return driver.page_source
 
-        driver.get(f"{self.base_url}/dp/{asin}?th=1")
-        variations = self.get_variation(driver.page_source)
+    def review_url(
+        self,
+        asin: str,
+        page: int,
+        star: str = None,
+        only_current_asin: bool = False,
+        sort_by: str = None,
+    ) -> str:
+        url = (
+            f"{self.base_url}/product-reviews/{asin}/"
+            f"?pageNumber={page}"
+        )
+        if star:
+            url += f"&filterByStar={star}"
+        if only_current_asin:
+            url += "&formatType=current_format"
+        if sort_by:
+            url += f"&sortBy={sort_by}"
 
-        return redirect_asin, num_page, variations
+        return url
 
-    def process_response_data(
-        self,
-        soup: BeautifulSoup,
-    ):
-        """Process raw data get from each review page
+    @staticmethod
+    def filter_key(
+        star: str = None,
+        only_current_asin: bool = False,
+    ) -> str:
+        filter_key = star or "all"
+        if only_current_asin:
+            filter_key = f"current_{filter_key}"
+
+        return filter_key
 
-        Returns:
-            Dict: A dictionary contain all data
-                need to get from current review page.
+    def crawl_page(
+        self,
+        job: AsinJob,
+        url: str,
+        page_key: str,
+    ) -> Future:
         """
+        Load and parse a review page, the parsed page is
+        checkpointed as soon as the parser finishes
 
-        profile_name = []
-        profile_url = []
-        verified = []
-        variation_asin = []
-        variation_text = []
-        ratings = []
-        review_titles = []
-        review_bodys = []
-        helpful_votes = []
-        img_url = []
-        review_locations = []
-        review_dates = []
+        :param job: the ASIN the page belongs to
+        :param url: url of the review page
+        :param page_key: checkpoint key of the page
 
-        reviews = soup.findAll(
-            attrs={"data-hook": "review"}
-        )
+        :return: future of the parsed page
+        """
 
-        translator = GoogleTranslator(
-            source='auto',
-            target='en',
+        checkpoint = job.checkpoint
+        future = self.submit_page(
+            self.load_page(url),
+            job.since,
+            job.known_ids,
+        )
+        job.add_page(future)
+        # the writer waits for the parser, the worker keeps browsing
+        checkpoint.pending.append(
+            self.checkpoint_writer.submit(
+                self.save_checkpoint,
+                checkpoint,
+                page_key,
+                future,
+            )
         )
 
-        # pattern for regex
-        DATE_PATTERN = r"\b[A-Z][a-z]+ \d{1,2}, \d{4}\b"
-        LOCATION_PATTERN = (
-            r"Reviewed in (?:the )?([A-Z][a-z]+(?: [A-Z][a-z]+)*)"
+        return future
+
+    @staticmethod
+    def save_checkpoint(
+        checkpoint: ReviewCheckpoint,
+        page_key: str,
+        future: Future,
+    ) -> None:
+        checkpoint.save_page(
+            page_key,
+            future.result()["reviews"],
         )
-        VARIATION_ASIN_PATTERN = r"/product-reviews/(\w+)"
 
-        for review in reviews:
-            profile_name.append(
-                review.find(class_="a-profile-name").text
-            )
-            try:
-                profile_url.append(
-                    self.base_url + review.find(
-                        class_="a-profile"
-                    ).get("href")
-                )
-            except Exception:
-                # Some users can't not access profile
-                profile_url.append(np.nan)
+    def submit_job(
+        self,
+        asin: str,
+        idx: int,
+    ) -> Future:
+        """
+        Start the review crawl of an ASIN
 
-            try:
-                # Verified purchase
-                verified.append(
-                    review.find(
-                        attrs={"data-hook": "avp-badge"}
-                    ).text
-                )
-            except Exception:
-                verified.append(np.nan)
+        :param asin: the ASIN to crawl
+        :param idx: index of the ASIN in the run
 
-            try:
-                variation_link = review.find(
-                    attrs={"data-hook": "format-strip"}
-                ).get(
-                    "href"
-                )
-                variation_asin.append(
-                    re.findall(
-                        VARIATION_ASIN_PATTERN, variation_link
-                    )[0]
-                )
-            except Exception:
-                # Some asin don't have variations
-                variation_asin.append(np.nan)
+        :return: future resolved once the ASIN is written
+        """
 
-            try:
-                variation_text.append(
-                    review.find(
-                        attrs={"data-hook": "format-strip"}
-                    ).text
-                )
-            except Exception:
-                variation_text.append(np.nan)
+        job = AsinJob(asin, idx)
+        self.submit_unit(job, self.process_asin)
 
-            try:
-                ratings.append(
-                    review.find(
-                        attrs={"data-hook": "review-star-rating"}
-                    ).text
-                )
-            except Exception:
-                ratings.append(
-                    review.find(
-                        attrs={"data-hook": "cmps-review-star-rating"}
-                    ).text
-                )
+        return job.result
 
-            review_titles.append(
-                review.find(
-                    attrs={"data-hook": "review-title"}
-                )
-                .find_all("span")[-1]
-                .text.strip()
-            )
-
-            if (
-                "media could not be loaded"
-                not in review.find(
-                    attrs={"data-hook": "review-body"}
-                ).text
-            ):
-                review_bodys.append(
-                    review.find(
-                        attrs={"data-hook": "review-body"}
-                    ).text.strip()
-                )
-            else:
-                review_bodys.append(
-                    review.find(
-                        attrs={"data-hook": "review-body"}
-                    )
-                    .text.strip()
-                    .split("\n")[-1]
-                )
+    def submit_unit(
+        self,
+        job: AsinJob,
+        func: callable,
+        *args,
+    ) -> None:
+        # the unit is counted before it is queued, so that the ASIN
+        # cannot end while the unit submitting it is still running
+        job.add_unit()
+        try:
+            future = self.executor.submit(
+                self.run_unit,
+                job,
+                func,
+                *args,
+            )
+        except Exception as e:
+            # e.g. the executor broke once a worker got no driver
+            self.end_unit(job, e)
+            return
+        future.add_done_callback(
+            lambda i: self.on_unit_done(job, i)
+        )
 
-            try:
-                helpful_votes.append(
-                    review.find(
-                        attrs={"data-hook": "helpful-vote-statement"}
-                    ).text
-                )
-            except Exception:
-                helpful_votes.append(np.nan)
+    def on_unit_done(
+        self,
+        job: AsinJob,
+        future: Future,
+    ) -> None:
+        # run_unit ends the unit itself, an error on its future
+        # means it never ran, e.g. the executor broke
+        if future.cancelled():
+            self.end_unit(job, CancelledError())
+        elif future.exception() is not None:
+            self.end_unit(job, future.exception())
+
+    def run_unit(
+        self,
+        job: AsinJob,
+        func: callable,
+        *args,
+    ) -> None:
+        error = None
+        try:
+            func(job, *args)
+        except Exception as e:
+            self.logging.exception(
+                f"UNIT {func.__name__}{args} OF ASIN {job.asin} FAILED: {e}"
+            )
+            error = e
 
-            try:
-                all_images_tag = review.find(
-                    class_="review-image-tile-section"
-                ).findAll("img")
-                img_url.append(
-                    [
-                        image_tag.get("src")
-                        for image_tag in all_images_tag
-                    ]
-                )
-            except Exception:
-                img_url.append(np.nan)
-
-            review_location_date = review.find(
-                attrs={"data-hook": "review-date"}
-            ).text.strip()
-            if self.country != "USA":
-                try:
-                    review_location_date = translator.translate(
-                        review_location_date
-                    )
-                except Exception:
-                    self.logging.warning(
-                        f'CANNOT TRANSLATE: {review_location_date}'
-                    )
-            try:
-                review_locations.append(
-                    re.findall(
-                        LOCATION_PATTERN,
-                        review_location_date,
-                    )[0]
-                )
-            except Exception:
-                self.logging.warning(
-                    f'CANNOT EXTRACT LOCATION: {review_location_date}'
-                )
-                review_locations.append(
-                    review_location_date
-                )
-            try:
-                review_dates.append(
-                    re.findall(
-                        DATE_PATTERN,
-                        review_location_date,
-                    )[0]
-                )
-            except Exception:
-                self.logging.warning(
-                    f'CANNOT EXTRACT DATE: {review_location_date}'
-                )
-                review_dates.append(
-                    review_location_date
-                )
+        self.end_unit(job, error)
 
-        result = {
-            "PROFILE_NAME": profile_name,
-            "PROFILE_URL": profile_url,
-            "VERIFIED_PURCHASE": verified,
-            "VARIATION_ASIN": variation_asin,
-            "VARIATION_TEXT": variation_text,
-            "RATING_STARS": ratings,
-            "REVIEW_TITLE": review_titles,
-            "REVIEW_BODY": review_bodys,
-            "HELPFUL_VOTE": helpful_votes,
-            "IMAGES_URL": img_url,
-            "LOCATION": review_locations,
-            "DATETIME": review_dates,
-        }
+    def end_unit(
+        self,
+        job: AsinJob,
+        error: Exception = None,
+    ) -> None:
+        if job.finish_unit(error):
+            self.finish_job(job)
 
-        return result
+    def finish_job(
+        self,
+        job: AsinJob,
+    ) -> None:
+        # pages done by the failed units stay in the checkpoint,
+        # the retry of the ASIN resumes from them
+        if job.errors:
+            # the retry reads the manifest, every page of this
+            # attempt must be written to it first
+            if job.checkpoint:
+                wait(job.checkpoint.pending)
+            job.result.set_exception(job.errors[0])
+            return
 
-    def process_filter_by_star(
+        try:
+            self.write_asin(job)
+        except Exception as e:
+            job.result.set_exception(e)
+        else:
+            job.result.set_result(job.asin)
+
+    def process_first_page(
         self,
         asin: str,
-        only_current_asin: bool = False,
-    ) -> list:
-        STAR_FILTER = {
-            1: "one_star",
-            2: "two_star",
-            3: "three_star",
-            4: "four_star",
-            5: "five_star",
-        }
-
+    ) -> tuple:
+        url = self.review_url(asin, 1)
+        page_source = self.load_page(url)
+        # load_page may have switched the driver of the worker
         driver = self.local_context.driver
-        result = []
-        for star in range(1, 6):
-            num_page = 11
-            for current_page in range(1, 11):
-                self.logging.info(
-                    f"PROCESSING ASIN {asin}, page {current_page}, star {star}"
-                )
-                if current_page > num_page:
-                    self.logging.info(
-                        f"current page is {current_page} "
-                        f"larger than {num_page}, exit"
-                    )
-                    break
-                if only_current_asin:
-                    url = (
-                        f"{self.base_url}/product-reviews/{asin}/"
-                        f"?pageNumber={current_page}"
-                        f"&filterByStar={STAR_FILTER[star]}"
-                        f"&formatType=current_format"
-                    )
-                else:
-                    url = (
-                        f"{self.base_url}/product-reviews/"
-                        f"{asin}/?pageNumber={current_page}"
-                        f"&filterByStar={STAR_FILTER[star]}"
-                    )
-                driver.get(url)
-                facing_captcha = driver.check_facing_catpcha()
-                if (
-                    driver.title == self.title_503
-                ) or (
-                    driver.title == self.sign_in_title
-                ) or facing_captcha or (
-                    driver.title == self.not_found_title
-                ):
-                    self.re_init_driver(driver, url)
-                    driver = self.local_context.driver
-                    driver.get(url)
 
-                soup = BeautifulSoup(
-                    driver.page_source,
-                    "html.parser",
-                )
-                if current_page == 1:
-                    num_page = self.get_num_page(driver.page_source)
-                    if not num_page:
-                        self.logging.warning("CANNOT GET NUM PAGE")
-                        break
-                    self.logging.info(
-                        f"ASIN: {asin}, STAR: {star}, NUM PAGE, {num_page}"
-                    )
-                result.append(
-                    self.process_response_data(soup)
-                )
+        num_page = self.get_num_page(page_source)
+        star_counts = self.get_star_counts(page_source)
+        redirect_asin = self.get_redirect_asin(driver, asin)
 
-        return result
+        return redirect_asin, num_page, star_counts
 
-    def process_filter_by_variations(
+    def process_asin(
         self,
-        asin: str,
-        variations: dict,
-    ) -> list:
-        driver = self.local_context.driver
-        total_result = []
-        for variation in variations.values():
+        job: AsinJob,
+    ) -> None:
+        self.logging.info(
+            f"Worker start {job.asin}, idx {job.idx}"
+        )
+        job.checkpoint = ReviewCheckpoint(
+            minio=self.minio,
+            file_path=f"{self.checkpoint_path}/{job.asin}",
+            bucket_name=self.bucket,
+        )
+        if job.checkpoint.resumed_keys:
             self.logging.info(
-                f"PROCESSING VARIATION {variation}, ORIGINAL ASIN {asin}"
+                f"ASIN {job.asin} RESUMES WITH "
+                f"{len(job.checkpoint.resumed_keys)} PAGES DONE"
             )
-            result = []
-            driver.get(
-                f"{self.base_url}/product-reviews/{variation}/"
-                f"?pageNumber=1&formatType=current_format"
-            )
-            num_page = self.get_num_page(driver.page_source)
-            if not num_page:
-                pass
-            elif num_page < 10:
-                result = self.process_asin_below_limit(
-                    variation,
-                    num_page,
-                    only_current_asin=True,
-                )
-            else:
-                result = self.process_filter_by_star(
-                    variation,
-                    only_current_asin=True,
-                )
-            total_result.extend(result)
+        if self.incremental:
+            state = self.state.get(job.asin)
+            if state and state.get("latest_date"):
+                job.since = state["latest_date"]
+                # states written before review ids only have the date
+                job.known_ids = state.get("latest_ids", [])
+                self.process_recent(job)
+                return
+
+        self.process_full(job)
+
+    def process_full(
+        self,
+        job: AsinJob,
+    ) -> None:
+        """
+        Crawl every review of an ASIN reachable through the filters,
+        in incremental mode the known reviews are still dropped
+        """
 
-        return total_result
+        first_page_info = self.process_first_page(job.asin)
+        asin_redirect_to = first_page_info[0]
+        num_page = first_page_info[1]
+        star_counts = first_page_info[2]
 
-    def process_asin_below_limit(
+        if not num_page:
+            return
+        if num_page < 10:
+            self.process_asin_below_limit(
+                job,
+                asin_redirect_to,
+                num_page,
+            )
+        else:
+            self.process_asin_above_limit(
+                job,
+                asin_redirect_to,
+                star_counts,
+            )
+
+    def process_recent(
         self,
-        asin: str,
-        num_page: int,
-        only_current_asin: bool = False,
-    ) -> list:
-        driver = self.local_context.driver
+        job: AsinJob,
+    ) -> None:
+        """
+        Crawl the newest reviews of an ASIN, pages sorted by most
+        recent are read until one reaches the reviews already crawled,
+        the filters are crawled when the 10 recent pages do not reach
+        them so that no new review is lost before the state moves on
+        """
 
-        result = []
-        for current_page in range(1, 11):
+        checkpoint = job.checkpoint
+        # page where a previous attempt reached the known reviews
+        reached_page = checkpoint.get_num_page(job.asin, "recent")
+        for current_page in range(1, (reached_page or 10) + 1):
+            page_key = checkpoint.page_key(
+                job.asin,
+                "recent",
+                current_page,
+            )
+            if checkpoint.is_done(page_key):
+                self.logging.info(f"PAGE {page_key} DONE, SKIP")
+                continue
             self.logging.info(
-                f"PROCESSING ASIN {asin}, page {current_page},"
+                f"PROCESSING ASIN {job.asin}, page {current_page}, "
+                f"since {job.since}"
             )
-            if current_page > num_page:
+            page = self.crawl_page(
+                job,
+                self.review_url(
+                    job.asin,
+                    current_page,
+                    sort_by="recent",
+                ),
+                page_key,
+            ).result()
+            if page["num_known"] or len(page["reviews"]["DATETIME"]) < 10:
                 self.logging.info(
-                    f"current page is {current_page} "
-                    f"larger than {num_page}, exit"
+                    f"ASIN {job.asin} REACHED KNOWN REVIEWS "
+                    f"AT PAGE {current_page}"
                 )
+                reached_page = current_page
+                checkpoint.set_num_page(job.asin, "recent", reached_page)
                 break
-            if only_current_asin:
-                url = (
-                    f"{self.base_url}/product-reviews/{asin}/"
-                    f"?pageNumber={current_page}&formatType=current_format"
-                )
-            else:
-                url = (
-                    f"{self.base_url}/product-reviews/{asin}/"
-                    f"?pageNumber={current_page}"
-                )
 
-            driver.get(url)
-            self.logging.info(
-                f"PROCESSING ASIN {asin}, page "
-                f"{current_page}, title is {driver.title}"
-            )
-            facing_captcha = driver.check_facing_catpcha()
+        if reached_page:
+            return
+        self.logging.info(
+            f"ASIN {job.asin} HAS MORE NEW REVIEWS THAN THE RECENT "
+            f"PAGES SHOW, CRAWL THE FILTERS"
+        )
+        self.process_full(job)
 
-            if (
-                driver.title == self.title_503
-            ) or (
-                driver.title == self.sign_in_title
-            ) or facing_captcha or (
-                driver.title == self.not_found_title
-            ):
-                self.re_init_driver(driver, url)
-                driver = self.local_context.driver
-                driver.get(url)
+    def process_page(
+        self,
+        job: AsinJob,
+        asin: str,
+        page: int,
+        star: str = None,
+        only_current_asin: bool = False,
+    ) -> None:
+        self.logging.info(
+            f"PROCESSING ASIN {asin}, page {page}, star {star}"
+        )
+        self.crawl_page(
+            job,
+            self.review_url(asin, page, star, only_current_asin),
+            job.checkpoint.page_key(
+                asin,
+                self.filter_key(star, only_current_asin),
+                page,
+            ),
+        )
 
-            soup = BeautifulSoup(
-                driver.page_source,
-                "html.parser",
+    def process_asin_below_limit(
+        self,
+        job: AsinJob,
+        asin: str,
+        num_page: int,
+        star: str = None,
+        only_current_asin: bool = False,
+        first_page: int = 1,
+    ) -> None:
+        """
+        Queue one unit per page of a filter whose page count is known
+        """
+
+        filter_key = self.filter_key(star, only_current_asin)
+        # amazon shows at most 10 pages per filter
+        for current_page in range(first_page, min(num_page, 10) + 1):
+            page_key = job.checkpoint.page_key(
+                asin,
+                filter_key,
+                current_page,
             )
-            result.append(
-                self.process_response_data(soup)
+            if job.checkpoint.is_done(page_key):
+                self.logging.info(f"PAGE {page_key} DONE, SKIP")
+                continue
+            self.submit_unit(
+                job,
+                self.process_page,
+                asin,
+                current_page,
+                star,
+                only_current_asin,
             )
 
-        return result
-
-    def process_asin_above_limit(
+    def process_star(
         self,
+        job: AsinJob,
         asin: str,
-        variations: dict,
-    ) -> list:
-        if variations:
+        star: str,
+        only_current_asin: bool = False,
+    ) -> None:
+        """
+        Find the page count of a star filter from its first page,
+        then queue its other pages
+        """
+
+        checkpoint = job.checkpoint
+        filter_key = self.filter_key(star, only_current_asin)
+        first_page = 1
+        # known when a previous run already went through page 1
+        num_page = checkpoint.get_num_page(asin, filter_key)
+        if num_page is None:
+            url = self.review_url(asin, 1, star, only_current_asin)
+            page_key = checkpoint.page_key(asin, filter_key, 1)
+            if checkpoint.is_done(page_key):
+                num_page = self.get_num_page(self.load_page(url))
+            else:
+                self.logging.info(
+                    f"PROCESSING ASIN {asin}, page 1, star {star}"
+                )
+                # the page count of the filter is needed to go on,
+                # it comes from the same parse as the reviews
+                num_review = self.crawl_page(
+                    job,
+                    url,
+                    page_key,
+                ).result()["num_review"]
+                num_page = math.ceil(num_review / 10) if num_review else 0
+            if not num_page:
+                self.logging.warning("CANNOT GET NUM PAGE")
+            num_page = num_page or 0
+            checkpoint.set_num_page(asin, filter_key, num_page)
+            first_page = 2
             self.logging.info(
-                f"ASIN: {asin} HAVE {len(variations)} VARIATIONS"
+                f"ASIN: {asin}, STAR: {star}, NUM PAGE, {num_page}"
             )
-        if variations is None or len(variations) < 5:
-            self.logging.info(
-                f"PROCESS ASIN: {asin} BY STAR"
+
+        self.process_asin_below_limit(
+            job,
+            asin,
+            num_page,
+            star,
+            only_current_asin,
+            first_page,
+        )
+
+    def process_filter_by_star(
+        self,
+        job: AsinJob,
+        asin: str,
+        star_counts: dict = None,
+        only_current_asin: bool = False,
+    ) -> None:
+        # every star is probed, a star is only skipped once its own
+        # filter page shows no review, see `process_star`
+        for star in STAR_FILTER.values():
+            if star_counts and star_counts.get(star) is None:
+                self.logging.info(
+                    f"ASIN: {asin}, STAR: {star} SHOWN AS 0%, PROBE"
+                )
+            self.submit_unit(
+                job,
+                self.process_star,
+                asin,
+                star,
+                only_current_asin,
             )
-            result = self.process_filter_by_star(asin)
-        elif len(variations) >= 5 and len(variations) <= 15:
-            self.logging.info(
-                f'PROCESS ASIN: {asin} BY VARIATION. VARIATION: {variations}'
+
+    def process_variation(
+        self,
+        job: AsinJob,
+        variation: str,
+    ) -> None:
+        self.logging.info(
+            f"PROCESSING VARIATION {variation}, ORIGINAL ASIN {job.asin}"
+        )
+        page_source = self.load_page(
+            self.review_url(
+                variation,
+                1,
+                only_current_asin=True,
             )
-            result = self.process_filter_by_variations(
-                asin,
-                variations,
+        )
+        num_page = self.get_num_page(page_source)
+        if not num_page:
+            pass
+        elif num_page < 10:
+            self.process_asin_below_limit(
+                job,
+                variation,
+                num_page,
+                only_current_asin=True,
             )
         else:
-            self.logging.info(
-                f'PROCESS ASIN: {asin} BY STAR'
+            self.process_filter_by_star(
+                job,
+                variation,
+                self.get_star_counts(page_source),
+                only_current_asin=True,
             )
-            result = self.process_filter_by_star(asin)
 
-        return result
+    def process_filter_by_variations(
+        self,
+        job: AsinJob,
+        variations: list,
+    ) -> None:
+        for variation in variations:
+            self.submit_unit(
+                job,
+                self.process_variation,
+                variation,
+            )
 
-    def task(
+    def process_asin_above_limit(
         self,
+        job: AsinJob,
         asin: str,
-        path: str,
-        idx: int,
+        star_counts: dict,
     ) -> None:
-        # access the unique key for the worker thread
-        self.logging.info(
-            f"Worker start {asin}, idx {idx}"
+        plan, variation_asins = self.plan_filters(
+            asin,
+            star_counts,
         )
-        first_page_info = self.process_first_page(asin)
-        asin_redirect_to = first_page_info[0]
-        num_page = first_page_info[1]
-        variations = first_page_info[2]
-
-        if not num_page:
-            df = pd.DataFrame(
-                {
-                    "PROFILE_NAME": [],
-                    "PROFILE_URL": [],
-                    "VERIFIED_PURCHASE": [],
-                    "VARIATION_ASIN": [],
-                    "VARIATION_TEXT": [],
-                    "RATING_STARS": [],
-                    "REVIEW_TITLE": [],
-                    "REVIEW_BODY": [],
-                    "HELPFUL_VOTE": [],
-                    "IMAGES_URL": [],
-                    "LOCATION": [],
-                    "DATETIME": [],
-                }
+        if plan == "variation":
+            self.logging.info(
+                f"PROCESS ASIN: {asin} BY VARIATION. "
+                f"VARIATION: {variation_asins}"
             )
-            self.minio.load_data(
-                data=df,
-                file_path=path,
-                file_name=asin,
-                bucket_name=self.bucket,
-            )
-            return
-
-        if num_page < 10:
-            result = self.process_asin_below_limit(
-                asin_redirect_to,
-                num_page,
+            self.process_filter_by_variations(
+                job,
+                variation_asins,
             )
         else:
-            result = self.process_asin_above_limit(
-                asin_redirect_to,
-                variations,
+            self.logging.info(
+                f"PROCESS ASIN: {asin} BY STAR"
             )
-
-        df = pd.DataFrame()
-        for page in result:
-            df = pd.concat(
-                [df, pd.DataFrame(page)],
-                ignore_index=True,
+            self.process_filter_by_star(
+                job,
+                asin,
+                star_counts,
             )
 
-        self.minio.load_data(
-            data=df,
-            file_path=path,
-            file_name=asin,
-            bucket_name=self.bucket,
+    def write_asin(
+        self,
+        job: AsinJob,
+    ) -> None:
+        """
+        Reassemble the pages of an ASIN crawled by every worker
+        and write them as a single file
+        """
+
+        checkpoint = job.checkpoint
+        # a review reached through several filters is written once
+        accumulator = ReviewColumnAccumulator(
+            spill_every=self.spill_every,
+            key="REVIEW_ID",
         )
+        dates = list()
+        ids = list()
+        try:
+            # pages finished by previous runs come from the checkpoint
+            for table in checkpoint.load_resumed_pages():
+                accumulator.append_table(table)
+                dates.extend(table.column("DATETIME").to_pylist())
+                ids.extend(table.column("REVIEW_ID").to_pylist())
+            # wait for the parser processes, pages were parsed
+            # while the workers kept browsing
+            for future in job.pages:
+                reviews = future.result()["reviews"]
+                accumulator.append(reviews)
+                dates.extend(reviews["DATETIME"])
+                ids.extend(reviews["REVIEW_ID"])
+
+            spill_path = accumulator.finish()
+            if spill_path:
+                self.minio.load_file(
+                    local_path=spill_path,
+                    file_path=self.saving_path,
+                    file_name=job.asin,
+                    bucket_name=self.bucket,
+                )
+            else:
+                self.minio.load_table(
+                    table=accumulator.to_table(),
+                    file_path=self.saving_path,
+                    file_name=job.asin,
+                    bucket_name=self.bucket,
+                )
+        finally:
+            accumulator.cleanup()
+        if accumulator.num_duplicates:
+            self.logging.info(
+                f"ASIN {job.asin} DROPPED "
+                f"{accumulator.num_duplicates} DUPLICATED REVIEWS"
+            )
+
+        self.update_state(job, dates, ids)
+        # every part must be written before the checkpoint is removed
+        for future in checkpoint.pending:
+            future.result()
+        checkpoint.clear()
 
     def main(
         self,
         asin_li: list,
+        use_display: bool = True,
     ) -> None:
+        """
+        Crawl reviews of the given ASINs
+
+        :param asin_li: list of ASINs to crawl
+        :param use_display: whether to start a virtual display
+            for this run, set it to False when the caller
+            already manages a shared display
+            defaults to True
+
+        :return: None, raise an exception if no driver can be built,
+            the ASINs left are counted as failed
+        """
+
         start_time = time.time()
 
         # start a virtual display
-        disp = Display()
-        disp.start()
+        disp = None
+        if use_display:
+            disp = self.lifecycle.start_display()
+
+        self.progress = {
+            'total': len(asin_li),
+            'skipped': 0,
+            'crawled': 0,
+            'retried': 0,
+            'failed': 0,
+        }
+        self.progress_lock = threading.Lock()
+
+        # warm up drivers in background before workers need them
+        self.driver_pool = AMZDriverPool(
+            factory=self._generate_driver,
+            size=self.num_worker,
+            bad_titles=[
+                self.title_503,
+                self.sign_in_title,
+                self.not_found_title,
+            ],
+            logger=self.logging,
+            lifecycle=self.lifecycle,
+        )
+        self.driver_pool.start()
+        # parse pages in other processes, out of the GIL of the crawlers
+        get_parser_pool(self.num_parser)
+
+        # write page checkpoints without blocking the crawlers
+        self.checkpoint_writer = ThreadPoolExecutor(
+            max_workers=4,
+            thread_name_prefix='checkpoint_writer',
+        )
 
         with ThreadPoolExecutor(
             max_workers=self.num_worker,
             initializer=self.init_worker,
         ) as executor:
-            mapping = {}
-            futures = []
-
+            # units of an ASIN are queued by the workers themselves
+            self.executor = executor
+            queue = collections.deque()
             for idx, asin in enumerate(asin_li):
                 if self._check_asin_crawled(asin):
                     self.logging.info(
                         f"ASIN {asin} CRAWLED, SKIP"
                     )
+                    self.progress['skipped'] += 1
                 else:
-                    future = executor.submit(
-                        self.task,
-                        asin,
-                        self.saving_path,
-                        idx,
-                    )
-                    mapping[future] = asin
-                    futures.append(future)
+                    queue.append((asin, idx))
+
+            # bound the ASINs in flight, their parsed pages
+            # are kept until the ASIN is written
+            active = {}
+            while queue or active:
+                # no ASIN can be crawled once the pool gave up on drivers
+                while (
+                    queue
+                    and len(active) < self.max_active_asin
+                    and not self.driver_pool.build_error
+                ):
+                    asin, idx = queue.popleft()
+                    active[self.submit_job(asin, idx)] = (asin, False)
+                if not active:
+                    break
+
+                done, _ = wait(
+                    active,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    asin, retried = active.pop(future)
+                    if not future.exception():
+                        with self.progress_lock:
+                            self.progress['crawled'] += 1
+                        continue
 
-            for future in as_completed(futures):
-                if future.exception():
                     self.logging.exception(
                         f"EXCEPTION: {future.exception()}. "
-                        f"ASIN {mapping[future]}"
+                        f"ASIN {asin}"
                     )
+                    if retried or self.driver_pool.build_error:
+                        with self.progress_lock:
+                            self.progress['failed'] += 1
+                        continue
                     try:
-                        executor.submit(
-                            self.task,
-                            mapping[future],
-                            self.saving_path,
-                            1,
-                        )
+                        active[self.submit_job(asin, 1)] = (asin, True)
+                        with self.progress_lock:
+                            self.progress['retried'] += 1
                     except Exception as e:
                         self.logging.exception("CANNOT RESEND TASK")
                         self.logging.exception(e)
-                else:
-                    pass
-
-            [
-                executor.submit(
-                    self.quit,
-                    self.local_context,
-                )
-                for _ in range(self.num_worker)
-            ]
-
-        disp.stop()
+                        with self.progress_lock:
+                            self.progress['failed'] += 1
+
+            with self.progress_lock:
+                self.progress['failed'] += len(queue)
+
+        # the parser pool is left to the other crawlers of the process,
+        # every page of this run was waited for by write_asin
+        self.driver_pool.close()
+        self.checkpoint_writer.shutdown(wait=True)
+        if disp:
+            self.lifecycle.stop_display(disp)
         end_time = time.time()
         self.total_time = round(end_time - start_time, 1)
         self.logging.info(
             f"Total run time: {self.total_time}"
         )
+        self.logging.info(
+            f"Captcha metrics: {get_captcha_service().get_metrics()}"
+        )
+        # the run of the country fails, not only its ASINs
+        if self.driver_pool.build_error:
+            raise Exception(
+                f"CANNOT BUILD DRIVERS: {self.driver_pool.build_error}"
+            )
 
 
 if __name__ == "__main__":
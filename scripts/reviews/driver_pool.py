@@ -0,0 +1,289 @@
+import queue
+import random
+import logging
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+# put in the ready queue to wake the callers waiting for a driver
+# once the pool gave up building drivers
+_BUILD_FAILED = object()
+
+
+class AMZDriverPool:
+    """
+    Pool of ready-to-use web drivers, replacement drivers are built
+    and warmed up in background threads so that a worker never waits
+    for a driver to be created when its current one goes bad
+    :param factory: callable building a new warmed-up driver
+    :param size: number of drivers in use at the same time,
+        usually the number of workers
+    :param num_spare: number of extra ready drivers kept warm
+        defaults to 1
+    :param num_builder: number of drivers built at the same time
+        defaults to 2
+    :param bad_titles: page titles of an unusable driver
+        defaults to []
+    :param logger: logger to write to
+        defaults to None
+    :param lifecycle: tracks the browsers of the pool, caps their
+        memory and number across the pools sharing it
+        and kills what is left of them on quit
+        defaults to None
+    :param max_build_failures: number of builds failing in a row
+        before the pool gives up and fails the waiting callers
+        defaults to 8
+    :param build_backoff: seconds to wait after the first failed
+        build, doubled by every failure in a row up to a minute
+        defaults to 1
+    """
+
+    def __init__(
+        self,
+        factory: callable,
+        size: int,
+        num_spare: int = 1,
+        num_builder: int = 2,
+        bad_titles: list = [],
+        logger: logging.Logger = None,
+        lifecycle: callable = None,
+        max_build_failures: int = 8,
+        build_backoff: float = 1,
+    ) -> None:
+        self.factory = factory
+        self.lifecycle = lifecycle
+        self.max_build_failures = max_build_failures
+        self.build_backoff = build_backoff
+        self.target = size + num_spare
+        self.bad_titles = bad_titles
+        self.logging = logger or logging.getLogger(__name__)
+
+        self.ready = queue.Queue()
+        self.lock = threading.Lock()
+        self.drivers = set()
+        self.num_building = 0
+        self.num_failures = 0
+        self.build_error = None
+        self.closed = False
+        self.stop_event = threading.Event()
+        self.builder = ThreadPoolExecutor(
+            max_workers=num_builder,
+            thread_name_prefix='driver_builder',
+        )
+        self.reaper = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix='driver_reaper',
+        )
+
+    def start(self) -> None:
+        """
+        Start warming up drivers in background
+        """
+
+        self._schedule_builds()
+
+    def _schedule_builds(self) -> None:
+        with self.lock:
+            if self.closed or self.build_error:
+                return
+            num_missing = (
+                self.target - len(self.drivers) - self.num_building
+            )
+            for _ in range(num_missing):
+                self.num_building += 1
+                self.builder.submit(self._build)
+
+    def _build(self) -> None:
+        driver = None
+        error = None
+        try:
+            # do not start a browser the host has no memory for
+            if self.lifecycle:
+                self.lifecycle.wait_for_budget()
+            # the browser is untracked until the factory returns
+            building = (
+                self.lifecycle.building(self.stop_event)
+                if self.lifecycle else nullcontext()
+            )
+            with building:
+                driver = self.factory()
+                if self.lifecycle:
+                    self.lifecycle.register(driver)
+        except Exception as e:
+            self.logging.warning(f'CANNOT BUILD DRIVER: {e}')
+            error = e
+
+        with self.lock:
+            self.num_building -= 1
+            closed = self.closed
+            if driver:
+                self.num_failures = 0
+                if not closed:
+                    self.drivers.add(driver)
+            else:
+                self.num_failures += 1
+            num_failures = self.num_failures
+
+        if driver and closed:
+            self._quit(driver)
+        elif driver:
+            self.logging.info(f'Driver {driver} is ready')
+            self.ready.put(driver)
+        elif closed:
+            # e.g. a build stopped waiting for a browser slot
+            return
+        elif num_failures >= self.max_build_failures:
+            self._give_up(error)
+        else:
+            # back off before trying another proxy, e.g. a dead proxy
+            # or a chromedriver mismatch fails every build
+            delay = min(
+                60,
+                self.build_backoff * 2 ** (num_failures - 1),
+            ) * (1 + random.random() / 2)
+            if not self.stop_event.wait(delay):
+                self._schedule_builds()
+
+    def _give_up(
+        self,
+        error: Exception,
+    ) -> None:
+        with self.lock:
+            if self.build_error:
+                return
+            self.build_error = error
+        self.logging.error(
+            f'{self.num_failures} DRIVER BUILDS FAILED IN A ROW, '
+            f'STOP BUILDING: {error}'
+        )
+        self.ready.put(_BUILD_FAILED)
+
+    def is_healthy(
+        self,
+        driver: callable,
+    ) -> bool:
+        """
+        Check whether the driver is still alive and not blocked
+
+        :param driver: the driver to check
+
+        :return: True if the driver can take work
+            otherwise False
+        """
+
+        try:
+            driver.execute_script('return document.readyState')
+            if self.lifecycle and self.lifecycle.is_bloated(driver):
+                self.logging.info(f'Driver {driver} is over its memory cap')
+                return False
+            return driver.title not in self.bad_titles
+        except Exception:
+            return False
+
+    def acquire(
+        self,
+        timeout: float = None,
+    ) -> callable:
+        """
+        Get a healthy driver, blocking until one is ready
+
+        :param timeout: max seconds to wait
+            defaults to None, i.e. wait forever
+
+        :return: a ready driver,
+            raise an exception if the pool gave up building drivers
+        """
+
+        while True:
+            driver = self.ready.get(timeout=timeout)
+            if driver is _BUILD_FAILED:
+                # left for the other waiting callers
+                self.ready.put(driver)
+                raise Exception(
+                    f'CANNOT BUILD DRIVERS: {self.build_error}'
+                )
+            if self.is_healthy(driver):
+                return driver
+            self.discard(driver)
+
+    def release(
+        self,
+        driver: callable,
+    ) -> None:
+        """
+        Give a driver back to the pool
+
+        :param driver: the driver to give back
+        """
+
+        if self.is_healthy(driver):
+            self.ready.put(driver)
+        else:
+            self.discard(driver)
+
+    def discard(
+        self,
+        driver: callable,
+    ) -> None:
+        """
+        Quit a bad driver in background and warm up its replacement
+
+        :param driver: the driver to throw away
+        """
+
+        with self.lock:
+            self.drivers.discard(driver)
+        self.reaper.submit(
+            self._quit,
+            driver,
+        )
+        self._schedule_builds()
+
+    def replace(
+        self,
+        driver: callable,
+        timeout: float = None,
+    ) -> callable:
+        """
+        Throw away a bad driver and get a ready one
+
+        :param driver: the driver to throw away
+        :param timeout: max seconds to wait for a ready driver
+            defaults to None, i.e. wait forever
+
+        :return: a ready driver
+        """
+
+        self.discard(driver)
+
+        return self.acquire(timeout)
+
+    def _quit(
+        self,
+        driver: callable,
+    ) -> None:
+        if self.lifecycle:
+            self.lifecycle.quit(driver)
+            return
+        try:
+            driver.quit()
+        except Exception as e:
+            self.logging.warning(f'CANNOT QUIT DRIVER: {e}')
+
+    def close(self) -> None:
+        """
+        Stop building drivers and quit every driver of the pool
+        """
+
+        with self.lock:
+            self.closed = True
+            drivers = list(self.drivers)
+            self.drivers.clear()
+        self.stop_event.set()
+        self.builder.shutdown(
+            wait=True,
+            cancel_futures=True,
+        )
+        for driver in drivers:
+            self._quit(driver)
+        self.reaper.shutdown(wait=True)
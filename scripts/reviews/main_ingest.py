@@ -4,8 +4,11 @@ import re
 import warnings
 import time
 import datetime
+import threading
+from concurrent.futures \
+    import ThreadPoolExecutor, as_completed
+
 import pytz
-import yaml
 
 sys.path.append(
     re.search(
@@ -16,8 +19,14 @@ sys.path.append(
 
 warnings.filterwarnings('ignore')
 
-from scripts.reviews.crawler import AMZReview       # noqa: E402
-from scripts.utils.ggsheet import GGSheetUtils      # noqa: E402
+from scripts.reviews.crawler \
+    import AMZReview, get_parser_pool               # noqa: E402
+from scripts.utils.minio_pd import MinioUtils       # noqa: E402
+from scripts.utils.config_loader import load_config     # noqa: E402
+from scripts.asin_catalog.snapshot \
+    import AsinCatalogSnapshot                      # noqa: E402
+from scripts.utils.browser_lifecycle \
+    import get_browser_lifecycle                    # noqa: E402
 
 
 def gen_rundate_path() -> str:
@@ -42,51 +51,22 @@ class AMZReviewExtract:
             'config',
         )
         # load config file
-        with open(
+        self.cfg = load_config(
             f"{self.config_dir}/config.yaml"
-        ) as file:
-            self.cfg = yaml.safe_load(file)
-
-        self.marketplace = {
-            'US': 'USA',
-            'UK': 'GBR',
-            'IN': 'IND',
-            'MX': 'MEX',
-            'IT': 'ITA',
-            'FR': 'FRA',
-            'ES': 'ESP',
-            'JP': 'JPN',
-            'CA': 'CAN',
-            'DE': 'DEU'
-        }
-
-    def get_asins(self) -> list:
-        creds = self.cfg.get('ggsheet_creds')
-
-        sheet_id = self.cfg.get('ggsheet').get('asin_sheet_id')
-
-        if self.country == 'USA':
-            sheet_name = 'us'
-        else:
-            sheet_name = 'int'
-
-        ggsheet = GGSheetUtils(creds)
-
-        asins_df = ggsheet.get_data(
-            sheet_id=sheet_id,
-            sheet_name=sheet_name,
-            range_from='A',
-            range_to='B',
-            columns_first_row=True,
         )
 
-        asins_df['country'] = asins_df['country'].apply(
-            lambda x: self.marketplace[x]
+    def get_asins(self) -> list:
+        snapshot = AsinCatalogSnapshot(
+            minio=MinioUtils(
+                endpoint=self.cfg['minio'].get('host'),
+                access_key=self.cfg['minio'].get('key'),
+                secret=self.cfg['minio'].get('secret'),
+            ),
+            user_creds=self.cfg.get('ggsheet_creds'),
+            sheet_id=self.cfg.get('ggsheet').get('asin_sheet_id'),
         )
 
-        return asins_df[
-            asins_df['country'] == self.country
-        ]['asin'].to_list()
+        return snapshot.get_asins(self.country)
 
     def main(self) -> None:
         asins = self.get_asins()
@@ -105,20 +85,189 @@ class AMZReviewExtract:
         crawler.main(asins)
 
 
+class AMZReviewOrchestrator:
+    """
+    Run the review crawl of several countries at the same time
+    under a global browser budget, all countries share
+    one virtual display
+    :param countries: list of countries to crawl
+    :param rundate_path: the run date path of the output
+    :param max_workers: total number of browsers of all countries,
+        a browser freed by a country goes to the next one waiting
+        defaults to 20
+    :param max_workers_per_country: max number of browser workers
+        of a single country
+        defaults to 5
+    :param report_interval: seconds between two progress reports
+        defaults to 60
+    :param incremental: only crawl the reviews newer than
+        the previous run of every ASIN
+        defaults to False
+    :param num_parser: number of processes parsing the review pages
+        of every country
+        defaults to None, i.e. the number of CPUs
+    :param lean_browsing: run the browsers headless and block images,
+        fonts, media and ads, turn it off to watch them when debugging
+        defaults to True
+    """
+
+    def __init__(
+        self,
+        countries: list,
+        rundate_path: str,
+        max_workers: int = 20,
+        max_workers_per_country: int = 5,
+        report_interval: int = 60,
+        incremental: bool = False,
+        num_parser: int = None,
+        lean_browsing: bool = True,
+    ) -> None:
+        self.countries = countries
+        self.rundate_path = rundate_path
+        self.max_workers = max_workers
+        self.max_workers_per_country = max_workers_per_country
+        self.report_interval = report_interval
+        self.incremental = incremental
+        self.num_parser = num_parser
+        self.lean_browsing = lean_browsing
+        self.crawlers = dict()
+        # browsers of every country count against one memory
+        # and one browser cap
+        self.lifecycle = get_browser_lifecycle(
+            max_browsers=max_workers,
+        )
+
+    def allocate_workers(
+        self,
+        asins_by_country: dict,
+    ) -> dict:
+        """
+        Get the number of workers of every country, the browsers
+        of the workers are capped by the shared lifecycle, so a
+        worker without a browser waits for one freed by any country
+
+        :param asins_by_country: mapping of country and its ASINs
+
+        :return: mapping of country and its number of workers
+        """
+
+        return {
+            country: min(
+                len(asins),
+                self.max_workers_per_country,
+                self.max_workers,
+            )
+            for country, asins in asins_by_country.items()
+            if len(asins) > 0
+        }
+
+    def run_country(
+        self,
+        country: str,
+        asins: list,
+        num_worker: int,
+    ) -> None:
+        crawler = AMZReview(
+            num_worker,
+            self.rundate_path,
+            country,
+            lean_browsing=self.lean_browsing,
+            incremental=self.incremental,
+            lifecycle=self.lifecycle,
+        )
+        self.crawlers[country] = crawler
+        crawler.main(
+            asins,
+            use_display=False,
+        )
+
+    def report_progress(
+        self,
+        stop_event: threading.Event,
+    ) -> None:
+        while not stop_event.wait(self.report_interval):
+            for country, crawler in list(self.crawlers.items()):
+                progress = getattr(crawler, 'progress', None)
+                if not progress:
+                    continue
+                print(
+                    f'[{country}] '
+                    f'crawled {progress["crawled"]}, '
+                    f'skipped {progress["skipped"]}, '
+                    f'retried {progress["retried"]}, '
+                    f'failed {progress["failed"]} '
+                    f'of {progress["total"]} asins'
+                )
+
+    def main(self) -> None:
+        asins_by_country = {
+            country: AMZReviewExtract(
+                country,
+                self.rundate_path,
+            ).get_asins()
+            for country in self.countries
+        }
+        allocation = self.allocate_workers(asins_by_country)
+        print(f'Workers by country: {allocation}')
+        print(f'on {self.rundate_path}')
+
+        # one display shared by every browser of every country
+        disp = self.lifecycle.start_display()
+        # one parser pool shared by every country, sized once here
+        get_parser_pool(self.num_parser)
+
+        stop_event = threading.Event()
+        reporter = threading.Thread(
+            target=self.report_progress,
+            args=(stop_event,),
+            daemon=True,
+        )
+        reporter.start()
+
+        try:
+            with ThreadPoolExecutor(
+                max_workers=max(1, len(allocation)),
+            ) as executor:
+                futures = {
+                    executor.submit(
+                        self.run_country,
+                        country,
+                        asins_by_country[country],
+                        num_worker,
+                    ): country
+                    for country, num_worker in allocation.items()
+                }
+                for future in as_completed(futures):
+                    country = futures[future]
+                    if future.exception():
+                        print(
+                            f'[{country}] failed: {future.exception()}'
+                        )
+                    else:
+                        print(
+                            f'[{country}] done in '
+                            f'{self.crawlers[country].total_time}s'
+                        )
+        finally:
+            stop_event.set()
+            self.lifecycle.stop_display(disp)
+            # nothing of the run may outlive it
+            self.lifecycle.reap()
+
+
 if __name__ == '__main__':
     start = time.time()
 
     # rundate_path = gen_rundate_path()
     rundate_path = '2024/07/04'
-    for country in [
-        'ESP', 'ITA', 'FRA', 'MEX',
-        'GBR', 'DEU', 'CAN', 'USA',
-    ]:
-        job = AMZReviewExtract(
-            country,
-            rundate_path,
-        )
-        job.main()
+    job = AMZReviewOrchestrator(
+        countries=[
+            'ESP', 'ITA', 'FRA', 'MEX',
+            'GBR', 'DEU', 'CAN', 'USA',
+        ],
+        rundate_path=rundate_path,
+    )
+    job.main()
 
     end = time.time()
     print(f'Total run time: {end-start}')
@@ -0,0 +1,528 @@
+import re
+import sys
+import calendar
+import hashlib
+import datetime
+import functools
+import warnings
+from bs4 import BeautifulSoup
+from deep_translator import GoogleTranslator
+
+sys.path.append(
+    re.search(
+        f'.*{re.escape("market_data_platform")}',
+        __file__,
+    ).group()
+)
+
+warnings.filterwarnings('ignore')
+
+from scripts.utils.logger import Logger     # noqa: E402
+from scripts.utils.country_info import (    # noqa: E402
+    MONTHS,
+    REVIEW_DATE_PATTERNS,
+    REVIEW_LANGUAGES,
+    REVIEW_LOCATIONS,
+)
+
+# one logger and translator per parser process, created on first use
+_logger = None
+_translator = None
+_compiled_patterns = {
+    language: [re.compile(i) for i in patterns]
+    for language, patterns in REVIEW_DATE_PATTERNS.items()
+}
+
+
+def _get_logger() -> Logger:
+    global _logger
+
+    if _logger is None:
+        _logger = Logger(name=__name__)
+
+    return _logger
+
+
+@functools.lru_cache(maxsize=4096)
+def translate(text: str) -> str:
+    """
+    Translate a text to english, only used for strings
+    the locale patterns cannot handle, results are cached
+    so that a string is sent to the translator once per process
+
+    :param text: the text to translate
+
+    :return: the translated text
+    """
+
+    global _translator
+
+    if _translator is None:
+        _translator = GoogleTranslator(
+            source='auto',
+            target='en',
+        )
+
+    return _translator.translate(text)
+
+
+def _match_location_date(
+    text: str,
+    language: str,
+) -> tuple:
+    for pattern in _compiled_patterns.get(language, []):
+        match = pattern.search(text)
+        if not match:
+            continue
+        month = match.group("month")
+        if month.isdigit():
+            month = int(month)
+        elif month.lower() in MONTHS.get(language, []):
+            month = MONTHS[language].index(month.lower()) + 1
+        else:
+            continue
+
+        return (
+            match.group("location").strip(),
+            f"{calendar.month_name[month]} "
+            f"{int(match.group('day'))}, {match.group('year')}",
+        )
+
+    return None
+
+
+def parse_location_date(
+    text: str,
+    country: str,
+) -> tuple:
+    """
+    Get the location and date of a review from its
+    "Reviewed in <location> on <date>" line in the language
+    of the country, e.g. "Rezension aus Deutschland vom 4. Juli 2024"
+
+    :param text: the review date line
+    :param country: country of the page
+
+    :return: the english location name and the date formatted
+        as "July 4, 2024", the raw text is kept for
+        a part that cannot be extracted
+    """
+
+    logger = _get_logger()
+
+    result = _match_location_date(
+        text,
+        REVIEW_LANGUAGES.get(country, "en"),
+    )
+    if result is None and country != "USA":
+        # unseen format, fall back to the cached translation
+        try:
+            result = _match_location_date(
+                translate(text),
+                "en",
+            )
+        except Exception:
+            logger.warning(f'CANNOT TRANSLATE: {text}')
+    if result is None:
+        logger.warning(f'CANNOT EXTRACT LOCATION AND DATE: {text}')
+        return text, text
+
+    location, date = result
+    if location in REVIEW_LOCATIONS:
+        location = REVIEW_LOCATIONS[location]
+    elif country not in ["USA", "CAN", "GBR", "AUS", "SGP", "ARE"]:
+        try:
+            location = re.sub(
+                r"^the ",
+                "",
+                translate(location),
+            )
+        except Exception:
+            logger.warning(f'CANNOT TRANSLATE: {location}')
+
+    return location, date
+
+
+def parse_review_date(date: str) -> datetime.date:
+    """
+    Get the date of a review formatted by `parse_location_date`
+
+    :param date: the date, e.g. "July 4, 2024"
+
+    :return: the date
+        otherwise None if it is not formatted
+    """
+
+    try:
+        return datetime.datetime.strptime(
+            date,
+            "%B %d, %Y",
+        ).date()
+    except (TypeError, ValueError):
+        return None
+
+
+def drop_known_reviews(
+    reviews: dict,
+    since: str,
+    known_ids: list = None,
+) -> tuple:
+    """
+    Drop the reviews older than the latest review date
+    of a previous crawl, reviews of that date are kept
+    unless their id was crawled, since they may have
+    been posted after the crawl
+
+    :param reviews: the review columns of a page
+    :param since: the latest review date already crawled,
+        formatted as "2024-07-04"
+    :param known_ids: ids of the crawled reviews of that date
+        defaults to None
+
+    :return: the review columns of the new reviews
+        and the number of dropped reviews
+    """
+
+    since = datetime.date.fromisoformat(since)
+    known_ids = set(known_ids or [])
+    keep = [
+        date is None or date > since or (
+            date == since and review_id not in known_ids
+        )
+        for date, review_id in zip(
+            map(parse_review_date, reviews["DATETIME"]),
+            reviews["REVIEW_ID"],
+        )
+    ]
+    if all(keep):
+        return reviews, 0
+
+    return {
+        name: [
+            value for value, kept in zip(values, keep) if kept
+        ]
+        for name, values in reviews.items()
+    }, keep.count(False)
+
+
+def parse_review_count(text: str) -> int:
+    """
+    Get the number of reviews from the review count text,
+    e.g. "1,234 total ratings, 567 with reviews"
+
+    :param text: the review count text
+
+    :return: the number of reviews
+        otherwise None if the text is empty
+    """
+
+    text = text.strip()
+    if text == "":
+        return None
+
+    return int(
+        re.findall(
+            '[0-9,\\.]+',
+            text,
+        )[-1].replace(
+            ',',
+            '',
+        ).replace(
+            '.',
+            '',
+        )
+    )
+
+
+def parse_star_histogram(text: str) -> dict:
+    """
+    Get the share of every star from the rating histogram text,
+    the rows are listed from 5 stars down to 1 star,
+    e.g. "5 star 62% 4 star 18% ... 1 star 4%"
+
+    :param text: the rating histogram text
+
+    :return: dictionary of star (5 to 1) and its percentage
+        otherwise an empty dictionary if the histogram is incomplete
+    """
+
+    shares = re.findall(
+        '([0-9]+)\\s*%',
+        text,
+    )
+    if len(shares) != 5:
+        return {}
+
+    return {
+        5 - idx: int(share)
+        for idx, share in enumerate(shares)
+    }
+
+
+def parse_review_page(
+    page_source: str,
+    base_url: str,
+    country: str,
+    since: str = None,
+    known_ids: list = None,
+) -> dict:
+    """
+    Parse a review page once, it runs in the parser process pool
+    so that the crawler threads only fetch page sources
+
+    :param page_source: html of the review page
+    :param base_url: the amazon base url of the country
+    :param country: country of the page
+    :param since: the latest review date already crawled,
+        older reviews are dropped, see `drop_known_reviews`
+        defaults to None
+    :param known_ids: ids of the crawled reviews of that date
+        defaults to None
+
+    :return: dictionary with the number of reviews
+        of the current filter ("num_review"),
+        the columns of the reviews of the page ("reviews")
+        and the number of dropped known reviews ("num_known")
+    """
+
+    soup = BeautifulSoup(
+        page_source,
+        "html.parser",
+    )
+    review_count = soup.find(
+        attrs={"data-hook": "cr-filter-info-review-rating-count"}
+    )
+
+    reviews = parse_reviews(
+        soup,
+        base_url,
+        country,
+    )
+    num_known = 0
+    if since:
+        reviews, num_known = drop_known_reviews(
+            reviews,
+            since,
+            known_ids,
+        )
+
+    return {
+        "num_review": parse_review_count(
+            review_count.text if review_count else ""
+        ),
+        "reviews": reviews,
+        "num_known": num_known,
+    }
+
+
+def get_review_id(
+    review: BeautifulSoup,
+    *fields,
+) -> str:
+    """
+    Get a stable id of a review, the id of its element
+    (e.g. "R2ABCDEFGHIJKL") when amazon renders it,
+    otherwise a hash of its content
+
+    :param review: the review element
+    :param fields: content of the review to hash
+
+    :return: the review id
+    """
+
+    review_id = review.get("id")
+    if review_id:
+        return re.sub(
+            r"^customer_review(_foreign)?-",
+            "",
+            review_id,
+        )
+
+    return hashlib.sha1(
+        "\x1f".join(
+            "" if i is None else str(i) for i in fields
+        ).encode()
+    ).hexdigest()
+
+
+def parse_reviews(
+    soup: BeautifulSoup,
+    base_url: str,
+    country: str,
+) -> dict:
+    """Process raw data get from each review page
+
+    Returns:
+        Dict: A dictionary contain all data
+            need to get from current review page.
+    """
+
+    review_ids = []
+    profile_name = []
+    profile_url = []
+    verified = []
+    variation_asin = []
+    variation_text = []
+    ratings = []
+    review_titles = []
+    review_bodys = []
+    helpful_votes = []
+    img_url = []
+    review_locations = []
+    review_dates = []
+
+    reviews = soup.findAll(
+        attrs={"data-hook": "review"}
+    )
+
+    # pattern for regex
+    VARIATION_ASIN_PATTERN = r"/product-reviews/(\w+)"
+
+    for review in reviews:
+        profile_name.append(
+            review.find(class_="a-profile-name").text
+        )
+        try:
+            profile_url.append(
+                base_url + review.find(
+                    class_="a-profile"
+                ).get("href")
+            )
+        except Exception:
+            # Some users can't not access profile
+            profile_url.append(None)
+
+        try:
+            # Verified purchase
+            verified.append(
+                review.find(
+                    attrs={"data-hook": "avp-badge"}
+                ).text
+            )
+        except Exception:
+            verified.append(None)
+
+        try:
+            variation_link = review.find(
+                attrs={"data-hook": "format-strip"}
+            ).get(
+                "href"
+            )
+            variation_asin.append(
+                re.findall(
+                    VARIATION_ASIN_PATTERN, variation_link
+                )[0]
+            )
+        except Exception:
+            # Some asin don't have variations
+            variation_asin.append(None)
+
+        try:
+            variation_text.append(
+                review.find(
+                    attrs={"data-hook": "format-strip"}
+                ).text
+            )
+        except Exception:
+            variation_text.append(None)
+
+        try:
+            ratings.append(
+                review.find(
+                    attrs={"data-hook": "review-star-rating"}
+                ).text
+            )
+        except Exception:
+            ratings.append(
+                review.find(
+                    attrs={"data-hook": "cmps-review-star-rating"}
+                ).text
+            )
+
+        review_titles.append(
+            review.find(
+                attrs={"data-hook": "review-title"}
+            )
+            .find_all("span")[-1]
+            .text.strip()
+        )
+
+        if (
+            "media could not be loaded"
+            not in review.find(
+                attrs={"data-hook": "review-body"}
+            ).text
+        ):
+            review_bodys.append(
+                review.find(
+                    attrs={"data-hook": "review-body"}
+                ).text.strip()
+            )
+        else:
+            review_bodys.append(
+                review.find(
+                    attrs={"data-hook": "review-body"}
+                )
+                .text.strip()
+                .split("\n")[-1]
+            )
+
+        try:
+            helpful_votes.append(
+                review.find(
+                    attrs={"data-hook": "helpful-vote-statement"}
+                ).text
+            )
+        except Exception:
+            helpful_votes.append(None)
+
+        try:
+            all_images_tag = review.find(
+                class_="review-image-tile-section"
+            ).findAll("img")
+            img_url.append(
+                [
+                    image_tag.get("src")
+                    for image_tag in all_images_tag
+                ]
+            )
+        except Exception:
+            img_url.append(None)
+
+        review_location, review_date = parse_location_date(
+            review.find(
+                attrs={"data-hook": "review-date"}
+            ).text.strip(),
+            country,
+        )
+        review_locations.append(review_location)
+        review_dates.append(review_date)
+        review_ids.append(
+            get_review_id(
+                review,
+                profile_name[-1],
+                ratings[-1],
+                review_titles[-1],
+                review_bodys[-1],
+                review_locations[-1],
+                review_dates[-1],
+            )
+        )
+
+    result = {
+        "REVIEW_ID": review_ids,
+        "PROFILE_NAME": profile_name,
+        "PROFILE_URL": profile_url,
+        "VERIFIED_PURCHASE": verified,
+        "VARIATION_ASIN": variation_asin,
+        "VARIATION_TEXT": variation_text,
+        "RATING_STARS": ratings,
+        "REVIEW_TITLE": review_titles,
+        "REVIEW_BODY": review_bodys,
+        "HELPFUL_VOTE": helpful_votes,
+        "IMAGES_URL": img_url,
+        "LOCATION": review_locations,
+        "DATETIME": review_dates,
+    }
+
+    return result
@@ -0,0 +1,87 @@
+import re
+import sys
+import time
+import warnings
+
+sys.path.append(
+    re.search(
+        f'.*{re.escape("market_data_platform")}',
+        __file__,
+    ).group()
+)
+
+warnings.filterwarnings('ignore')
+
+from scripts.utils.minio_pd import MinioUtils       # noqa: E402
+
+
+class ReviewState:
+    """
+    Crawl state of every ASIN kept in MinIO between runs,
+    e.g. the latest review date used by the incremental crawl
+    :param minio: MinIO utils to store the state
+    :param file_path: the directory of the state
+    :param bucket_name: the name of the bucket
+        defaults to 'raw'
+    :param ttl: seconds a state stays valid, None to never expire
+        defaults to None
+    """
+
+    def __init__(
+        self,
+        minio: MinioUtils,
+        file_path: str,
+        bucket_name: str = 'raw',
+        ttl: int = None,
+    ) -> None:
+        self.minio = minio
+        self.file_path = file_path
+        self.bucket_name = bucket_name
+        self.ttl = ttl
+
+    def get(
+        self,
+        asin: str,
+    ) -> dict:
+        """
+        Get the state of an ASIN
+
+        :param asin: the ASIN
+
+        :return: the state
+            otherwise None if the ASIN was never crawled
+            or its state expired
+        """
+
+        if not self.minio.object_exist(
+            object_name=f'{self.file_path}/{asin}.json',
+            bucket_name=self.bucket_name,
+        ):
+            return None
+
+        state = self.minio.get_data_json(
+            file_path=self.file_path,
+            file_name=asin,
+            bucket_name=self.bucket_name,
+        )
+        if self.ttl and (
+            time.time() - state.get('updated_at', 0) > self.ttl
+        ):
+            return None
+
+        return state
+
+    def put(
+        self,
+        asin: str,
+        state: dict,
+    ) -> None:
+        self.minio.load_data_json(
+            data={
+                **state,
+                'updated_at': time.time(),
+            },
+            file_path=self.file_path,
+            file_name=asin,
+            bucket_name=self.bucket_name,
+        )
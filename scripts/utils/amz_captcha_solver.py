@@ -1,9 +1,24 @@
+import re
+import sys
+import warnings
 import requests
 from curl_cffi import requests as requests_cffi
 from bs4 import BeautifulSoup
 from amazoncaptcha import AmazonCaptcha
 from playwright.async_api import Page as AsyncPage
 
+sys.path.append(
+    re.search(
+        f'.*{re.escape("market_data_platform")}',
+        __file__,
+    ).group()
+)
+
+warnings.filterwarnings('ignore')
+
+from scripts.utils.captcha_service \
+    import get_captcha_service      # noqa: E402
+
 
 def solve_captcha(
     session: requests.Session,
@@ -70,7 +85,15 @@ async def async_solve_captcha_cffi(
     soup: BeautifulSoup,
 ) -> requests_cffi.Response:
     captcha_url = soup.find('img')['src']
-    solution = AmazonCaptcha.fromlink(captcha_url).solve()
+    # download with the session and solve in the captcha pool,
+    # the event loop keeps serving the other requests
+    image = (
+        await session.get(
+            url=captcha_url,
+        )
+    ).content
+    service = get_captcha_service()
+    solution = await service.solve_async(image) or ''
     amzn = soup.find(
         'input',
         attrs={"name": "amzn"},
@@ -89,6 +112,10 @@ async def async_solve_captcha_cffi(
         url='https://www.amazon.com/errors/validateCaptcha',
         params=params,
     )
+    service.report(
+        image,
+        accepted='captcha' not in resp.text,
+    )
 
     return resp
 
@@ -99,8 +126,13 @@ async def solve_captcha_playw(
     captcha_character = page.locator(
         '#captchacharacters'
     )
+    service = get_captcha_service()
     solution = None
+    image = None
     while await captcha_character.count() > 0:
+        if image is not None:
+            # still facing a captcha, the last solution was wrong
+            service.report(image, accepted=False)
         captcha_url = await page.locator(
             'div[class="a-row a-text-center"]'
         ).locator(
@@ -108,9 +140,10 @@ async def solve_captcha_playw(
         ).get_attribute(
             'src'
         )
-        solution = AmazonCaptcha.fromlink(
-            captcha_url,
-        ).solve()
+        image = await (
+            await page.request.get(captcha_url)
+        ).body()
+        solution = await service.solve_async(image) or ''
         await page.locator(
             '#captchacharacters'
         ).fill(solution)
@@ -124,5 +157,7 @@ async def solve_captcha_playw(
         captcha_character = page.locator(
             '#captchacharacters'
         )
+    if image is not None:
+        service.report(image, accepted=True)
     if solution:
         print(f'Captcha {solution} solved')
@@ -0,0 +1,438 @@
+import os
+import time
+import atexit
+import logging
+import threading
+import psutil
+from contextlib import contextmanager
+from pyvirtualdisplay import Display
+
+# names of the processes of a selenium driven browser
+BROWSER_PROCESS_NAMES = ('chromedriver', 'chrome', 'chromium')
+
+_lifecycle = None
+_lifecycle_lock = threading.Lock()
+
+
+def _is_browser_process(process: psutil.Process) -> bool:
+    try:
+        name = process.name().lower()
+    except psutil.Error:
+        return False
+
+    return any(i in name for i in BROWSER_PROCESS_NAMES)
+
+
+class BrowserLifecycle:
+    """
+    Track every browser and virtual display started by the process,
+    cap the memory of the browsers on the host and reap the browser
+    processes left behind by a crash or a failed quit
+    :param max_rss: max total RSS in bytes of the tracked browsers,
+        new browsers wait while it is exceeded
+        defaults to 70% of the host memory
+    :param max_driver_rss: max RSS in bytes of a single browser,
+        a bigger one should be recycled
+        defaults to 1.5GB
+    :param max_browsers: max number of browsers started or being
+        built at the same time, new builds wait for a free slot
+        defaults to None, i.e. no cap
+    :param grace_period: seconds a browser process started by this
+        process may stay untracked before it is reaped,
+        the processes started during a build are never reaped
+        before the build ends
+        defaults to 120
+    :param interval: seconds between two sweeps
+        defaults to 30
+    :param logger: logger to write to
+        defaults to None
+    """
+
+    def __init__(
+        self,
+        max_rss: int = None,
+        max_driver_rss: int = 1536 * 1024 * 1024,
+        max_browsers: int = None,
+        grace_period: int = 120,
+        interval: int = 30,
+        logger: logging.Logger = None,
+    ) -> None:
+        self.max_rss = max_rss or int(
+            psutil.virtual_memory().total * 0.7
+        )
+        self.max_driver_rss = max_driver_rss
+        self.max_browsers = max_browsers
+        self.grace_period = grace_period
+        self.interval = interval
+        self.logging = logger or logging.getLogger(__name__)
+
+        self.lock = threading.Lock()
+        # notified when a browser slot may be free
+        self.slot_freed = threading.Condition(self.lock)
+        # driver and the pid of its chromedriver
+        self.drivers = dict()
+        # every browser process seen and its create time,
+        # the create time tells a leaked process from a reused pid
+        self.known_processes = dict()
+        # start time of every build in progress
+        self.builds = dict()
+        self.displays = list()
+        self.stop_event = threading.Event()
+        self.monitor = None
+        atexit.register(self.close)
+
+    @staticmethod
+    def _driver_pid(driver: callable) -> int:
+        try:
+            return driver.service.process.pid
+        except AttributeError:
+            return None
+
+    @staticmethod
+    def _tree(pid: int) -> list:
+        if pid is None:
+            return []
+        try:
+            process = psutil.Process(pid)
+            return [process] + process.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    def _remember(
+        self,
+        processes: list,
+    ) -> None:
+        for process in processes:
+            try:
+                create_time = process.create_time()
+            except psutil.Error:
+                continue
+            with self.lock:
+                self.known_processes[process.pid] = create_time
+
+    def _kill(
+        self,
+        processes: list,
+    ) -> int:
+        alive = list()
+        for process in processes:
+            try:
+                process.kill()
+                alive.append(process)
+            except psutil.Error:
+                pass
+        # waiting also reaps the zombies of direct children
+        psutil.wait_procs(alive, timeout=5)
+
+        return len(alive)
+
+    def start(self) -> None:
+        """
+        Start sweeping leaked browser processes in background
+        """
+
+        with self.lock:
+            if self.monitor is not None:
+                return
+            self.monitor = threading.Thread(
+                target=self._monitor,
+                name='browser_lifecycle',
+                daemon=True,
+            )
+        self.monitor.start()
+
+    def _monitor(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.reap()
+            except Exception as e:
+                self.logging.warning(f'CANNOT REAP BROWSERS: {e}')
+
+    def start_display(self, **kwargs) -> Display:
+        """
+        Start a virtual display tracked by the lifecycle
+
+        :param kwargs: arguments of `pyvirtualdisplay.Display`
+
+        :return: the started display
+        """
+
+        display = Display(**kwargs)
+        display.start()
+        with self.lock:
+            self.displays.append(display)
+
+        return display
+
+    def stop_display(
+        self,
+        display: Display,
+    ) -> None:
+        with self.lock:
+            if display not in self.displays:
+                return
+            self.displays.remove(display)
+        try:
+            display.stop()
+        except Exception as e:
+            self.logging.warning(f'CANNOT STOP DISPLAY: {e}')
+
+    def _is_full(self) -> bool:
+        # called under the lock, a registered driver may still
+        # be counted as a build until its build ends
+        return bool(self.max_browsers) and (
+            len(self.drivers) + len(self.builds) >= self.max_browsers
+        )
+
+    @contextmanager
+    def building(
+        self,
+        stop_event: threading.Event = None,
+    ):
+        """
+        Mark a browser being built, e.g. a driver constructor
+        solving a captcha, so that its processes are not reaped
+        while it is still untracked, the build first waits for
+        a browser slot
+
+        :param stop_event: event of the caller aborting the wait
+            defaults to None
+
+        raise an exception if the wait is aborted
+        """
+
+        token = object()
+        with self.slot_freed:
+            while self._is_full():
+                if self.stop_event.is_set() or (
+                    stop_event and stop_event.is_set()
+                ):
+                    raise Exception('STOPPED WAITING FOR A BROWSER SLOT')
+                self.slot_freed.wait(1)
+            self.builds[token] = time.time()
+        try:
+            yield
+        finally:
+            with self.slot_freed:
+                self.builds.pop(token, None)
+                self.slot_freed.notify_all()
+
+    def register(
+        self,
+        driver: callable,
+    ) -> None:
+        """
+        Track a started browser
+
+        :param driver: the selenium driver of the browser
+        """
+
+        pid = self._driver_pid(driver)
+        with self.lock:
+            self.drivers[driver] = pid
+        self._remember(self._tree(pid))
+
+    def driver_rss(
+        self,
+        driver: callable,
+    ) -> int:
+        """
+        Get the memory of a browser, chromedriver and every
+        chrome process under it
+
+        :param driver: the selenium driver of the browser
+
+        :return: RSS in bytes
+        """
+
+        with self.lock:
+            pid = self.drivers.get(driver)
+        rss = 0
+        for process in self._tree(pid):
+            try:
+                rss += process.memory_info().rss
+            except psutil.Error:
+                pass
+
+        return rss
+
+    def total_rss(self) -> int:
+        with self.lock:
+            drivers = list(self.drivers)
+
+        return sum(self.driver_rss(i) for i in drivers)
+
+    def is_bloated(
+        self,
+        driver: callable,
+    ) -> bool:
+        """
+        Check whether a browser grew over its memory cap
+        and should be recycled
+
+        :param driver: the selenium driver of the browser
+
+        :return: True if it is over the cap
+            otherwise False
+        """
+
+        if not self.max_driver_rss:
+            return False
+
+        return self.driver_rss(driver) > self.max_driver_rss
+
+    def wait_for_budget(
+        self,
+        timeout: float = None,
+    ) -> bool:
+        """
+        Block until the tracked browsers fit in the memory cap,
+        called before a new browser is started
+
+        :param timeout: max seconds to wait
+            defaults to None, i.e. wait forever
+
+        :return: True if there is room for a browser
+            otherwise False on timeout
+        """
+
+        start = time.time()
+        while self.total_rss() >= self.max_rss:
+            if timeout is not None and time.time() - start > timeout:
+                return False
+            self.logging.info(
+                f'BROWSERS USE {self.total_rss() // 2 ** 20}MB, '
+                f'WAIT FOR MEMORY'
+            )
+            if self.stop_event.wait(5):
+                return False
+
+        return True
+
+    def quit(
+        self,
+        driver: callable,
+    ) -> None:
+        """
+        Quit a browser and kill what is left of it
+
+        :param driver: the selenium driver of the browser
+        """
+
+        with self.slot_freed:
+            pid = self.drivers.pop(driver, None)
+            self.slot_freed.notify_all()
+        # the processes are listed before quit, chrome children
+        # are reparented once chromedriver is gone
+        processes = self._tree(pid)
+        self._remember(processes)
+        try:
+            driver.quit()
+        except Exception as e:
+            self.logging.warning(f'CANNOT QUIT DRIVER: {e}')
+        num_killed = self._kill(
+            [i for i in processes if i.is_running()]
+        )
+        if num_killed:
+            self.logging.info(
+                f'KILLED {num_killed} PROCESSES LEFT BY {driver}'
+            )
+
+    def reap(self) -> int:
+        """
+        Kill the browser processes which do not belong to
+        a tracked browser, i.e. left by a quit or crashed browser,
+        or started by this process and never tracked
+
+        :return: number of killed processes
+        """
+
+        with self.lock:
+            pids = list(self.drivers.values())
+        tracked = list()
+        for pid in pids:
+            tracked.extend(self._tree(pid))
+        self._remember(tracked)
+        tracked_pids = {i.pid for i in tracked}
+
+        leaked = list()
+        with self.lock:
+            known_processes = dict(self.known_processes)
+        for pid, create_time in known_processes.items():
+            if pid in tracked_pids:
+                continue
+            try:
+                process = psutil.Process(pid)
+                if process.create_time() != create_time:
+                    raise psutil.NoSuchProcess(pid)
+                leaked.append(process)
+            except psutil.Error:
+                with self.lock:
+                    self.known_processes.pop(pid, None)
+
+        now = time.time()
+        with self.lock:
+            # a process started after a build began may belong to it,
+            # create times are rounded so a second of slack is kept
+            build_start = min(self.builds.values(), default=None)
+        if build_start is not None:
+            build_start -= 1
+        leaked_pids = {i.pid for i in leaked}
+        for process in psutil.Process(os.getpid()).children(recursive=True):
+            if (
+                process.pid in tracked_pids
+                or process.pid in leaked_pids
+                or not _is_browser_process(process)
+            ):
+                continue
+            try:
+                create_time = process.create_time()
+                if build_start is not None and create_time >= build_start:
+                    continue
+                if now - create_time > self.grace_period:
+                    leaked.append(process)
+            except psutil.Error:
+                pass
+
+        num_killed = self._kill(leaked)
+        if num_killed:
+            self.logging.info(f'REAPED {num_killed} LEAKED BROWSER PROCESSES')
+
+        return num_killed
+
+    def close(self) -> None:
+        """
+        Quit every tracked browser, reap the leaked ones
+        and stop every display
+        """
+
+        self.stop_event.set()
+        with self.lock:
+            drivers = list(self.drivers)
+            displays = list(self.displays)
+        for driver in drivers:
+            self.quit(driver)
+        self.reap()
+        for display in displays:
+            self.stop_display(display)
+
+
+def get_browser_lifecycle(**kwargs) -> BrowserLifecycle:
+    """
+    Get the lifecycle shared by every crawler of the process,
+    it is created and started on first use
+
+    :param kwargs: arguments of `BrowserLifecycle`,
+        only used on first use
+
+    :return: the browser lifecycle
+    """
+
+    global _lifecycle
+
+    with _lifecycle_lock:
+        if _lifecycle is None:
+            _lifecycle = BrowserLifecycle(**kwargs)
+            _lifecycle.start()
+
+    return _lifecycle
@@ -0,0 +1,271 @@
+import time
+import asyncio
+import hashlib
+import threading
+import collections
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from amazoncaptcha import AmazonCaptcha
+
+# answer of amazoncaptcha when the image cannot be read
+NOT_SOLVED = 'Not solved'
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def _solve_image(image: bytes) -> tuple:
+    # runs in the pool, the OCR is CPU bound
+    start = time.time()
+    solution = AmazonCaptcha(BytesIO(image)).solve()
+
+    return solution, time.time() - start
+
+
+class CaptchaService:
+    """
+    Solve amazon captchas in a process pool out of the event loop
+    and the crawler threads, solutions are cached by image hash
+    and the solve rate is tracked
+    :param max_workers: number of solving processes
+        defaults to 2
+    :param cache_size: number of solutions kept
+        defaults to 1024
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        cache_size: int = 1024,
+    ) -> None:
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.pool = None
+        self.cache = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.metrics = {
+            'requested': 0,
+            'cache_hits': 0,
+            'solved': 0,
+            'not_solved': 0,
+            'failed': 0,
+            'accepted': 0,
+            'rejected': 0,
+            'solve_seconds': 0.0,
+        }
+
+    @staticmethod
+    def image_key(image: bytes) -> str:
+        return hashlib.sha256(image).hexdigest()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+
+            return self.pool
+
+    def _reset_pool(
+        self,
+        pool: ProcessPoolExecutor,
+    ) -> None:
+        # a dead worker breaks the pool for good,
+        # the next solve starts a new one
+        with self.lock:
+            if self.pool is not pool:
+                return
+            self.pool = None
+        pool.shutdown(wait=False)
+
+    def _count(
+        self,
+        name: str,
+        value: float = 1,
+    ) -> None:
+        with self.lock:
+            self.metrics[name] += value
+
+    def _on_solved(
+        self,
+        key: str,
+        pool: ProcessPoolExecutor,
+        solving: Future,
+        result: Future,
+    ) -> None:
+        try:
+            solution, seconds = solving.result()
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._reset_pool(pool)
+            # an empty solution keeps the captcha retry loops going
+            self._count('failed')
+            result.set_result(None)
+            return
+
+        self._count('solve_seconds', seconds)
+        if not solution or solution == NOT_SOLVED:
+            self._count('not_solved')
+            result.set_result(None)
+            return
+
+        self._count('solved')
+        with self.lock:
+            self.cache[key] = solution
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        result.set_result(solution)
+
+    def submit(
+        self,
+        image: bytes,
+    ) -> Future:
+        """
+        Submit a captcha image to the pool
+
+        :param image: bytes of the captcha image
+
+        :return: future of the solution,
+            resolved to None if the image cannot be solved
+            or the solving fails
+        """
+
+        self._count('requested')
+        key = self.image_key(image)
+        result = Future()
+        with self.lock:
+            solution = self.cache.get(key)
+            if solution is not None:
+                self.cache.move_to_end(key)
+                self.metrics['cache_hits'] += 1
+        if solution is not None:
+            result.set_result(solution)
+            return result
+
+        pool = self._get_pool()
+        try:
+            solving = pool.submit(
+                _solve_image,
+                image,
+            )
+        except BrokenProcessPool:
+            self._reset_pool(pool)
+            self._count('failed')
+            result.set_result(None)
+            return result
+        solving.add_done_callback(
+            lambda i: self._on_solved(key, pool, i, result)
+        )
+
+        return result
+
+    def solve(
+        self,
+        image: bytes,
+    ) -> str:
+        """
+        Solve a captcha image, blocking the calling thread only
+
+        :param image: bytes of the captcha image
+
+        :return: the solution
+            otherwise None if the image cannot be solved
+            or the solving fails
+        """
+
+        return self.submit(image).result()
+
+    async def solve_async(
+        self,
+        image: bytes,
+    ) -> str:
+        """
+        Solve a captcha image without blocking the event loop
+
+        :param image: bytes of the captcha image
+
+        :return: the solution
+            otherwise None if the image cannot be solved
+            or the solving fails
+        """
+
+        return await asyncio.wrap_future(
+            self.submit(image)
+        )
+
+    def report(
+        self,
+        image: bytes,
+        accepted: bool,
+    ) -> None:
+        """
+        Record whether amazon accepted the solution of an image,
+        a rejected solution is dropped from the cache
+
+        :param image: bytes of the captcha image
+        :param accepted: whether the captcha page went away
+        """
+
+        if accepted:
+            self._count('accepted')
+            return
+
+        self._count('rejected')
+        with self.lock:
+            self.cache.pop(self.image_key(image), None)
+
+    def get_metrics(self) -> dict:
+        """
+        Get the counters of the service
+
+        :return: the counters with the solve rate
+            (solutions accepted by amazon over solutions reported)
+            and the average solving time in seconds
+        """
+
+        with self.lock:
+            metrics = dict(self.metrics)
+        reported = metrics['accepted'] + metrics['rejected']
+        solving = (
+            metrics['solved'] + metrics['not_solved'] + metrics['failed']
+        )
+        metrics['solve_rate'] = round(
+            metrics['accepted'] / reported, 3
+        ) if reported else None
+        metrics['avg_solve_seconds'] = round(
+            metrics['solve_seconds'] / solving, 3
+        ) if solving else None
+
+        return metrics
+
+    def close(self) -> None:
+        with self.lock:
+            pool = self.pool
+            self.pool = None
+        if pool:
+            pool.shutdown(wait=True)
+
+
+def get_captcha_service(**kwargs) -> CaptchaService:
+    """
+    Get the captcha service shared by the process,
+    it is created on first use
+
+    :param kwargs: arguments of `CaptchaService`,
+        only used on first use
+
+    :return: the captcha service
+    """
+
+    global _service
+
+    with _service_lock:
+        if _service is None:
+            _service = CaptchaService(**kwargs)
+
+    return _service
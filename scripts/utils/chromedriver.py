@@ -0,0 +1,70 @@
+import os
+import glob
+import threading
+from webdriver_manager.chrome \
+    import ChromeDriverManager
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def _find_cached_chromedriver() -> str:
+    """
+    Find the newest chromedriver already downloaded by webdriver-manager
+
+    :return: path of the chromedriver binary
+        otherwise None if there is none
+    """
+
+    cache_dirs = [
+        os.path.expanduser('~/.wdm'),
+        os.path.join(os.getcwd(), '.wdm'),
+    ]
+    candidates = list()
+    for cache_dir in cache_dirs:
+        candidates.extend(
+            glob.glob(
+                f'{cache_dir}/drivers/chromedriver/**/chromedriver',
+                recursive=True,
+            )
+        )
+    candidates = [
+        i for i in candidates
+        if os.path.isfile(i) and os.access(i, os.X_OK)
+    ]
+    if not candidates:
+        return None
+
+    return max(
+        candidates,
+        key=os.path.getmtime,
+    )
+
+
+def get_chromedriver_path() -> str:
+    """
+    Resolve the chromedriver binary once per process,
+    the env CHROMEDRIVER_PATH pins it explicitly, otherwise
+    webdriver-manager resolves it and the newest locally cached
+    binary is used when the resolution fails (e.g. offline)
+
+    :return: path of the chromedriver binary
+    """
+
+    global _driver_path
+
+    with _driver_path_lock:
+        if _driver_path:
+            return _driver_path
+
+        path = os.getenv('CHROMEDRIVER_PATH')
+        if not path:
+            try:
+                path = ChromeDriverManager().install()
+            except Exception:
+                path = _find_cached_chromedriver()
+                if not path:
+                    raise
+        _driver_path = path
+
+    return _driver_path
@@ -0,0 +1,162 @@
+import os
+import re
+import sys
+import copy
+import time
+import hashlib
+import threading
+import warnings
+import yaml
+
+sys.path.append(
+    re.search(
+        f'.*{re.escape("market_data_platform")}',
+        __file__,
+    ).group()
+)
+
+warnings.filterwarnings('ignore')
+
+from scripts.utils.minio_pd \
+    import MinioUtils           # noqa: E402
+
+DEFAULT_CONFIG_PATH = (
+    os.path.dirname(__file__).replace(
+        'utils',
+        'config',
+    ) + '/config.yaml'
+)
+DEFAULT_TTL = 15 * 60
+
+_cache = {}
+_cache_lock = threading.Lock()
+# one lock per key, a slow load only blocks the callers of that key
+_key_locks = {}
+
+
+def _is_fresh(
+    entry: tuple,
+    ttl: float,
+) -> bool:
+    return entry is not None and time.monotonic() - entry[0] < ttl
+
+
+def _memoize(
+    key: tuple,
+    ttl: float,
+    loader: callable,
+) -> dict:
+    with _cache_lock:
+        entry = _cache.get(key)
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    if not _is_fresh(entry, ttl):
+        with key_lock:
+            # loaded by another caller while waiting for the key
+            with _cache_lock:
+                entry = _cache.get(key)
+            if not _is_fresh(entry, ttl):
+                entry = (
+                    time.monotonic(),
+                    loader(),
+                )
+                with _cache_lock:
+                    _cache[key] = entry
+
+    # callers get their own copy so that nobody mutates the shared value
+    return copy.deepcopy(entry[1])
+
+
+def load_config(
+    config_path: str = DEFAULT_CONFIG_PATH,
+    ttl: float = DEFAULT_TTL,
+) -> dict:
+    """
+    Load a yaml config file once per process,
+    the file is re-read after the ttl expires
+
+    :param config_path: path of the yaml config file
+        defaults to scripts/config/config.yaml
+    :param ttl: seconds to keep the parsed config
+        defaults to DEFAULT_TTL
+
+    :return: the parsed config
+    """
+
+    def loader() -> dict:
+        with open(config_path) as file:
+            return yaml.safe_load(file)
+
+    return _memoize(
+        ('config', os.path.abspath(config_path)),
+        ttl,
+        loader,
+    )
+
+
+def load_minio_json(
+    file_path: str,
+    file_name: str,
+    bucket_name: str,
+    endpoint: str = None,
+    access_key: str = None,
+    secret: str = None,
+    ttl: float = DEFAULT_TTL,
+) -> dict:
+    """
+    Load a json object (e.g. credentials) from MinIO once per process,
+    the object is downloaded again after the ttl expires
+
+    :param file_path: the directory contains the file
+    :param file_name: file name without the ".json" extension
+    :param bucket_name: the name of the bucket
+    :param endpoint: MinIO host
+        defaults to env MINIO_HOST
+    :param access_key: MinIO access key
+        defaults to env MINIO_ACCESS_KEY
+    :param secret: MinIO secret key
+        defaults to env MINIO_SECRET_KEY
+    :param ttl: seconds to keep the loaded object
+        defaults to DEFAULT_TTL
+
+    :return: the loaded json object
+    """
+
+    endpoint = endpoint or os.getenv('MINIO_HOST')
+    access_key = access_key or os.getenv('MINIO_ACCESS_KEY')
+    secret = secret or os.getenv('MINIO_SECRET_KEY')
+
+    def loader() -> dict:
+        return MinioUtils(
+            endpoint=endpoint,
+            access_key=access_key,
+            secret=secret,
+        ).get_data_json(
+            file_path=file_path,
+            file_name=file_name,
+            bucket_name=bucket_name,
+        )
+
+    # every credential is part of the key, the secret only as a hash
+    secret_hash = hashlib.sha256(
+        (secret or '').encode()
+    ).hexdigest()
+
+    return _memoize(
+        (
+            'minio_json', endpoint, access_key, secret_hash,
+            bucket_name, file_path, file_name,
+        ),
+        ttl,
+        loader,
+    )
+
+
+def clear_cache() -> None:
+    """
+    Drop every memoized config and credential
+    """
+
+    with _cache_lock:
+        _cache.clear()
+        _key_locks.clear()
@@ -0,0 +1,364 @@
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import warnings
+
+sys.path.append(
+    re.search(
+        f'.*{re.escape("market_data_platform")}',
+        __file__,
+    ).group()
+)
+
+warnings.filterwarnings('ignore')
+
+from scripts.utils.minio_pd import MinioUtils       # noqa: E402
+from scripts.utils.logger import Logger             # noqa: E402
+
+
+class CookieJarCache:
+    """
+    Cookie jars of amazon sessions pinned to a zipcode, kept on
+    local disk or in MinIO so that the browser flow generating
+    them only runs when they expire or stop working
+    :param minio: MinIO utils to keep the jars,
+        None to keep them in local_dir
+        defaults to None
+    :param local_dir: directory of the jars when minio is None
+        defaults to None
+    :param ttl: seconds a jar is reused
+        defaults to 6 hours
+    :param file_path: the directory of the jars in MinIO
+        defaults to 'amz_cookies'
+    :param bucket_name: the bucket of the jars in MinIO
+        defaults to 'credentials'
+    """
+
+    def __init__(
+        self,
+        minio: MinioUtils = None,
+        local_dir: str = None,
+        ttl: int = 6 * 3600,
+        file_path: str = 'amz_cookies',
+        bucket_name: str = 'credentials',
+    ) -> None:
+        if minio is None and local_dir is None:
+            raise ValueError('Either minio or local_dir must be given')
+        self.minio = minio
+        self.local_dir = local_dir
+        self.ttl = ttl
+        self.file_path = file_path
+        self.bucket_name = bucket_name
+        self.logging = Logger()
+
+    @staticmethod
+    def _name(
+        country: str,
+        zipcode: str,
+        slot: int = 0,
+    ) -> str:
+        if slot == 0:
+            return f'{country}_{zipcode}'
+
+        return f'{country}_{zipcode}_{slot}'
+
+    def _read(
+        self,
+        name: str,
+    ) -> dict:
+        if self.minio is None:
+            file_name = f'{self.local_dir}/{name}.json'
+            if not os.path.exists(file_name):
+                return None
+            with open(file_name) as f:
+                return json.load(f)
+
+        if not self.minio.object_exist(
+            object_name=f'{self.file_path}/{name}.json',
+            bucket_name=self.bucket_name,
+        ):
+            return None
+
+        return self.minio.get_data_json(
+            file_path=self.file_path,
+            file_name=name,
+            bucket_name=self.bucket_name,
+        )
+
+    def _write(
+        self,
+        name: str,
+        data: dict,
+    ) -> None:
+        if self.minio is None:
+            os.makedirs(
+                self.local_dir,
+                exist_ok=True,
+            )
+            file_name = f'{self.local_dir}/{name}.json'
+            # write aside then rename, a reader never sees half a jar
+            with open(f'{file_name}.tmp', 'w') as f:
+                json.dump(data, f)
+            os.replace(f'{file_name}.tmp', file_name)
+        else:
+            self.minio.load_data_json(
+                data=data,
+                file_path=self.file_path,
+                file_name=name,
+                bucket_name=self.bucket_name,
+            )
+
+    def get(
+        self,
+        country: str,
+        zipcode: str,
+        slot: int = 0,
+    ) -> dict:
+        """
+        Get the cookies of a zipcode
+
+        :param country: country of the session
+        :param zipcode: zipcode the session is pinned to
+        :param slot: index of the session among the sessions
+            of the zipcode
+            defaults to 0
+
+        :return: the cookies
+            otherwise None if there is no valid jar
+        """
+
+        jar = self._read(self._name(country, zipcode, slot))
+        if not jar or not jar.get('cookies'):
+            return None
+        if time.time() - jar.get('created_at', 0) > self.ttl:
+            self.logging.info(
+                f'Cookies of {country} {zipcode} expired'
+            )
+            return None
+
+        return jar.get('cookies')
+
+    def put(
+        self,
+        country: str,
+        zipcode: str,
+        cookies: dict,
+        slot: int = 0,
+    ) -> None:
+        self._write(
+            self._name(country, zipcode, slot),
+            {
+                'cookies': cookies,
+                'created_at': time.time(),
+            },
+        )
+
+    def invalidate(
+        self,
+        country: str,
+        zipcode: str,
+        slot: int = 0,
+    ) -> None:
+        """
+        Drop the cookies of a zipcode, e.g. when amazon moved
+        the session to another location
+        """
+
+        self._write(
+            self._name(country, zipcode, slot),
+            {
+                'cookies': None,
+                'created_at': time.time(),
+            },
+        )
+
+
+class CookieSession:
+    """
+    A cookie identity of a session pool
+    :param slot: index of the session in the pool
+    :param cookies: the cookies of the session
+    """
+
+    def __init__(
+        self,
+        slot: int,
+        cookies: dict,
+    ) -> None:
+        self.slot = slot
+        self.cookies = cookies
+        self.retired = False
+        self.num_requests = 0
+
+
+class CookieSessionPool:
+    """
+    Pool of independent cookie sessions pinned to a zipcode,
+    requests are spread over the sessions and a session whose
+    zipcode drifts is retired alone, then regenerated
+    :param country: country of the sessions
+    :param zipcode: zipcode of the sessions
+    :param size: number of sessions
+    :param cache: cache persisting the cookies of every session
+    :param generate: coroutine function generating sessions,
+        called as generate(zipcode=..., country=..., num_sessions=...)
+        and returning a list of cookies
+    :param probe: coroutine function checking that cookies
+        still work, called as probe(cookies)
+        defaults to None, i.e. trust the ttl of the cache
+    """
+
+    def __init__(
+        self,
+        country: str,
+        zipcode: str,
+        size: int,
+        cache: CookieJarCache,
+        generate: callable,
+        probe: callable = None,
+    ) -> None:
+        self.country = country
+        self.zipcode = zipcode
+        self.size = size
+        self.cache = cache
+        self.generate = generate
+        self.probe = probe
+        self.sessions = dict()
+        self.cursor = 0
+        self.logging = Logger()
+
+    @property
+    def active(self) -> list:
+        return [
+            self.sessions[i] for i in sorted(self.sessions)
+            if not self.sessions[i].retired
+        ]
+
+    async def _load_cached(
+        self,
+        slot: int,
+    ) -> CookieSession:
+        # the cache may read from MinIO, out of the event loop
+        cookies = await asyncio.to_thread(
+            self.cache.get,
+            self.country,
+            self.zipcode,
+            slot,
+        )
+        if not cookies:
+            return None
+        if self.probe and not await self.probe(cookies):
+            return None
+
+        return CookieSession(slot, cookies)
+
+    async def refill(self) -> None:
+        """
+        Bring the pool back to its size, cached sessions are
+        reused and the missing ones are generated in one browser,
+        a failed generation is retried at the next refill
+
+        raise an exception if the pool has no active session
+        """
+
+        missing = [
+            i for i in range(self.size)
+            if i not in self.sessions or self.sessions[i].retired
+        ]
+        if not missing:
+            return
+
+        cached = await asyncio.gather(
+            *(self._load_cached(i) for i in missing)
+        )
+        for session in cached:
+            if session:
+                self.sessions[session.slot] = session
+        missing = [
+            slot for slot, session in zip(missing, cached)
+            if session is None
+        ]
+        error = None
+        if missing:
+            self.logging.info(
+                f'Generate {len(missing)} cookie sessions of '
+                f'{self.country} {self.zipcode}'
+            )
+            try:
+                generated = await self.generate(
+                    zipcode=self.zipcode,
+                    country=self.country,
+                    num_sessions=len(missing),
+                )
+            except Exception as e:
+                # keep crawling with the sessions left
+                self.logging.error(f'CANNOT GENERATE COOKIE SESSIONS: {e}')
+                error = e
+                generated = []
+            generated = list(zip(missing, generated))
+            await asyncio.gather(
+                *(
+                    asyncio.to_thread(
+                        self.cache.put,
+                        self.country,
+                        self.zipcode,
+                        cookies,
+                        slot,
+                    ) for slot, cookies in generated
+                )
+            )
+            for slot, cookies in generated:
+                self.sessions[slot] = CookieSession(slot, cookies)
+        if not self.active:
+            raise Exception(
+                f'No cookie session of {self.country} {self.zipcode}'
+            ) from error
+        self.logging.info(
+            f'{len(self.active)} cookie sessions ready'
+        )
+
+    def next(self) -> CookieSession:
+        """
+        Get the session of the next request, round robin
+        over the active sessions
+
+        :return: the session
+            otherwise None if every session is retired
+        """
+
+        active = self.active
+        if not active:
+            return None
+        session = active[self.cursor % len(active)]
+        self.cursor += 1
+        session.num_requests += 1
+
+        return session
+
+    async def retire(
+        self,
+        session: CookieSession,
+    ) -> None:
+        """
+        Stop using a session, e.g. when amazon moved it to
+        another location, it is regenerated at the next refill
+        """
+
+        if session.retired:
+            return
+        # retired at once, the other requests stop picking it
+        session.retired = True
+        await asyncio.to_thread(
+            self.cache.invalidate,
+            self.country,
+            self.zipcode,
+            session.slot,
+        )
+        self.logging.warning(
+            f'Retired cookie session {session.slot} after '
+            f'{session.num_requests} requests, '
+            f'{len(self.active)} sessions left'
+        )
@@ -75,3 +75,146 @@ COUNTRIES_INFO = {
         "suffix": ".com.au",
     },
 }
+
+MONTHS = {
+    "en": [
+        "january", "february", "march", "april", "may", "june", "july",
+        "august", "september", "october", "november", "december",
+    ],
+    "de": [
+        "januar", "februar", "märz", "april", "mai", "juni", "juli",
+        "august", "september", "oktober", "november", "dezember",
+    ],
+    "fr": [
+        "janvier", "février", "mars", "avril", "mai", "juin", "juillet",
+        "août", "septembre", "octobre", "novembre", "décembre",
+    ],
+    "it": [
+        "gennaio", "febbraio", "marzo", "aprile", "maggio", "giugno", "luglio",
+        "agosto", "settembre", "ottobre", "novembre", "dicembre",
+    ],
+    "es": [
+        "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+        "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+    ],
+}
+
+# "Reviewed in <location> on <date>" line of a review by language,
+# every pattern has the named groups location, day, month and year
+REVIEW_DATE_PATTERNS = {
+    "en": [
+        r"Reviewed in (?:the )?(?P<location>.+?) on "
+        r"(?P<month>[A-Za-z]+) (?P<day>\d{1,2}), (?P<year>\d{4})",
+        r"Reviewed in (?:the )?(?P<location>.+?) on "
+        r"(?P<day>\d{1,2}) (?P<month>[A-Za-z]+) (?P<year>\d{4})",
+    ],
+    "de": [
+        r"Rezension aus (?:der |dem |den )?(?P<location>.+?) vom "
+        r"(?P<day>\d{1,2})\. (?P<month>\w+) (?P<year>\d{4})",
+    ],
+    "fr": [
+        r"Commenté (?:en |au |aux |à )(?P<location>.+?) le "
+        r"(?P<day>\d{1,2})(?:er)? (?P<month>\w+) (?P<year>\d{4})",
+    ],
+    "it": [
+        r"Recensito (?:in |negli |nel |nei )(?P<location>.+?) il "
+        r"(?P<day>\d{1,2}) (?P<month>\w+) (?P<year>\d{4})",
+    ],
+    "es": [
+        r"(?:Calificado|Revisado|Reseñado) en (?:los |el )?"
+        r"(?P<location>.+?) el "
+        r"(?P<day>\d{1,2}) de (?P<month>\w+) de (?P<year>\d{4})",
+    ],
+    "ja": [
+        r"(?P<year>\d{4})年(?P<month>\d{1,2})月(?P<day>\d{1,2})日に"
+        r"(?P<location>.+?)でレビュー済み",
+    ],
+}
+
+REVIEW_LANGUAGES = {
+    "USA": "en",
+    "CAN": "en",
+    "GBR": "en",
+    "AUS": "en",
+    "SGP": "en",
+    "ARE": "en",
+    "DEU": "de",
+    "FRA": "fr",
+    "ITA": "it",
+    "ESP": "es",
+    "MEX": "es",
+    "JPN": "ja",
+}
+
+# local names of the review locations and their english names
+REVIEW_LOCATIONS = {
+    # same in several languages
+    "France": "France",
+    "Canada": "Canada",
+    "Japan": "Japan",
+    # de
+    "Deutschland": "Germany",
+    "Vereinigten Staaten": "United States",
+    "Vereinigten Königreich": "United Kingdom",
+    "Frankreich": "France",
+    "Italien": "Italy",
+    "Spanien": "Spain",
+    "Kanada": "Canada",
+    "Mexiko": "Mexico",
+    "Niederlanden": "Netherlands",
+    "Österreich": "Austria",
+    "Belgien": "Belgium",
+    "Schweden": "Sweden",
+    "Polen": "Poland",
+    "Indien": "India",
+    "Australien": "Australia",
+    # fr
+    "États-Unis": "United States",
+    "Royaume-Uni": "United Kingdom",
+    "Allemagne": "Germany",
+    "Italie": "Italy",
+    "Espagne": "Spain",
+    "Mexique": "Mexico",
+    "Japon": "Japan",
+    "Pays-Bas": "Netherlands",
+    "Belgique": "Belgium",
+    "Suède": "Sweden",
+    "Pologne": "Poland",
+    "Inde": "India",
+    "Australie": "Australia",
+    # it
+    "Italia": "Italy",
+    "Stati Uniti": "United States",
+    "Regno Unito": "United Kingdom",
+    "Germania": "Germany",
+    "Francia": "France",
+    "Spagna": "Spain",
+    "Messico": "Mexico",
+    "Giappone": "Japan",
+    "Paesi Bassi": "Netherlands",
+    "Belgio": "Belgium",
+    "Svezia": "Sweden",
+    "Polonia": "Poland",
+    # es
+    "España": "Spain",
+    "Estados Unidos": "United States",
+    "Reino Unido": "United Kingdom",
+    "Alemania": "Germany",
+    "Canadá": "Canada",
+    "México": "Mexico",
+    "Japón": "Japan",
+    "Países Bajos": "Netherlands",
+    "Bélgica": "Belgium",
+    "Suecia": "Sweden",
+    "Brasil": "Brazil",
+    # ja
+    "日本": "Japan",
+    "アメリカ合衆国": "United States",
+    "イギリス": "United Kingdom",
+    "ドイツ": "Germany",
+    "フランス": "France",
+    "イタリア": "Italy",
+    "スペイン": "Spain",
+    "カナダ": "Canada",
+    "メキシコ": "Mexico",
+}
@@ -1,5 +1,10 @@
 import re
+import json
+import time
+import random
+import hashlib
 import logging
+import threading
 import warnings
 from typing import Callable
 import pandas as pd
@@ -14,6 +19,60 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M:%S',
 )
 
+# authorized clients and opened spreadsheets shared by every instance,
+# gspread refreshes the access token of a client by itself
+_clients = {}
+_spread_sheets = {}
+_cache_lock = threading.Lock()
+
+# Sheets API quota: 60 write requests per minute per user
+WRITE_REQUESTS_PER_MINUTE = 60
+RETRY_STATUS_CODES = [429, 500, 502, 503]
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter
+    :param rate: number of tokens refilled per second
+    :param capacity: max number of tokens, i.e. the allowed burst
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: int,
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Take a token, blocking until one is available
+        """
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + (now - self.updated_at) * self.rate,
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_write_limiter = TokenBucket(
+    rate=WRITE_REQUESTS_PER_MINUTE / 60,
+    capacity=10,
+)
+
 
 class GGSheetUtils:
     """
@@ -26,24 +85,71 @@ class GGSheetUtils:
         user_creds: dict,
     ) -> None:
         self.user_creds = user_creds
+        # index of the next chunk to write of each unfinished bulk write
+        self.write_progress = {}
+        self.creds_key = hashlib.sha256(
+            json.dumps(
+                user_creds,
+                sort_keys=True,
+            ).encode()
+        ).hexdigest()
+
+    @property
+    def client(self) -> gspread.Client:
+        """
+        The authorized client of the user credentials,
+        authorized once per process
+        """
+
+        with _cache_lock:
+            client = _clients.get(self.creds_key)
+            if client is None:
+                client = gspread.service_account_from_dict(
+                    self.user_creds
+                )
+                _clients[self.creds_key] = client
+
+        return client
+
+    @staticmethod
+    def clear_cache() -> None:
+        """
+        Drop every cached client and spreadsheet
+        """
+
+        with _cache_lock:
+            _clients.clear()
+            _spread_sheets.clear()
 
     def open_spread_sheet(
         self,
         sheet_id: str,
+        refresh: bool = False,
     ) -> Callable:
         """
-        Open the spreadsheet from the given spreadsheet id
+        Open the spreadsheet from the given spreadsheet id,
+        the spreadsheet handle is cached per process
 
         :param sheet_id: id of the spreadsheet
+        :param refresh: whether to re-open the spreadsheet
+            instead of using the cached handle
+            defaults to False
 
         :return: spreadsheet object
         """
 
-        client = gspread.service_account_from_dict(self.user_creds)
-
-        spread_sheet = client.open_by_key(
-            key=sheet_id,
+        key = (
+            self.creds_key,
+            sheet_id,
         )
+        with _cache_lock:
+            spread_sheet = _spread_sheets.get(key)
+        if spread_sheet is None or refresh:
+            spread_sheet = self.client.open_by_key(
+                key=sheet_id,
+            )
+            with _cache_lock:
+                _spread_sheets[key] = spread_sheet
 
         return spread_sheet
 
@@ -62,9 +168,7 @@ class GGSheetUtils:
         :return: spreadsheet object
         """
 
-        client = gspread.service_account_from_dict(self.user_creds)
-
-        spread_sheet = client.open(
+        spread_sheet = self.client.open(
             title=title,
             folder_id=folder_id,
         )
@@ -119,9 +223,7 @@ class GGSheetUtils:
         :return: the created spreadsheet id
         """
 
-        client = gspread.service_account_from_dict(self.user_creds)
-
-        spread_sheet = client.create(
+        spread_sheet = self.client.create(
             title=sheet_name,
             folder_id=folder_id,
         )
@@ -286,6 +388,61 @@ class GGSheetUtils:
 
             data = work_sheet.get_values(f'{range_from}:{range_to}')
 
+        df = self._to_dataframe(
+            data,
+            columns_first_row=columns_first_row,
+            auto_format_columns=auto_format_columns,
+        )
+
+        return df
+
+    def batch_get(
+        self,
+        sheet_id: str,
+        ranges: list,
+        columns_first_row: bool = False,
+        auto_format_columns: bool = False,
+    ) -> list:
+        """
+        Get data of several ranges, possibly from different worksheets,
+        in a single request
+
+        :param sheet_id: spreadsheet id
+        :param ranges: list of A1 ranges including the worksheet name
+            e.g. ['us!A:B', 'int!A:B']
+        :param columns_first_row: whether to convert the first row
+            to columns
+            defaults to False
+        :param auto_format_columns: whether to format columns name
+            of the dataframes
+            defaults to False
+
+        :return: list of dataframes in the order of the given ranges
+        """
+
+        spread_sheet = self.open_spread_sheet(sheet_id)
+
+        value_ranges = spread_sheet.values_batch_get(
+            ranges=ranges,
+        ).get('valueRanges', [])
+
+        return [
+            self._to_dataframe(
+                gspread.utils.fill_gaps(
+                    value_range.get('values', [[]])
+                ),
+                columns_first_row=columns_first_row,
+                auto_format_columns=auto_format_columns,
+            )
+            for value_range in value_ranges
+        ]
+
+    @staticmethod
+    def _to_dataframe(
+        data: list,
+        columns_first_row: bool = False,
+        auto_format_columns: bool = False,
+    ) -> pd.DataFrame:
         df = pd.DataFrame(data)
         if columns_first_row:
             df.columns = df.iloc[0].to_list()
@@ -358,22 +515,43 @@ class GGSheetUtils:
         data_values = constructed_data.values.tolist()
 
         if insert_column_names:
-            col_values = [data.columns.to_list()]
-            work_sheet.insert_rows(
-                col_values,
-                row=from_row_index,
-            )
-            work_sheet.insert_rows(
-                data_values,
-                row=from_row_index+1,
-                value_input_option=input_option,
-            )
-        else:
-            work_sheet.insert_rows(
-                data_values,
-                row=from_row_index,
-                value_input_option=input_option,
-            )
+            data_values = [data.columns.to_list()] + data_values
+        if not data_values:
+            return
+
+        # the rows are inserted by a single request which is never
+        # retried, a retried insert would add the rows twice
+        _write_limiter.acquire()
+        spread_sheet.batch_update(
+            body={
+                'requests': [
+                    {
+                        'insertDimension': {
+                            'range': {
+                                'sheetId': work_sheet.id,
+                                'dimension': 'ROWS',
+                                'startIndex': from_row_index - 1,
+                                'endIndex': (
+                                    from_row_index - 1 + len(data_values)
+                                ),
+                            },
+                            'inheritFromBefore': False,
+                        },
+                    },
+                ],
+            },
+        )
+        # writing the values into the inserted rows is idempotent,
+        # its chunks are retried but a new call must not resume them
+        # since it inserts its own rows
+        self._write_chunks(
+            spread_sheet=spread_sheet,
+            sheet_name=sheet_name,
+            data_values=data_values,
+            row_from_index=from_row_index,
+            col_from_index=1,
+            input_option=input_option,
+        )
 
     def update_data(
         self,
@@ -402,6 +580,60 @@ class GGSheetUtils:
             defaults to True
         """
 
+        self.bulk_write(
+            data=data,
+            sheet_id=sheet_id,
+            sheet_name=sheet_name,
+            range_from=range_from,
+            parse_input=parse_input,
+            pre_process=pre_process,
+        )
+
+    def bulk_write(
+        self,
+        data: pd.DataFrame,
+        sheet_id: str,
+        sheet_name: str = 'Sheet1',
+        range_from: str = 'A1',
+        include_column_names: bool = False,
+        parse_input: bool = True,
+        pre_process: bool = True,
+        chunk_rows: int = 5000,
+        chunk_bytes: int = 2 * 1024 ** 2,
+        resume: bool = True,
+    ) -> None:
+        """
+        Write data to the given sheet in size-bounded chunks,
+        each chunk is sent by a values batch update paced by
+        the write quota of Sheets API and retried on quota errors,
+        a failed write can be called again to resume
+        from the first chunk not written yet
+
+        :param data: dataframe contains data to write
+        :param sheet_id: spreadsheet id
+        :param sheet_name: worksheet name
+            defaults to 'Sheet1'
+        :param range_from: the top left cell to write from
+            defaults to 'A1'
+        :param include_column_names: whether to write column names
+            as the first row
+            defaults to False
+        :param parse_input: whether to parse input values
+            as if the user typed them into the UI
+            defaults to True
+        :param pre_process: whether to process input values
+            based on the pre-defined function of DA
+            defaults to True
+        :param chunk_rows: max number of rows of a chunk
+            defaults to 5000
+        :param chunk_bytes: max payload size of a chunk
+            defaults to 2MB
+        :param resume: whether to skip the chunks written
+            by a previous failed call with the same data
+            to the same range
+            defaults to True
+        """
+
         spread_sheet = self.open_spread_sheet(sheet_id)
 
         work_sheet = self.get_work_sheet(
@@ -418,34 +650,225 @@ class GGSheetUtils:
         else:
             constructed_data = data.copy()
         data_values = constructed_data.values.tolist()
+        if include_column_names:
+            data_values = [data.columns.to_list()] + data_values
 
-        num_current_rows = work_sheet.row_count
-        num_current_cols = work_sheet.col_count
-
-        range_from_index = gspread.utils.a1_to_rowcol(range_from)
-        row_from_index = range_from_index[0]
-        col_from_index = range_from_index[-1]
-
-        if row_from_index > num_current_rows:
-            rows_to_resize = row_from_index
-        else:
-            rows_to_resize = num_current_rows
+        row_from_index, col_from_index = gspread.utils.a1_to_rowcol(
+            range_from
+        )
+        num_cols = max(
+            [len(row) for row in data_values],
+            default=1,
+        )
 
-        if col_from_index > num_current_cols:
-            cols_to_resize = col_from_index
-        else:
-            cols_to_resize = num_current_cols
+        # grow the worksheet once so that every chunk fits in the grid
+        rows_to_resize = max(
+            work_sheet.row_count,
+            row_from_index + len(data_values) - 1,
+        )
+        cols_to_resize = max(
+            work_sheet.col_count,
+            col_from_index + num_cols - 1,
+        )
+        if (
+            rows_to_resize != work_sheet.row_count
+        ) or (
+            cols_to_resize != work_sheet.col_count
+        ):
+            _write_limiter.acquire()
+            work_sheet.resize(
+                rows=rows_to_resize,
+                cols=cols_to_resize,
+            )
 
-        work_sheet.resize(
-            rows=rows_to_resize,
-            cols=cols_to_resize,
+        # the progress of a failed write is only resumed by a write
+        # of the same payload, any other write to the range drops it
+        progress_key = (
+            sheet_id, sheet_name, range_from,
+        )
+        payload_hash = hashlib.sha256(
+            json.dumps(
+                [input_option, data_values],
+                default=str,
+            ).encode()
+        ).hexdigest()
+        progress = self.write_progress.get(progress_key)
+        if not resume or (progress and progress[0] != payload_hash):
+            self.write_progress.pop(progress_key, None)
+
+        self._write_chunks(
+            spread_sheet=spread_sheet,
+            sheet_name=sheet_name,
+            data_values=data_values,
+            row_from_index=row_from_index,
+            col_from_index=col_from_index,
+            input_option=input_option,
+            chunk_rows=chunk_rows,
+            chunk_bytes=chunk_bytes,
+            progress_key=progress_key,
+            payload_hash=payload_hash,
         )
 
-        work_sheet.update(
-            f'{range_from}',
+    def _write_chunks(
+        self,
+        spread_sheet: Callable,
+        sheet_name: str,
+        data_values: list,
+        row_from_index: int,
+        col_from_index: int,
+        input_option: str,
+        chunk_rows: int = 5000,
+        chunk_bytes: int = 2 * 1024 ** 2,
+        progress_key: tuple = None,
+        payload_hash: str = None,
+    ) -> None:
+        chunks = self._split_chunks(
             data_values,
-            value_input_option=input_option,
+            chunk_rows=chunk_rows,
+            chunk_bytes=chunk_bytes,
         )
+        row_offsets = self._chunk_row_offsets(chunks)
+
+        def send_chunk(idx: int) -> None:
+            spread_sheet.values_batch_update(
+                body={
+                    'valueInputOption': input_option,
+                    'data': [
+                        {
+                            'range': gspread.utils.absolute_range_name(
+                                sheet_name,
+                                gspread.utils.rowcol_to_a1(
+                                    row_from_index + row_offsets[idx],
+                                    col_from_index,
+                                ),
+                            ),
+                            'values': chunks[idx],
+                        },
+                    ],
+                },
+            )
+
+        self._run_chunks(
+            num_chunks=len(chunks),
+            send_chunk=send_chunk,
+            progress_key=progress_key,
+            payload_hash=payload_hash,
+        )
+
+    @staticmethod
+    def _split_chunks(
+        data_values: list,
+        chunk_rows: int = 5000,
+        chunk_bytes: int = 2 * 1024 ** 2,
+    ) -> list:
+        chunks = list()
+        chunk = list()
+        size = 0
+        for row in data_values:
+            row_size = len(
+                json.dumps(
+                    row,
+                    default=str,
+                )
+            )
+            if chunk and (
+                len(chunk) >= chunk_rows
+                or size + row_size > chunk_bytes
+            ):
+                chunks.append(chunk)
+                chunk = list()
+                size = 0
+            chunk.append(row)
+            size += row_size
+        if chunk:
+            chunks.append(chunk)
+
+        return chunks
+
+    @staticmethod
+    def _chunk_row_offsets(chunks: list) -> list:
+        offsets = list()
+        offset = 0
+        for chunk in chunks:
+            offsets.append(offset)
+            offset += len(chunk)
+
+        return offsets
+
+    def _run_chunks(
+        self,
+        num_chunks: int,
+        send_chunk: callable,
+        progress_key: tuple = None,
+        payload_hash: str = None,
+        max_retries: int = 6,
+    ) -> None:
+        """
+        Send the chunks of a write, chunks failing on quota or
+        server errors are retried with exponential backoff
+
+        :param num_chunks: number of chunks
+        :param send_chunk: function sending a chunk by its index,
+            it must be idempotent
+        :param progress_key: key of the write in the progress
+            of unfinished writes, None to never resume it
+            defaults to None
+        :param payload_hash: hash of the written data,
+            a progress is only resumed by the same data
+            defaults to None
+        :param max_retries: max number of retries of a chunk
+            defaults to 6
+        """
+
+        start_chunk = 0
+        if progress_key is not None:
+            progress = self.write_progress.get(progress_key)
+            if progress and progress[0] == payload_hash:
+                start_chunk = progress[1]
+            if start_chunk > 0:
+                logging.info(
+                    f'Resume writing from chunk {start_chunk}/{num_chunks}'
+                )
+
+        try:
+            for idx in range(start_chunk, num_chunks):
+                attempts = 0
+                while True:
+                    _write_limiter.acquire()
+                    try:
+                        send_chunk(idx)
+                        break
+                    except gspread.exceptions.APIError as e:
+                        status_code = e.response.status_code
+                        attempts += 1
+                        if (
+                            status_code not in RETRY_STATUS_CODES
+                        ) or (
+                            attempts > max_retries
+                        ):
+                            raise
+                        delay = min(64, 2 ** attempts) + random.random()
+                        logging.warning(
+                            f'Chunk {idx} got status {status_code}, '
+                            f'retrying in {delay:.1f} seconds'
+                        )
+                        time.sleep(delay)
+                if progress_key is not None:
+                    self.write_progress[progress_key] = (
+                        payload_hash,
+                        idx + 1,
+                    )
+        except gspread.exceptions.APIError as e:
+            # only quota and server errors are worth resuming,
+            # the same data would fail again on any other error
+            if e.response.status_code not in RETRY_STATUS_CODES:
+                self.write_progress.pop(progress_key, None)
+            raise
+        except Exception:
+            self.write_progress.pop(progress_key, None)
+            raise
+
+        self.write_progress.pop(progress_key, None)
 
     def gspread_load_data(
         self,
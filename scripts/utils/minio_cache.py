@@ -0,0 +1,211 @@
+import os
+import time
+import hashlib
+import threading
+import tempfile
+
+
+class LocalObjectCache:
+    """
+    Size-bounded on-disk cache of MinIO objects,
+    an entry is keyed by bucket, object name and ETag so that
+    a changed object never hits a stale entry
+    :param cache_dir: the directory to store cached objects
+    :param max_bytes: the max total size of cached objects,
+        least recently used entries are evicted above it
+        defaults to 2GB
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = 2 * 1024 ** 3,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(
+            self.cache_dir,
+            exist_ok=True,
+        )
+        # size and last access of every entry, the directory is
+        # only walked once so that a put does not scan the cache
+        self.entries = dict()
+        self.total_bytes = 0
+        self._load_entries()
+
+    def _load_entries(self) -> None:
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = f'{root}/{name}'
+                if name.startswith('.tmp_'):
+                    # left by a crash in the middle of a put
+                    self._remove(path)
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                self.entries[path] = (stat.st_mtime, stat.st_size)
+                self.total_bytes += stat.st_size
+
+    @staticmethod
+    def _clean_etag(etag: str) -> str:
+        return etag.strip('"').replace('-', '_')
+
+    def _object_dir(
+        self,
+        bucket_name: str,
+        object_name: str,
+    ) -> str:
+        key_hash = hashlib.sha256(
+            f'{bucket_name}/{object_name}'.encode()
+        ).hexdigest()
+
+        return f'{self.cache_dir}/{bucket_name}/{key_hash}'
+
+    def _entry_path(
+        self,
+        bucket_name: str,
+        object_name: str,
+        etag: str,
+    ) -> str:
+        return (
+            f'{self._object_dir(bucket_name, object_name)}'
+            f'/{self._clean_etag(etag)}'
+        )
+
+    def get(
+        self,
+        bucket_name: str,
+        object_name: str,
+        etag: str,
+    ) -> bytes:
+        """
+        Get the cached content of the object at the given ETag
+
+        :param bucket_name: the name of the bucket
+        :param object_name: the full object name
+        :param etag: the current ETag of the object
+
+        :return: the cached bytes
+            otherwise None
+        """
+
+        path = self._entry_path(
+            bucket_name,
+            object_name,
+            etag,
+        )
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # bump the access time used by LRU eviction
+        with self.lock:
+            if path in self.entries:
+                self.entries[path] = (time.time(), len(data))
+        try:
+            os.utime(path)
+        except OSError:
+            # evicted since it was read, the data is still valid
+            pass
+
+        return data
+
+    def put(
+        self,
+        bucket_name: str,
+        object_name: str,
+        etag: str,
+        data: bytes,
+    ) -> None:
+        """
+        Store the content of the object at the given ETag,
+        older versions of the same object are dropped
+
+        :param bucket_name: the name of the bucket
+        :param object_name: the full object name
+        :param etag: the ETag of the content
+        :param data: the content of the object
+        """
+
+        if len(data) > self.max_bytes:
+            return
+
+        object_dir = self._object_dir(
+            bucket_name,
+            object_name,
+        )
+        path = self._entry_path(
+            bucket_name,
+            object_name,
+            etag,
+        )
+        with self.lock:
+            os.makedirs(
+                object_dir,
+                exist_ok=True,
+            )
+            for name in os.listdir(object_dir):
+                stale_path = f'{object_dir}/{name}'
+                if stale_path != path and not name.startswith('.tmp_'):
+                    self._drop(stale_path)
+
+            # write to a temp file then rename so that concurrent readers
+            # never see a partially written entry
+            fd, tmp_path = tempfile.mkstemp(
+                dir=object_dir,
+                prefix='.tmp_',
+            )
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._drop_entry(path)
+            self.entries[path] = (time.time(), len(data))
+            self.total_bytes += len(data)
+
+            self._evict()
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _drop_entry(self, path: str) -> None:
+        entry = self.entries.pop(path, None)
+        if entry:
+            self.total_bytes -= entry[1]
+
+    def _drop(self, path: str) -> None:
+        self._drop_entry(path)
+        self._remove(path)
+
+    def _evict(self) -> None:
+        if self.total_bytes <= self.max_bytes:
+            return
+
+        # least recently used first
+        lru = sorted(
+            self.entries,
+            key=lambda i: self.entries[i][0],
+        )
+        for path in lru:
+            self._drop(path)
+            if self.total_bytes <= self.max_bytes:
+                break
+
+    def clear(self) -> None:
+        """
+        Remove all cached objects
+        """
+
+        with self.lock:
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    self._remove(f'{root}/{name}')
+            self.entries.clear()
+            self.total_bytes = 0
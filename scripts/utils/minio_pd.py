@@ -2,12 +2,18 @@ import os
 import sys
 import re
 import json
+import socket
 import warnings
 import datetime
+import threading
 import pytz
 from io import BytesIO
+import urllib3
+from urllib3.connection import HTTPConnection
 from minio import Minio
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 sys.path.append(
     re.search(
@@ -22,6 +28,86 @@ from scripts.utils.logger \
     import Logger             # noqa: E402
 from scripts.utils.auto_retry \
     import retry_on_error   # noqa: E402
+from scripts.utils.minio_cache \
+    import LocalObjectCache     # noqa: E402
+
+DEFAULT_POOL_SIZE = int(
+    os.getenv(
+        'MINIO_POOL_SIZE',
+        64,
+    )
+)
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 120
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_minio_client(
+    endpoint: str,
+    access_key: str,
+    secret: str,
+    secure: bool = False,
+    pool_size: int = DEFAULT_POOL_SIZE,
+) -> Minio:
+    """
+    Get the process-wide Minio client of the given endpoint and credentials,
+    the client is created once and backed by a keep-alive connection pool
+    so that concurrent put/get calls reuse sockets
+
+    :param endpoint: host and port of the MinIO server
+    :param access_key: access key of the MinIO account
+    :param secret: secret key of the MinIO account
+    :param secure: whether to connect with TLS
+        defaults to False
+    :param pool_size: max number of kept-alive connections,
+        it should be at least the number of concurrent workers,
+        only the first call of each endpoint/credentials sets it
+        defaults to DEFAULT_POOL_SIZE (env MINIO_POOL_SIZE or 64)
+
+    :return: Minio client
+    """
+
+    key = (
+        endpoint,
+        access_key,
+        secret,
+        secure,
+    )
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            http_client = urllib3.PoolManager(
+                num_pools=4,
+                maxsize=pool_size,
+                # wait for a free connection instead of opening
+                # a throwaway one when all pooled sockets are busy
+                block=True,
+                timeout=urllib3.Timeout(
+                    connect=DEFAULT_CONNECT_TIMEOUT,
+                    read=DEFAULT_READ_TIMEOUT,
+                ),
+                retries=urllib3.Retry(
+                    total=5,
+                    connect=3,
+                    backoff_factor=0.2,
+                    status_forcelist=[500, 502, 503, 504],
+                ),
+                socket_options=HTTPConnection.default_socket_options + [
+                    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+                ],
+            )
+            client = Minio(
+                endpoint=endpoint,
+                access_key=access_key,
+                secret_key=secret,
+                secure=secure,
+                http_client=http_client,
+            )
+            _clients[key] = client
+
+    return client
 
 
 class MinioUtils:
@@ -30,18 +116,100 @@ class MinioUtils:
         endpoint: str,
         access_key: str,
         secret: str,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        cache_dir: str = None,
+        cache_max_bytes: int = 2 * 1024 ** 3,
     ) -> None:
+        """
+        :param endpoint: host and port of the MinIO server
+        :param access_key: access key of the MinIO account
+        :param secret: secret key of the MinIO account
+        :param pool_size: max number of kept-alive connections
+            defaults to DEFAULT_POOL_SIZE
+        :param cache_dir: the local directory of the read-through cache
+            used by `get_data` and `get_data_json`,
+            the cache is disabled when it is None
+            defaults to None
+        :param cache_max_bytes: the max size of the local cache
+            defaults to 2GB
+        """
+
         self.current_dir = os.path.dirname(__file__)
 
-        self.client = Minio(
+        self.client = get_minio_client(
             endpoint=endpoint,
             access_key=access_key,
-            secret_key=secret,
-            secure=False,
+            secret=secret,
+            pool_size=pool_size,
         )
 
+        self.cache = None
+        if cache_dir:
+            self.cache = LocalObjectCache(
+                cache_dir=cache_dir,
+                max_bytes=cache_max_bytes,
+            )
+
         self.logging = Logger()
 
+    def _read_object(
+        self,
+        bucket_name: str,
+        object_name: str,
+    ) -> bytes:
+        """
+        Read the whole content of an object,
+        going through the local cache when it is enabled
+
+        :param bucket_name: the name of the bucket
+        :param object_name: the full object name
+
+        :return: the content of the object
+        """
+
+        etag = None
+        if self.cache:
+            # revalidate against the current ETag so that
+            # an overwritten object is never served from the cache
+            etag = self.client.stat_object(
+                bucket_name=bucket_name,
+                object_name=object_name,
+            ).etag
+            data = self.cache.get(
+                bucket_name,
+                object_name,
+                etag,
+            )
+            if data is not None:
+                return data
+
+        request_headers = None
+        if etag:
+            # fail instead of caching a newer version under the old ETag
+            request_headers = {
+                'If-Match': f'"{etag}"',
+            }
+        response = self.client.get_object(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            request_headers=request_headers,
+        )
+        try:
+            data = response.data
+        finally:
+            response.close()
+            response.release_conn()
+
+        if self.cache:
+            self.cache.put(
+                bucket_name,
+                object_name,
+                etag,
+                data,
+            )
+
+        return data
+
     def gen_rundate_path(
         self,
         include_hours: bool = False
@@ -163,6 +331,31 @@ class MinioUtils:
             return False
         return True
 
+    def object_exist(
+        self,
+        object_name: str,
+        bucket_name: str = 'lakehouse',
+    ) -> bool:
+        """
+        Check if an object of any type exists
+
+        :param object_name: the full object name including extension
+        :param bucket_name: the name of the bucket to check
+            defaults to 'lakehouse'
+
+        :return: True if the object exists
+            otherwise False
+        """
+
+        obj = self.client.list_objects(
+            bucket_name=bucket_name,
+            prefix=object_name,
+        )
+
+        return any(
+            i.object_name == object_name for i in obj
+        )
+
     def load_data(
         self,
         data: pd.DataFrame,
@@ -204,6 +397,76 @@ class MinioUtils:
                 f'Done loading data with {len(data)} rows to Minio storage'
             )
 
+    def load_table(
+        self,
+        table: pa.Table,
+        file_path: str,
+        file_name: str,
+        bucket_name: str = 'lakehouse',
+        hide_log: bool = False,
+    ) -> None:
+        """
+        Load data from an Arrow table to storage
+
+        :param table: Arrow table contains data to load
+        :param file_path: the directory contains file to load the data
+        :param file_name: file name contains data to load
+            notes that file_name remove the ".parquet" extension
+        :param bucket_name: the name of the bucket
+            to load the data
+            defaults to 'lakehouse'
+        :param hide_log: whether to hide log
+            defaults to False
+        """
+
+        bytes_data = BytesIO()
+        pq.write_table(
+            table,
+            bytes_data,
+        )
+        bytes_data.seek(0)
+
+        self.client.put_object(
+            bucket_name=bucket_name,
+            object_name=f'{file_path}/{file_name}.parquet',
+            data=bytes_data,
+            length=bytes_data.getbuffer().nbytes,
+            content_type='parquet',
+        )
+
+        if not hide_log:
+            self.logging.info(
+                f'Done loading data with {table.num_rows} rows '
+                f'to Minio storage'
+            )
+
+    def load_file(
+        self,
+        local_path: str,
+        file_path: str,
+        file_name: str,
+        bucket_name: str = 'lakehouse',
+    ) -> None:
+        """
+        Stream a local parquet file to storage
+        without loading it in memory
+
+        :param local_path: path of the local parquet file
+        :param file_path: the directory contains file to load the data
+        :param file_name: file name contains data to load
+            notes that file_name remove the ".parquet" extension
+        :param bucket_name: the name of the bucket
+            to load the data
+            defaults to 'lakehouse'
+        """
+
+        self.client.fput_object(
+            bucket_name=bucket_name,
+            object_name=f'{file_path}/{file_name}.parquet',
+            file_path=local_path,
+            content_type='parquet',
+        )
+
     @retry_on_error(max_retries=4)
     def load_data_html(
         self,
@@ -247,10 +510,10 @@ class MinioUtils:
         bucket_name: str = 'lakehouse',
     ) -> dict:
         data = json.loads(
-            self.client.get_object(
+            self._read_object(
                 bucket_name=bucket_name,
                 object_name=f'{file_path}/{file_name}.json',
-            ).data.decode('utf-8')
+            ).decode('utf-8')
         )
 
         return data
@@ -278,10 +541,10 @@ class MinioUtils:
         """
 
         parquet_data = BytesIO(
-            self.client.get_object(
+            self._read_object(
                 bucket_name=bucket_name,
                 object_name=f'{file_path}/{file_name}.parquet',
-            ).data
+            )
         )
         df = pd.read_parquet(parquet_data)
 
@@ -2,7 +2,7 @@ import re
 import sys
 import warnings
 import asyncio
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, Browser
 from playwright.async_api import expect as async_expect
 
 sys.path.append(
@@ -20,27 +20,19 @@ from scripts.utils.country_info \
     import COUNTRIES_INFO           # noqa: E402
 
 
-async def _executor(
+async def _gen_context_cookies(
+    browser: Browser,
+    suffix: str,
     zipcode: str,
-    country: str,
-    headless: bool = True,
 ) -> dict:
-    suffix = COUNTRIES_INFO.get(
-        country
-    ).get(
-        'suffix',
+    # every context is an independent session of the same browser
+    context = await browser.new_context(
+        viewport={
+            'width': 1920,
+            'height': 1080,
+        },
     )
-    async with async_playwright() as a:
-        browser = await a.chromium.launch(
-            headless=headless,
-        )
-        context = await browser.new_context(
-            viewport={
-                'width': 1920,
-                'height': 1080,
-            },
-        )
-
+    try:
         page = await context.new_page()
 
         base_url = f'https://www.amazon{suffix}'
@@ -138,14 +130,81 @@ async def _executor(
         cookies = {}
         for i in await context.cookies():
             cookies[i['name']] = i['value']
-
-        await page.close()
+    finally:
         await context.close()
-        await browser.close()
 
     return cookies
 
 
+async def _executor_sessions(
+    zipcode: str,
+    country: str,
+    num_sessions: int = 1,
+    headless: bool = True,
+) -> list:
+    """
+    Generate independent cookie sessions pinned to a zipcode,
+    all in one browser with a context per session
+
+    :param zipcode: zipcode of the sessions
+    :param country: country of the sessions
+    :param num_sessions: number of sessions to generate
+        defaults to 1
+    :param headless: whether to hide the browser
+        defaults to True
+
+    :return: list of cookies, one per generated session,
+        sessions that failed are left out
+    """
+
+    suffix = COUNTRIES_INFO.get(
+        country
+    ).get(
+        'suffix',
+    )
+    async with async_playwright() as a:
+        browser = await a.chromium.launch(
+            headless=headless,
+        )
+        try:
+            results = await asyncio.gather(
+                *(
+                    _gen_context_cookies(
+                        browser,
+                        suffix,
+                        zipcode,
+                    ) for _ in range(num_sessions)
+                ),
+                return_exceptions=True,
+            )
+        finally:
+            await browser.close()
+
+    sessions = [i for i in results if not isinstance(i, BaseException)]
+    errors = [i for i in results if isinstance(i, BaseException)]
+    for e in errors:
+        print(f'Cannot generate a cookie session: {e}')
+    if not sessions:
+        raise errors[0]
+
+    return sessions
+
+
+async def _executor(
+    zipcode: str,
+    country: str,
+    headless: bool = True,
+) -> dict:
+    sessions = await _executor_sessions(
+        zipcode,
+        country,
+        1,
+        headless,
+    )
+
+    return sessions[0]
+
+
 def main(
     zipcode: str,
     country: str,
@@ -0,0 +1,116 @@
+import time
+import threading
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('pyarrow')
+pytest.importorskip('minio')
+pytest.importorskip('dotenv')
+pytest.importorskip('rich')
+
+from scripts.asin_catalog.snapshot import AsinCatalogSnapshot  # noqa: E402
+
+
+class MemoryMinio:
+    """
+    In-memory stand-in of the MinioUtils methods used by the snapshot
+    """
+
+    def __init__(self) -> None:
+        self.objects = dict()
+
+    def object_exist(self, bucket_name, object_name):
+        return (bucket_name, object_name) in self.objects
+
+    def get_data_json(self, file_path, file_name, bucket_name):
+        return dict(
+            self.objects[(bucket_name, f'{file_path}/{file_name}.json')]
+        )
+
+    def load_data_json(self, data, file_path, file_name, bucket_name):
+        self.objects[(bucket_name, f'{file_path}/{file_name}.json')] = data
+
+    def load_data(self, data, file_path, file_name, bucket_name, **kwargs):
+        self.objects[(bucket_name, f'{file_path}/{file_name}')] = data.copy()
+
+    def get_data(self, file_path, file_name, bucket_name):
+        return self.objects[(bucket_name, f'{file_path}/{file_name}')]
+
+
+class SheetSnapshot(AsinCatalogSnapshot):
+    def __init__(self, rows, **kwargs) -> None:
+        super().__init__(
+            minio=kwargs.pop('minio', MemoryMinio()),
+            user_creds={'type': 'service_account'},
+            sheet_id='sheet',
+            **kwargs,
+        )
+        self.rows = rows
+        self.num_reads = 0
+
+    def read_sheets(self, sheet_names=['us', 'int']):
+        self.num_reads += 1
+        time.sleep(0.01)
+        return pd.DataFrame(self.rows, columns=['asin', 'country'])
+
+
+def test_builds_missing_snapshot():
+    snapshot = SheetSnapshot([('A1', 'USA'), ('A2', 'GBR')])
+
+    assert snapshot.get_asins('USA') == ['A1']
+    assert snapshot.get_asins('DEU') == []
+    assert snapshot.num_reads == 1
+
+
+def test_rebuilds_stale_snapshot():
+    snapshot = SheetSnapshot([('A1', 'USA')], max_age=60)
+    snapshot.get_asins('USA')
+    snapshot.rows = [('A1', 'USA'), ('A3', 'USA')]
+
+    assert snapshot.get_asins('USA') == ['A1']
+    manifest = snapshot.get_manifest()
+    snapshot.minio.load_data_json(
+        {**manifest, 'checked_at': time.time() - 120},
+        snapshot.file_path,
+        snapshot.manifest_name,
+        snapshot.bucket_name,
+    )
+    assert snapshot.get_asins('USA') == ['A1', 'A3']
+
+
+def test_unchanged_catalog_refreshes_age():
+    snapshot = SheetSnapshot([('A1', 'USA')], max_age=0)
+    snapshot.build()
+    version = snapshot.get_manifest()['version']
+    snapshot.build()
+
+    assert snapshot.get_manifest()['version'] == version
+    assert time.time() - snapshot.get_manifest()['checked_at'] < 5
+
+
+def test_concurrent_callers_build_once():
+    minio = MemoryMinio()
+    snapshot = SheetSnapshot([('A1', 'USA')], minio=minio)
+    threads = [
+        threading.Thread(target=snapshot.get_asins, args=('USA',))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert snapshot.num_reads == 1
+
+
+def test_failed_rebuild_keeps_previous_snapshot():
+    snapshot = SheetSnapshot([('A1', 'USA')], max_age=0)
+    snapshot.get_asins('USA')
+
+    def broken(sheet_names=['us', 'int']):
+        raise Exception('quota exceeded')
+
+    snapshot.read_sheets = broken
+
+    assert snapshot.get_asins('USA') == ['A1']
@@ -0,0 +1,20 @@
+from scripts.asin_info.page_types import PAGE_TYPES
+
+
+def test_asin_pages_are_stored_by_asin():
+    assert PAGE_TYPES['asin_info'].get_file_name('B000123456') == (
+        'B000123456'
+    )
+
+
+def test_category_pages_are_stored_in_one_file():
+    best_sellers = PAGE_TYPES['best_sellers']
+
+    assert not best_sellers.per_asin
+    assert best_sellers.get_file_name('electronics/172541') == (
+        'electronics__172541'
+    )
+    assert best_sellers.get_url(
+        'https://www.amazon.com',
+        'electronics/172541',
+    ) == 'https://www.amazon.com/gp/bestsellers/electronics/172541'
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# scripts are imported as a package from the root of the repository
+sys.path.insert(
+    0,
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+)
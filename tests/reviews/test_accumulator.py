@@ -0,0 +1,76 @@
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+from scripts.reviews.accumulator \
+    import REVIEW_SCHEMA, ReviewColumnAccumulator  # noqa: E402
+
+
+def page(*ids) -> dict:
+    return {
+        'REVIEW_ID': list(ids),
+        'REVIEW_TITLE': [f'title {i}' for i in ids],
+        'RATING_STARS': [float('nan')] * len(ids),
+    }
+
+
+def table(*ids) -> pa.Table:
+    columns = {name: [None] * len(ids) for name in REVIEW_SCHEMA.names}
+    columns['REVIEW_ID'] = list(ids)
+
+    return pa.Table.from_pydict(columns, schema=REVIEW_SCHEMA)
+
+
+def test_builds_typed_table():
+    accumulator = ReviewColumnAccumulator()
+    accumulator.append(page('R1', 'R2'))
+    accumulator.append(page('R3'))
+    result = accumulator.to_table()
+
+    assert result.schema == REVIEW_SCHEMA
+    assert result.column('REVIEW_ID').to_pylist() == ['R1', 'R2', 'R3']
+    # NaN from pandas-style producers becomes null
+    assert result.column('RATING_STARS').null_count == 3
+
+
+def test_drops_duplicated_keys():
+    accumulator = ReviewColumnAccumulator(key='REVIEW_ID')
+    accumulator.append_table(table('R1', 'R2'))
+    accumulator.append(page('R2', 'R3', None))
+    accumulator.append(page('R3', None))
+    result = accumulator.to_table()
+
+    # rows without key cannot be matched and are kept
+    assert result.column('REVIEW_ID').to_pylist() == [
+        'R1', 'R2', 'R3', None, None,
+    ]
+    assert accumulator.num_duplicates == 2
+
+
+def test_keeps_every_row_without_key():
+    accumulator = ReviewColumnAccumulator()
+    accumulator.append(page('R1'))
+    accumulator.append(page('R1'))
+
+    assert accumulator.to_table().num_rows == 2
+    assert accumulator.num_duplicates == 0
+
+
+def test_spills_row_groups(tmp_path):
+    accumulator = ReviewColumnAccumulator(
+        spill_every=2,
+        spill_dir=str(tmp_path),
+        key='REVIEW_ID',
+    )
+    for i in range(5):
+        accumulator.append(page(f'R{i}', 'R0'))
+    try:
+        spill_path = accumulator.finish()
+        assert spill_path is not None
+        assert accumulator.to_table().column('REVIEW_ID').to_pylist() == [
+            f'R{i}' for i in range(5)
+        ]
+    finally:
+        accumulator.cleanup()
+
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,112 @@
+import time
+import threading
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+pytest.importorskip('pandas')
+pytest.importorskip('minio')
+pytest.importorskip('rich')
+
+from scripts.reviews.accumulator import REVIEW_SCHEMA  # noqa: E402
+from scripts.reviews.checkpoint import ReviewCheckpoint  # noqa: E402
+
+
+class MemoryMinio:
+    """
+    In-memory stand-in of the MinioUtils methods used by the checkpoint,
+    uploads of the manifest are slow to widen the race windows
+    """
+
+    def __init__(self, delay: float = 0) -> None:
+        self.objects = dict()
+        self.delay = delay
+
+    def object_exist(self, object_name, bucket_name):
+        return (bucket_name, object_name) in self.objects
+
+    def load_data_json(self, data, file_path, file_name, bucket_name):
+        time.sleep(self.delay)
+        self.objects[(bucket_name, f'{file_path}/{file_name}.json')] = data
+
+    def get_data_json(self, file_path, file_name, bucket_name):
+        return self.objects[(bucket_name, f'{file_path}/{file_name}.json')]
+
+    def load_table(self, table, file_path, file_name, bucket_name, **kwargs):
+        self.objects[(bucket_name, f'{file_path}/{file_name}')] = table
+
+    def get_data(self, file_path, file_name, bucket_name):
+        return self.objects[
+            (bucket_name, f'{file_path}/{file_name}')
+        ].to_pandas()
+
+    def truncate_folder(self, file_path, bucket_name):
+        for key in list(self.objects):
+            if key[0] == bucket_name and key[1].startswith(file_path):
+                del self.objects[key]
+
+
+def reviews(n: int) -> dict:
+    columns = {name: [None] * n for name in REVIEW_SCHEMA.names}
+    columns['REVIEW_ID'] = [f'R{i}' for i in range(n)]
+    columns['DATETIME'] = ['July 4, 2024'] * n
+
+    return columns
+
+
+def test_resumes_pages_of_previous_attempt():
+    minio = MemoryMinio()
+    checkpoint = ReviewCheckpoint(minio, 'amz/review_checkpoint/A1')
+    checkpoint.save_page('A1__all__1', reviews(10))
+    checkpoint.set_num_page('A1', 'five_star', 7)
+
+    resumed = ReviewCheckpoint(minio, 'amz/review_checkpoint/A1')
+    assert resumed.resumed_keys == ['A1__all__1']
+    assert resumed.is_done('A1__all__1')
+    assert not resumed.is_done('A1__all__2')
+    assert resumed.get_num_page('A1', 'five_star') == 7
+    tables = list(resumed.load_resumed_pages())
+    assert tables[0].num_rows == 10
+
+
+def test_concurrent_saves_keep_every_page():
+    minio = MemoryMinio(delay=0.01)
+    checkpoint = ReviewCheckpoint(minio, 'amz/review_checkpoint/A1')
+    threads = [
+        threading.Thread(
+            target=checkpoint.save_page,
+            args=(f'A1__all__{i}', reviews(1)),
+        )
+        for i in range(1, 11)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    resumed = ReviewCheckpoint(minio, 'amz/review_checkpoint/A1')
+    assert len(resumed.resumed_keys) == 10
+
+
+def test_readers_do_not_wait_for_uploads():
+    minio = MemoryMinio(delay=0.5)
+    checkpoint = ReviewCheckpoint(minio, 'amz/review_checkpoint/A1')
+    writer = threading.Thread(
+        target=checkpoint.save_page,
+        args=('A1__all__1', reviews(1)),
+    )
+    writer.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    assert checkpoint.is_done('A1__all__1')
+    assert time.monotonic() - start < 0.1
+    writer.join()
+
+
+def test_clear():
+    minio = MemoryMinio()
+    checkpoint = ReviewCheckpoint(minio, 'amz/review_checkpoint/A1')
+    checkpoint.save_page('A1__all__1', reviews(1))
+    checkpoint.clear()
+
+    assert minio.objects == {}
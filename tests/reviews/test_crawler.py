@@ -0,0 +1,326 @@
+import os
+import logging
+import threading
+import functools
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+for module in [
+    'bs4', 'selenium', 'requests', 'pytz', 'pyarrow', 'pandas',
+    'minio', 'psutil', 'pyvirtualdisplay', 'amazoncaptcha',
+    'deep_translator', 'rich', 'yaml',
+]:
+    pytest.importorskip(module)
+
+from scripts.reviews import crawler as crawler_module  # noqa: E402
+from scripts.reviews.crawler import AMZReview  # noqa: E402
+
+
+def histogram_page(num_review: int, shares: list) -> str:
+    rows = ''.join(
+        f'<tr><td>{5 - idx} star</td><td>{share}%</td></tr>'
+        for idx, share in enumerate(shares)
+    )
+
+    return (
+        f'<div data-hook="cr-filter-info-review-rating-count">'
+        f'{num_review} total ratings, {num_review} with reviews</div>'
+        f'<table id="histogramTable">{rows}</table>'
+    )
+
+
+def planner(variations: dict = None) -> AMZReview:
+    crawler = AMZReview.__new__(AMZReview)
+    crawler.logging = logging.getLogger(__name__)
+    crawler.get_variations = lambda asin: variations
+
+    return crawler
+
+
+def test_star_counts_keep_zero_percent_unknown():
+    counts = AMZReview.get_star_counts(
+        histogram_page(1000, [70, 20, 10, 0, 0])
+    )
+
+    assert counts == {
+        'five_star': 700,
+        'four_star': 200,
+        'three_star': 100,
+        'two_star': None,
+        'one_star': None,
+    }
+
+
+def test_star_counts_without_histogram():
+    assert AMZReview.get_star_counts('<html></html>') == {}
+
+
+def test_plan_uses_stars_when_they_reach_every_review():
+    counts = {
+        'five_star': 90, 'four_star': 40, 'three_star': 10,
+        'two_star': None, 'one_star': 5,
+    }
+
+    assert planner({'a': 'B1', 'b': 'B2'}).plan_filters('A', counts) == (
+        'star', [],
+    )
+
+
+def test_plan_uses_variations_reaching_more_reviews():
+    counts = {
+        'five_star': 600, 'four_star': 200, 'three_star': 50,
+        'two_star': 20, 'one_star': 30,
+    }
+    variations = {'parentAsin': 'P', **{str(i): f'B{i}' for i in range(8)}}
+    plan, asins = planner(variations).plan_filters('A', counts)
+
+    assert plan == 'variation'
+    assert 'P' not in asins and len(asins) == 8
+
+
+def test_plan_caps_the_number_of_variations():
+    counts = {
+        'five_star': 6000, 'four_star': 2000, 'three_star': 500,
+        'two_star': 200, 'one_star': 300,
+    }
+    variations = {str(i): f'B{i}' for i in range(40)}
+
+    assert planner(variations).plan_filters('A', counts)[0] == 'star'
+
+
+def test_plan_without_histogram_uses_variation_count():
+    variations = {str(i): f'B{i}' for i in range(6)}
+
+    assert planner(variations).plan_filters('A', {})[0] == 'variation'
+    assert planner(None).plan_filters('A', {})[0] == 'star'
+
+
+class MemoryStore:
+    def __init__(self) -> None:
+        self.states = dict()
+
+    def get(self, asin):
+        return self.states.get(asin)
+
+    def put(self, asin, state):
+        self.states[asin] = state
+
+
+class PageDriver:
+    def __init__(self, title: str = 'Amazon.com') -> None:
+        self.title = title
+
+
+def variation_reader(page_source: str, title: str = 'Amazon.com'):
+    crawler = planner()
+    del crawler.get_variations
+    crawler.base_url = 'https://www.amazon.com'
+    crawler.title_503 = 'Sorry! Something went wrong!'
+    crawler.sign_in_title = 'Amazon Sign-In'
+    crawler.not_found_title = 'Page Not Found'
+    crawler.variation_store = MemoryStore()
+    crawler.local_context = type('Context', (), {})()
+    crawler.local_context.driver = PageDriver(title)
+    crawler.load_page = lambda url: page_source
+
+    return crawler
+
+
+PRODUCT_PAGE = (
+    '<span id="productTitle">Product</span><script>'
+    '"parentAsin":"P1", "dimensionToAsinMap" : {"0":"B1","1":"B2"},'
+    '"other": {}</script>'
+)
+
+
+def test_variations_are_stored():
+    crawler = variation_reader(PRODUCT_PAGE)
+
+    assert crawler.get_variations('A') == {
+        '0': 'B1', '1': 'B2', 'parentAsin': 'P1',
+    }
+    assert crawler.variation_store.get('A') == {
+        'variations': {'0': 'B1', '1': 'B2', 'parentAsin': 'P1'},
+    }
+
+
+def test_no_variation_is_stored():
+    crawler = variation_reader('<span id="productTitle">Product</span>')
+
+    assert crawler.get_variations('A') is None
+    assert crawler.variation_store.get('A') == {'variations': None}
+
+
+@pytest.mark.parametrize(
+    'page_source, title',
+    [
+        ('<input id="captchacharacters">', 'Amazon.com'),
+        (PRODUCT_PAGE, 'Sorry! Something went wrong!'),
+        (
+            '<span id="productTitle"></span>"parentAsin":"P1",'
+            '"dimensionToAsinMap":{"0":',
+            'Amazon.com',
+        ),
+    ],
+)
+def test_blocked_page_is_not_stored(page_source, title):
+    crawler = variation_reader(page_source, title)
+
+    assert crawler.get_variations('A') is None
+    assert crawler.variation_store.get('A') is None
+
+
+def no_driver_crawler(monkeypatch) -> AMZReview:
+    def factory():
+        raise Exception('chromedriver is gone')
+
+    # give up on the first failed build
+    monkeypatch.setattr(
+        crawler_module,
+        'AMZDriverPool',
+        functools.partial(
+            crawler_module.AMZDriverPool,
+            max_build_failures=1,
+            build_backoff=0,
+        ),
+    )
+    monkeypatch.setattr(crawler_module, 'get_parser_pool', lambda i: None)
+    crawler = planner()
+    crawler.num_worker = 2
+    crawler.num_parser = None
+    crawler.max_active_asin = 4
+    crawler.lifecycle = None
+    crawler.title_503 = 'Sorry! Something went wrong!'
+    crawler.sign_in_title = 'Amazon Sign-In'
+    crawler.not_found_title = 'Page Not Found'
+    crawler.local_context = threading.local()
+    crawler._generate_driver = factory
+    crawler._check_asin_crawled = lambda asin: False
+
+    return crawler
+
+
+def run_main(crawler: AMZReview, asins: list) -> list:
+    errors = list()
+
+    def main():
+        try:
+            crawler.main(asins, use_display=False)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=main, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    assert not thread.is_alive(), 'main hangs without driver'
+
+    return errors
+
+
+@pytest.mark.parametrize('max_active_asin', [1, 4])
+def test_main_fails_when_no_driver_can_be_built(
+    monkeypatch,
+    max_active_asin,
+):
+    crawler = no_driver_crawler(monkeypatch)
+    crawler.max_active_asin = max_active_asin
+    errors = run_main(crawler, ['A', 'B', 'C'])
+
+    assert [str(i) for i in errors] == [
+        'CANNOT BUILD DRIVERS: chromedriver is gone',
+    ]
+    # queued ASINs are not tried once the pool gave up
+    assert crawler.progress['crawled'] == 0
+    assert crawler.progress['retried'] == 0
+    assert crawler.progress['failed'] == 3
+
+
+@pytest.fixture
+def parser_pool(monkeypatch):
+    # a pool of the test only, the shared one is left alone
+    monkeypatch.setattr(crawler_module, '_parser_pool', None)
+    monkeypatch.setattr(crawler_module, '_parser_pool_size', None)
+    pool = crawler_module.get_parser_pool(1)
+    yield pool
+    for i in {pool, crawler_module._parser_pool}:
+        if i is not None:
+            i.shutdown(wait=True)
+
+
+def page_parser() -> AMZReview:
+    crawler = planner()
+    crawler.num_parser = 1
+    crawler.base_url = 'https://www.amazon.com'
+    crawler.country = 'USA'
+
+    return crawler
+
+
+def test_broken_parser_pool_is_replaced(parser_pool):
+    # a parser process killed, e.g. by the OOM killer
+    with pytest.raises(BrokenProcessPool):
+        parser_pool.submit(os._exit, 1).result(timeout=60)
+
+    future = page_parser().submit_page('<html></html>')
+
+    assert future.result(timeout=60)['reviews']['REVIEW_ID'] == []
+    assert crawler_module.get_parser_pool() is not parser_pool
+
+
+def test_page_failed_by_broken_pool_drops_it(parser_pool):
+    future = Future()
+    future.set_exception(BrokenProcessPool('parser died'))
+    AMZReview.on_page_parsed(parser_pool, future)
+
+    assert crawler_module.get_parser_pool() is not parser_pool
+
+    other = crawler_module.get_parser_pool()
+    future = Future()
+    future.set_exception(ValueError('bad page'))
+    AMZReview.on_page_parsed(other, future)
+
+    assert crawler_module.get_parser_pool() is other
+
+
+def driver_options(monkeypatch, lean_browsing: bool) -> dict:
+    built = dict()
+
+    def fake_driver(**kwargs):
+        built.update(kwargs)
+
+    monkeypatch.setattr(crawler_module, 'AMZDriver', fake_driver)
+    monkeypatch.setattr(crawler_module, 'ChromeService', lambda i: i)
+    monkeypatch.setattr(
+        crawler_module,
+        'get_chromedriver_path',
+        lambda: '/usr/bin/chromedriver',
+    )
+    crawler = planner()
+    crawler.country = 'USA'
+    crawler.current_dir = os.path.dirname(crawler_module.__file__)
+    crawler.lean_browsing = lean_browsing
+    crawler._generate_driver()
+
+    return built
+
+
+def test_lean_browsing_blocks_media_by_url(monkeypatch):
+    built = driver_options(monkeypatch, lean_browsing=True)
+    options = built['options']
+
+    assert '--headless=new' in options.arguments
+    # media_stream is the camera and microphone permission
+    assert not any(
+        'media_stream' in i
+        for i in options.experimental_options['prefs']
+    )
+    assert {'*.mp4', '*.webm', '*.m3u8'} <= set(built['blocked_urls'])
+
+
+def test_lean_browsing_can_be_turned_off(monkeypatch):
+    built = driver_options(monkeypatch, lean_browsing=False)
+
+    assert '--headless=new' not in built['options'].arguments
+    assert built['blocked_urls'] is None
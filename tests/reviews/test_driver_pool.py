@@ -0,0 +1,204 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+from scripts.reviews.driver_pool import AMZDriverPool
+
+
+class FakeDriver:
+    def __init__(self, title: str = 'Amazon.com') -> None:
+        self.title = title
+        self.quitted = False
+
+    def execute_script(self, script):
+        if self.quitted:
+            raise Exception('driver is gone')
+        return 'complete'
+
+    def quit(self):
+        self.quitted = True
+
+
+def test_warms_up_drivers():
+    pool = AMZDriverPool(factory=FakeDriver, size=2, num_spare=1)
+    pool.start()
+    try:
+        drivers = [pool.acquire(timeout=5) for _ in range(3)]
+        assert len(set(drivers)) == 3
+    finally:
+        pool.close()
+
+    assert all(i.quitted for i in drivers)
+
+
+def test_replace_discards_bad_driver():
+    pool = AMZDriverPool(factory=FakeDriver, size=1, num_spare=0)
+    pool.start()
+    try:
+        driver = pool.acquire(timeout=5)
+        new_driver = pool.replace(driver, timeout=5)
+        assert new_driver is not driver
+    finally:
+        pool.close()
+
+    assert driver.quitted
+
+
+def test_skips_drivers_with_bad_title():
+    drivers = iter([FakeDriver('Page Not Found'), FakeDriver()])
+    pool = AMZDriverPool(
+        factory=lambda: next(drivers),
+        size=1,
+        num_spare=0,
+        bad_titles=['Page Not Found'],
+    )
+    pool.start()
+    try:
+        assert pool.acquire(timeout=5).title == 'Amazon.com'
+    finally:
+        pool.close()
+
+
+def test_failed_builds_are_retried():
+    attempts = []
+    lock = threading.Lock()
+
+    def flaky_factory():
+        with lock:
+            attempts.append(1)
+            if len(attempts) <= 2:
+                raise Exception('proxy not ok')
+        return FakeDriver()
+
+    pool = AMZDriverPool(
+        factory=flaky_factory,
+        size=1,
+        num_spare=0,
+        num_builder=1,
+        build_backoff=0.001,
+    )
+    pool.start()
+    try:
+        assert pool.acquire(timeout=5)
+        assert pool.num_failures == 0
+    finally:
+        pool.close()
+
+
+def test_waiting_callers_fail_once_builds_keep_failing():
+    def broken_factory():
+        raise Exception('chromedriver mismatch')
+
+    pool = AMZDriverPool(
+        factory=broken_factory,
+        size=2,
+        num_spare=0,
+        max_build_failures=3,
+        build_backoff=0.001,
+    )
+    pool.start()
+    errors = []
+
+    def worker():
+        try:
+            pool.acquire(timeout=5)
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    pool.close()
+
+    assert len(errors) == 2
+    assert all('chromedriver mismatch' in str(i) for i in errors)
+    with pytest.raises(Exception, match='CANNOT BUILD DRIVERS'):
+        pool.acquire(timeout=1)
+
+
+class FakeLifecycle:
+    def __init__(self) -> None:
+        self.num_building = 0
+        self.registered = list()
+
+    def wait_for_budget(self):
+        return True
+
+    @contextmanager
+    def building(self, stop_event=None):
+        self.num_building += 1
+        try:
+            yield
+        finally:
+            self.num_building -= 1
+
+    def register(self, driver):
+        # the driver is tracked before its build ends
+        self.registered.append((driver, self.num_building))
+
+    def is_bloated(self, driver):
+        return False
+
+    def quit(self, driver):
+        driver.quit()
+
+
+def test_builds_are_marked_until_registered():
+    lifecycle = FakeLifecycle()
+    pool = AMZDriverPool(
+        factory=FakeDriver,
+        size=1,
+        num_spare=0,
+        lifecycle=lifecycle,
+    )
+    pool.start()
+    try:
+        driver = pool.acquire(timeout=5)
+    finally:
+        pool.close()
+
+    assert lifecycle.registered == [(driver, 1)]
+    assert lifecycle.num_building == 0
+
+
+def test_pools_share_the_browser_cap():
+    pytest.importorskip('psutil')
+    pytest.importorskip('pyvirtualdisplay')
+    from scripts.utils.browser_lifecycle import BrowserLifecycle
+
+    lifecycle = BrowserLifecycle(max_rss=2 ** 40, max_browsers=2)
+    first = AMZDriverPool(
+        factory=FakeDriver,
+        size=2,
+        num_spare=0,
+        lifecycle=lifecycle,
+    )
+    second = AMZDriverPool(
+        factory=FakeDriver,
+        size=1,
+        num_spare=0,
+        lifecycle=lifecycle,
+    )
+    first.start()
+    try:
+        drivers = [first.acquire(timeout=5) for _ in range(2)]
+        second.start()
+        # every slot is taken by the first pool
+        with pytest.raises(queue.Empty):
+            second.acquire(timeout=1.5)
+        assert len(lifecycle.drivers) == 2
+
+        # a slot freed by a pool goes to the other one
+        first.close()
+        assert second.acquire(timeout=5)
+        assert len(lifecycle.drivers) == 1
+    finally:
+        first.close()
+        second.close()
+        lifecycle.stop_event.set()
+
+    assert all(i.quitted for i in drivers)
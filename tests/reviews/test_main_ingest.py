@@ -0,0 +1,45 @@
+import pytest
+
+for module in [
+    'bs4', 'selenium', 'requests', 'pytz', 'pyarrow', 'pandas',
+    'minio', 'psutil', 'pyvirtualdisplay', 'amazoncaptcha',
+    'deep_translator', 'rich', 'yaml',
+]:
+    pytest.importorskip(module)
+
+from scripts.reviews import main_ingest  # noqa: E402
+from scripts.reviews.main_ingest import AMZReviewOrchestrator  # noqa: E402
+
+
+class FakeCrawler:
+    def __init__(self, num_worker, rundate_path, country, **kwargs):
+        self.num_worker = num_worker
+        self.country = country
+        self.kwargs = kwargs
+        self.asins = None
+
+    def main(self, asins, use_display=True):
+        self.asins = asins
+
+
+def orchestrator(lean_browsing: bool = True) -> AMZReviewOrchestrator:
+    # the shared browser lifecycle is not started
+    job = AMZReviewOrchestrator.__new__(AMZReviewOrchestrator)
+    job.rundate_path = '2024/07/04'
+    job.incremental = False
+    job.lean_browsing = lean_browsing
+    job.lifecycle = None
+    job.crawlers = dict()
+
+    return job
+
+
+@pytest.mark.parametrize('lean_browsing', [True, False])
+def test_run_country_passes_lean_browsing(monkeypatch, lean_browsing):
+    monkeypatch.setattr(main_ingest, 'AMZReview', FakeCrawler)
+    job = orchestrator(lean_browsing=lean_browsing)
+    job.run_country('DEU', ['A', 'B'], 2)
+
+    crawler = job.crawlers['DEU']
+    assert crawler.kwargs['lean_browsing'] is lean_browsing
+    assert crawler.asins == ['A', 'B']
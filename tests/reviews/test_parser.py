@@ -0,0 +1,198 @@
+import pytest
+
+pytest.importorskip('bs4')
+pytest.importorskip('deep_translator')
+pytest.importorskip('rich')
+
+from scripts.reviews import parser  # noqa: E402
+
+
+def test_parse_star_histogram():
+    text = '5 star 62% 4 star 18% 3 star 9% 2 star 0% 1 star 11%'
+
+    assert parser.parse_star_histogram(text) == {
+        5: 62, 4: 18, 3: 9, 2: 0, 1: 11,
+    }
+
+
+def test_parse_star_histogram_incomplete():
+    assert parser.parse_star_histogram('') == {}
+    assert parser.parse_star_histogram('5 star 62% 4 star 38%') == {}
+
+
+@pytest.mark.parametrize(
+    'text, count',
+    [
+        ('1,234 total ratings, 567 with reviews', 567),
+        ('12.345 valutazioni globali, 1.234 con recensioni', 1234),
+        ('', None),
+    ],
+)
+def test_parse_review_count(text, count):
+    assert parser.parse_review_count(text) == count
+
+
+@pytest.mark.parametrize(
+    'text, country, expected',
+    [
+        (
+            'Reviewed in the United States on July 4, 2024',
+            'USA',
+            ('United States', 'July 4, 2024'),
+        ),
+        (
+            'Reviewed in the United Kingdom on 4 July 2024',
+            'GBR',
+            ('United Kingdom', 'July 4, 2024'),
+        ),
+        (
+            'Rezension aus Deutschland vom 4. März 2024',
+            'DEU',
+            ('Germany', 'March 4, 2024'),
+        ),
+        (
+            'Rezension aus den Vereinigten Staaten vom 14. Juli 2024',
+            'DEU',
+            ('United States', 'July 14, 2024'),
+        ),
+        (
+            'Commenté en France le 1er août 2024',
+            'FRA',
+            ('France', 'August 1, 2024'),
+        ),
+        (
+            'Recensito in Italia il 4 luglio 2024',
+            'ITA',
+            ('Italy', 'July 4, 2024'),
+        ),
+        (
+            'Reseñado en España el 4 de julio de 2024',
+            'ESP',
+            ('Spain', 'July 4, 2024'),
+        ),
+        (
+            'Calificado en México el 4 de julio de 2024',
+            'MEX',
+            ('Mexico', 'July 4, 2024'),
+        ),
+        (
+            '2024年7月4日に日本でレビュー済み',
+            'JPN',
+            ('Japan', 'July 4, 2024'),
+        ),
+    ],
+)
+def test_parse_location_date(text, country, expected, monkeypatch):
+    # known locales are parsed without the translator
+    monkeypatch.setattr(parser, 'translate', None)
+
+    assert parser.parse_location_date(text, country) == expected
+
+
+def test_parse_location_date_translates_unknown_parts(monkeypatch):
+    translations = {
+        'Brasilien': 'Brazil',
+        'Bewertet in Brasilien am 4. Juli 2024':
+            'Reviewed in Brazil on July 4, 2024',
+    }
+    monkeypatch.setattr(parser, 'translate', translations.get)
+
+    # unknown location
+    assert parser.parse_location_date(
+        'Rezension aus Brasilien vom 4. Juli 2024',
+        'DEU',
+    ) == ('Brazil', 'July 4, 2024')
+    # unknown format
+    assert parser.parse_location_date(
+        'Bewertet in Brasilien am 4. Juli 2024',
+        'DEU',
+    ) == ('Brazil', 'July 4, 2024')
+
+
+def test_parse_location_date_keeps_unparsed_text(monkeypatch):
+    def translate(text):
+        raise Exception('translator is down')
+
+    monkeypatch.setattr(parser, 'translate', translate)
+    text = 'Rezension vom 4. Juli 2024'
+
+    assert parser.parse_location_date(text, 'DEU') == (text, text)
+    assert parser.parse_location_date(
+        'Reviewed on July 4, 2024',
+        'USA',
+    ) == ('Reviewed on July 4, 2024', 'Reviewed on July 4, 2024')
+
+
+@pytest.mark.parametrize(
+    'date, expected',
+    [
+        ('July 4, 2024', '2024-07-04'),
+        ('Rezension aus Deutschland vom 4. Juli 2024', None),
+        (None, None),
+    ],
+)
+def test_parse_review_date(date, expected):
+    result = parser.parse_review_date(date)
+
+    assert (result.isoformat() if result else None) == expected
+
+
+def test_drop_known_reviews():
+    reviews = {
+        'REVIEW_ID': ['R1', 'R2', 'R3', 'R4', 'R5'],
+        'DATETIME': [
+            'July 5, 2024',
+            'July 4, 2024',
+            'July 4, 2024',
+            'July 3, 2024',
+            'not a date',
+        ],
+    }
+    kept, num_dropped = parser.drop_known_reviews(
+        reviews,
+        '2024-07-04',
+        ['R3'],
+    )
+
+    # same-day reviews are kept unless their id was crawled,
+    # reviews without a date cannot be compared and are kept
+    assert kept['REVIEW_ID'] == ['R1', 'R2', 'R5']
+    assert num_dropped == 2
+
+
+def test_drop_known_reviews_keeps_new_page():
+    reviews = {
+        'REVIEW_ID': ['R1'],
+        'DATETIME': ['July 5, 2024'],
+    }
+
+    assert parser.drop_known_reviews(reviews, '2024-07-04') == (reviews, 0)
+
+
+def review_element(html: str):
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(html, 'html.parser').div
+
+
+def test_get_review_id_from_element():
+    for element_id in [
+        'R2ABCDEFGHIJKL',
+        'customer_review-R2ABCDEFGHIJKL',
+        'customer_review_foreign-R2ABCDEFGHIJKL',
+    ]:
+        review = review_element(f'<div id="{element_id}"></div>')
+
+        assert parser.get_review_id(review, 'a') == 'R2ABCDEFGHIJKL'
+
+
+def test_get_review_id_hashes_content():
+    review = review_element('<div data-hook="review"></div>')
+    review_id = parser.get_review_id(review, 'name', '5.0', None)
+
+    assert review_id == parser.get_review_id(review, 'name', '5.0', None)
+    assert review_id != parser.get_review_id(review, 'name', '4.0', None)
+    # fields are separated, moving text across them changes the id
+    assert parser.get_review_id(review, 'ab', 'c') != parser.get_review_id(
+        review, 'a', 'bc'
+    )
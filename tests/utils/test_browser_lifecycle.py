@@ -0,0 +1,99 @@
+import time
+import shutil
+import threading
+import subprocess
+
+import pytest
+
+pytest.importorskip('psutil')
+pytest.importorskip('pyvirtualdisplay')
+
+from scripts.utils.browser_lifecycle import BrowserLifecycle  # noqa: E402
+
+
+@pytest.fixture
+def lifecycle():
+    lifecycle = BrowserLifecycle(max_rss=2 ** 40, grace_period=0)
+    yield lifecycle
+    lifecycle.stop_event.set()
+
+
+@pytest.fixture
+def start_browser(tmp_path):
+    # any process named like a browser is reaped
+    browser = tmp_path / 'chrome'
+    shutil.copy(shutil.which('sleep'), browser)
+    processes = list()
+
+    def start():
+        process = subprocess.Popen([str(browser), '30'])
+        processes.append(process)
+        # let the process outlive the grace period
+        time.sleep(0.1)
+        return process
+
+    yield start
+    for process in processes:
+        process.kill()
+        process.wait()
+
+
+def test_reaps_untracked_browser(lifecycle, start_browser):
+    process = start_browser()
+
+    assert lifecycle.reap() == 1
+    assert process.wait(timeout=5) is not None
+
+
+def test_spares_browser_being_built(lifecycle, start_browser):
+    older = start_browser()
+    # out of the slack given to the builds
+    time.sleep(1.5)
+    with lifecycle.building():
+        process = start_browser()
+        # only the browser started before the build is reaped
+        assert lifecycle.reap() == 1
+        assert older.wait(timeout=5) is not None
+        assert process.poll() is None
+
+    assert lifecycle.reap() == 1
+    assert process.wait(timeout=5) is not None
+
+
+def test_builds_wait_for_a_browser_slot():
+    lifecycle = BrowserLifecycle(max_rss=2 ** 40, max_browsers=1)
+    started = list()
+
+    def build():
+        with lifecycle.building():
+            started.append(time.time())
+
+    try:
+        with lifecycle.building():
+            thread = threading.Thread(target=build)
+            thread.start()
+            thread.join(timeout=1.5)
+            assert started == []
+            ended = time.time()
+        thread.join(timeout=5)
+
+        assert len(started) == 1
+        assert started[0] >= ended
+    finally:
+        lifecycle.stop_event.set()
+
+
+def test_wait_for_a_browser_slot_can_be_stopped():
+    lifecycle = BrowserLifecycle(max_rss=2 ** 40, max_browsers=1)
+    lifecycle.drivers['driver'] = None
+    stop_event = threading.Event()
+    stop_event.set()
+
+    try:
+        with pytest.raises(Exception, match='STOPPED WAITING'):
+            with lifecycle.building(stop_event):
+                pass
+        assert lifecycle.builds == {}
+    finally:
+        lifecycle.drivers.clear()
+        lifecycle.stop_event.set()
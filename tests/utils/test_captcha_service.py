@@ -0,0 +1,129 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+pytest.importorskip('amazoncaptcha')
+
+from scripts.utils.captcha_service import (  # noqa: E402
+    NOT_SOLVED,
+    CaptchaService,
+)
+
+
+class FakePool:
+    """
+    Solve in the calling thread, the answers are taken in order,
+    an exception is set on the future, BrokenProcessPool raised
+    from submit when given as a class
+    """
+
+    def __init__(self, answers: list) -> None:
+        self.answers = list(answers)
+        self.num_submitted = 0
+        self.is_shutdown = False
+
+    def submit(self, fn, image):
+        answer = self.answers.pop(0)
+        if answer is BrokenProcessPool:
+            raise BrokenProcessPool('submit')
+        self.num_submitted += 1
+        solving = Future()
+        if isinstance(answer, Exception):
+            solving.set_exception(answer)
+        else:
+            solving.set_result((answer, 0.5))
+
+        return solving
+
+    def shutdown(self, wait=True):
+        self.is_shutdown = True
+
+
+def service_with(*pools: FakePool) -> CaptchaService:
+    service = CaptchaService(cache_size=2)
+    pools = list(pools)
+
+    def get_pool():
+        with service.lock:
+            if service.pool is None:
+                service.pool = pools.pop(0)
+
+            return service.pool
+
+    service._get_pool = get_pool
+
+    return service
+
+
+def test_solutions_are_cached():
+    pool = FakePool(['ABCD'])
+    service = service_with(pool)
+
+    assert service.solve(b'image') == 'ABCD'
+    assert service.solve(b'image') == 'ABCD'
+    assert pool.num_submitted == 1
+    metrics = service.get_metrics()
+    assert metrics['requested'] == 2
+    assert metrics['cache_hits'] == 1
+    assert metrics['avg_solve_seconds'] == 0.5
+
+
+def test_cache_keeps_latest_solutions():
+    pool = FakePool(['A', 'B', 'C', 'A'])
+    service = service_with(pool)
+
+    for image in [b'a', b'b', b'c', b'a']:
+        service.solve(image)
+
+    assert pool.num_submitted == 4
+    assert list(service.cache.values()) == ['C', 'A']
+
+
+def test_unsolved_image_is_not_cached():
+    pool = FakePool([NOT_SOLVED, 'ABCD'])
+    service = service_with(pool)
+
+    assert service.solve(b'image') is None
+    assert service.solve(b'image') == 'ABCD'
+    assert service.get_metrics()['not_solved'] == 1
+
+
+def test_rejected_solution_is_dropped():
+    pool = FakePool(['ABCD', 'EFGH'])
+    service = service_with(pool)
+
+    service.solve(b'image')
+    service.report(b'image', accepted=False)
+    assert service.solve(b'image') == 'EFGH'
+    service.report(b'image', accepted=True)
+
+    metrics = service.get_metrics()
+    assert metrics['accepted'] == 1
+    assert metrics['rejected'] == 1
+    assert metrics['solve_rate'] == 0.5
+
+
+def test_failed_solve_gives_empty_solution():
+    pool = FakePool([ValueError('bad image')])
+    service = service_with(pool)
+
+    assert service.solve(b'image') is None
+    assert service.get_metrics()['failed'] == 1
+    assert service.pool is pool
+
+
+@pytest.mark.parametrize(
+    'answer',
+    [BrokenProcessPool, BrokenProcessPool('worker died')],
+)
+def test_broken_pool_is_recreated(answer):
+    broken = FakePool([answer])
+    pool = FakePool(['ABCD'])
+    service = service_with(broken, pool)
+
+    assert service.solve(b'image') is None
+    assert broken.is_shutdown
+    assert service.solve(b'image') == 'ABCD'
+    assert service.pool is pool
+    assert service.get_metrics()['failed'] == 1
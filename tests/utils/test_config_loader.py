@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+
+# the loader reads credentials through MinioUtils
+pytest.importorskip('minio')
+pytest.importorskip('pandas')
+pytest.importorskip('pyarrow')
+
+from scripts.utils import config_loader  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    config_loader.clear_cache()
+    yield
+    config_loader.clear_cache()
+
+
+def test_load_config_is_memoized(tmp_path):
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text('a: 1\n')
+
+    assert config_loader.load_config(str(config_path)) == {'a': 1}
+    config_path.write_text('a: 2\n')
+    assert config_loader.load_config(str(config_path)) == {'a': 1}
+    assert config_loader.load_config(str(config_path), ttl=0) == {'a': 2}
+
+
+def test_callers_get_their_own_copy(tmp_path):
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text('a: [1]\n')
+    config_loader.load_config(str(config_path))['a'].append(2)
+
+    assert config_loader.load_config(str(config_path)) == {'a': [1]}
+
+
+def test_slow_load_does_not_block_other_keys():
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_loader():
+        started.set()
+        release.wait(5)
+        return {'slow': True}
+
+    thread = threading.Thread(
+        target=config_loader._memoize,
+        args=(('slow',), 60, slow_loader),
+    )
+    thread.start()
+    started.wait(5)
+    try:
+        assert config_loader._memoize(
+            ('fast',), 60, lambda: {'fast': True}
+        ) == {'fast': True}
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_same_key_is_loaded_once():
+    calls = []
+    lock = threading.Lock()
+
+    def loader():
+        with lock:
+            calls.append(1)
+        return {}
+
+    threads = [
+        threading.Thread(
+            target=config_loader._memoize,
+            args=(('key',), 60, loader),
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+
+
+def test_minio_json_key_has_every_credential(monkeypatch):
+    keys = []
+    monkeypatch.setattr(
+        config_loader,
+        '_memoize',
+        lambda key, ttl, loader: keys.append(key),
+    )
+    for access_key, secret in [('a', 's1'), ('b', 's1'), ('a', 's2')]:
+        config_loader.load_minio_json(
+            file_path='creds',
+            file_name='sheet',
+            bucket_name='credentials',
+            endpoint='minio:9000',
+            access_key=access_key,
+            secret=secret,
+        )
+
+    assert len(set(keys)) == 3
+    assert not any('s1' in key or 's2' in key for key in keys)
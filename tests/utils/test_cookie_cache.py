@@ -0,0 +1,190 @@
+import asyncio
+import threading
+
+import pytest
+
+for module in ['pytz', 'urllib3', 'minio', 'pandas', 'pyarrow', 'rich']:
+    pytest.importorskip(module)
+
+from scripts.utils.cookie_cache import (  # noqa: E402
+    CookieJarCache,
+    CookieSessionPool,
+)
+
+
+class Generator:
+    def __init__(self) -> None:
+        self.calls = list()
+
+    async def __call__(self, zipcode, country, num_sessions):
+        self.calls.append(num_sessions)
+        start = sum(self.calls) - num_sessions
+
+        return [{'id': start + i} for i in range(num_sessions)]
+
+
+def session_pool(tmp_path, probe=None, size=3):
+    generate = Generator()
+    pool = CookieSessionPool(
+        country='USA',
+        zipcode='10001',
+        size=size,
+        cache=CookieJarCache(local_dir=str(tmp_path)),
+        generate=generate,
+        probe=probe,
+    )
+
+    return pool, generate
+
+
+def test_jar_expires(tmp_path):
+    cache = CookieJarCache(local_dir=str(tmp_path), ttl=60)
+    cache.put('USA', '10001', {'a': 1}, slot=1)
+
+    assert cache.get('USA', '10001', slot=1) == {'a': 1}
+    assert cache.get('USA', '10001') is None
+
+    cache.ttl = -1
+    assert cache.get('USA', '10001', slot=1) is None
+
+
+def test_refill_generates_missing_sessions_once(tmp_path):
+    pool, generate = session_pool(tmp_path)
+    asyncio.run(pool.refill())
+
+    assert generate.calls == [3]
+    assert [i.cookies for i in pool.active] == [
+        {'id': 0}, {'id': 1}, {'id': 2},
+    ]
+
+    # sessions are reused from the cache by a new pool
+    other, other_generate = session_pool(tmp_path)
+    asyncio.run(other.refill())
+
+    assert other_generate.calls == []
+    assert [i.cookies for i in other.active] == [
+        {'id': 0}, {'id': 1}, {'id': 2},
+    ]
+
+
+def test_refill_skips_cookies_failing_probe(tmp_path):
+    async def probe(cookies):
+        return cookies['id'] != 1
+
+    pool, _ = session_pool(tmp_path)
+    asyncio.run(pool.refill())
+    other, generate = session_pool(tmp_path, probe=probe)
+    asyncio.run(other.refill())
+
+    # only the session failing the probe is generated again
+    assert generate.calls == [1]
+    assert [i.cookies for i in other.active] == [
+        {'id': 0}, {'id': 0}, {'id': 2},
+    ]
+
+
+def test_next_round_robins_active_sessions(tmp_path):
+    pool, _ = session_pool(tmp_path, size=2)
+    asyncio.run(pool.refill())
+
+    slots = [pool.next().slot for _ in range(4)]
+
+    assert slots == [0, 1, 0, 1]
+    assert [i.num_requests for i in pool.active] == [2, 2]
+
+
+def test_retired_session_is_regenerated(tmp_path):
+    pool, generate = session_pool(tmp_path)
+    asyncio.run(pool.refill())
+    session = pool.active[1]
+
+    asyncio.run(pool.retire(session))
+    asyncio.run(pool.retire(session))
+
+    assert [i.slot for i in pool.active] == [0, 2]
+    assert pool.cache.get('USA', '10001', slot=1) is None
+
+    asyncio.run(pool.refill())
+
+    assert generate.calls == [3, 1]
+    assert [i.slot for i in pool.active] == [0, 1, 2]
+    assert pool.active[1].cookies == {'id': 3}
+    assert pool.cache.get('USA', '10001', slot=1) == {'id': 3}
+
+
+def test_every_session_retired(tmp_path):
+    pool, _ = session_pool(tmp_path, size=1)
+    asyncio.run(pool.refill())
+    asyncio.run(pool.retire(pool.next()))
+
+    assert pool.next() is None
+
+
+def test_refill_fails_without_session(tmp_path):
+    async def generate(zipcode, country, num_sessions):
+        return []
+
+    pool = CookieSessionPool(
+        country='USA',
+        zipcode='10001',
+        size=2,
+        cache=CookieJarCache(local_dir=str(tmp_path)),
+        generate=generate,
+    )
+
+    with pytest.raises(Exception, match='No cookie session'):
+        asyncio.run(pool.refill())
+
+
+def test_refill_keeps_sessions_left_when_generation_fails(tmp_path):
+    pool, generate = session_pool(tmp_path)
+    asyncio.run(pool.refill())
+    asyncio.run(pool.retire(pool.active[0]))
+
+    async def broken_generate(zipcode, country, num_sessions):
+        raise Exception('browser crashed')
+
+    pool.generate = broken_generate
+    asyncio.run(pool.refill())
+
+    assert [i.slot for i in pool.active] == [1, 2]
+
+    # the retired slot is generated again at the next refill
+    pool.generate = generate
+    asyncio.run(pool.refill())
+
+    assert [i.slot for i in pool.active] == [0, 1, 2]
+
+
+def test_refill_fails_when_generation_fails_without_session(tmp_path):
+    async def broken_generate(zipcode, country, num_sessions):
+        raise Exception('browser crashed')
+
+    pool, _ = session_pool(tmp_path, size=1)
+    pool.generate = broken_generate
+
+    with pytest.raises(Exception, match='No cookie session') as error:
+        asyncio.run(pool.refill())
+    assert str(error.value.__cause__) == 'browser crashed'
+
+
+def test_cache_is_written_out_of_the_event_loop(tmp_path):
+    pool, _ = session_pool(tmp_path, size=2)
+    threads = list()
+    for name in ['get', 'put', 'invalidate']:
+        method = getattr(pool.cache, name)
+
+        def record(*args, method=method, name=name):
+            threads.append((name, threading.current_thread()))
+            return method(*args)
+
+        setattr(pool.cache, name, record)
+
+    async def run():
+        await pool.refill()
+        await pool.retire(pool.next())
+
+    asyncio.run(run())
+
+    assert sorted({i for i, _ in threads}) == ['get', 'invalidate', 'put']
+    assert all(i is not threading.main_thread() for _, i in threads)
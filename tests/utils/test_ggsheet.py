@@ -0,0 +1,126 @@
+import time
+
+import pytest
+
+pytest.importorskip('pandas')
+gspread = pytest.importorskip('gspread')
+pytest.importorskip('gspread_dataframe')
+
+from scripts.utils import ggsheet  # noqa: E402
+from scripts.utils.ggsheet import GGSheetUtils, TokenBucket  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code: int) -> None:
+        self.status_code = status_code
+        self.text = ''
+
+    def json(self) -> dict:
+        return {
+            'error': {
+                'code': self.status_code,
+                'message': 'error',
+                'status': 'ERROR',
+            },
+        }
+
+
+def api_error(status_code: int) -> Exception:
+    return gspread.exceptions.APIError(FakeResponse(status_code))
+
+
+@pytest.fixture(autouse=True)
+def no_wait(monkeypatch):
+    monkeypatch.setattr(ggsheet._write_limiter, 'acquire', lambda: None)
+    monkeypatch.setattr(ggsheet.time, 'sleep', lambda seconds: None)
+
+
+def test_token_bucket_allows_burst_then_paces():
+    bucket = TokenBucket(rate=50, capacity=2)
+    start = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+
+    # 2 tokens of burst, then 2 tokens refilled at 50 per second
+    assert time.monotonic() - start >= 0.035
+
+
+def test_split_chunks_bounds_rows_and_bytes():
+    rows = [['a' * 10]] * 7
+
+    assert [
+        len(i) for i in GGSheetUtils._split_chunks(rows, chunk_rows=3)
+    ] == [3, 3, 1]
+    assert [
+        len(i) for i in GGSheetUtils._split_chunks(rows, chunk_bytes=40)
+    ] == [2, 2, 2, 1]
+    assert GGSheetUtils._chunk_row_offsets([[1, 2], [3], [4, 5]]) == [
+        0, 2, 3,
+    ]
+
+
+def test_retries_quota_errors():
+    utils = GGSheetUtils(user_creds={})
+    sent = []
+    errors = [api_error(429), api_error(503)]
+
+    def send_chunk(idx):
+        if idx == 1 and errors:
+            raise errors.pop(0)
+        sent.append(idx)
+
+    utils._run_chunks(3, send_chunk, ('s', 'Sheet1', 'A1'), 'h')
+
+    assert sent == [0, 1, 2]
+    assert utils.write_progress == {}
+
+
+def test_resumes_only_the_same_payload():
+    utils = GGSheetUtils(user_creds={})
+    key = ('s', 'Sheet1', 'A1')
+
+    def fail_at_2(idx):
+        if idx == 2:
+            raise api_error(429)
+
+    with pytest.raises(gspread.exceptions.APIError):
+        utils._run_chunks(4, fail_at_2, key, 'h1', max_retries=0)
+    assert utils.write_progress[key] == ('h1', 2)
+
+    sent = []
+    utils._run_chunks(4, sent.append, key, 'h2')
+    assert sent == [0, 1, 2, 3]
+
+    with pytest.raises(gspread.exceptions.APIError):
+        utils._run_chunks(4, fail_at_2, key, 'h1', max_retries=0)
+    sent = []
+    utils._run_chunks(4, sent.append, key, 'h1')
+    assert sent == [2, 3]
+    assert utils.write_progress == {}
+
+
+def test_drops_progress_on_errors_not_worth_resuming():
+    utils = GGSheetUtils(user_creds={})
+    key = ('s', 'Sheet1', 'A1')
+
+    def fail_at_1(idx):
+        if idx == 1:
+            raise api_error(400)
+
+    with pytest.raises(gspread.exceptions.APIError):
+        utils._run_chunks(3, fail_at_1, key, 'h')
+
+    assert utils.write_progress == {}
+
+
+def test_unkeyed_write_never_resumes():
+    utils = GGSheetUtils(user_creds={})
+
+    def fail_at_1(idx):
+        if idx == 1:
+            raise api_error(429)
+
+    with pytest.raises(gspread.exceptions.APIError):
+        utils._run_chunks(3, fail_at_1, max_retries=0)
+
+    assert utils.write_progress == {}
@@ -0,0 +1,74 @@
+import os
+
+from scripts.utils.minio_cache import LocalObjectCache
+
+
+def test_get_returns_put_content(tmp_path):
+    cache = LocalObjectCache(str(tmp_path))
+    cache.put('raw', 'a/b.json', '"etag1"', b'data')
+
+    assert cache.get('raw', 'a/b.json', '"etag1"') == b'data'
+    assert cache.get('raw', 'a/b.json', '"etag2"') is None
+    assert cache.get('raw', 'a/c.json', '"etag1"') is None
+
+
+def test_put_drops_older_versions(tmp_path):
+    cache = LocalObjectCache(str(tmp_path))
+    cache.put('raw', 'a.json', 'v1', b'old')
+    cache.put('raw', 'a.json', 'v2', b'new!')
+
+    assert cache.get('raw', 'a.json', 'v1') is None
+    assert cache.get('raw', 'a.json', 'v2') == b'new!'
+    assert cache.total_bytes == 4
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = LocalObjectCache(str(tmp_path), max_bytes=10)
+    cache.put('raw', 'a', 'v', b'aaaa')
+    cache.put('raw', 'b', 'v', b'bbbb')
+    # a is read after b was written, b becomes the oldest
+    cache.entries[cache._entry_path('raw', 'b', 'v')] = (0, 4)
+    cache.get('raw', 'a', 'v')
+    cache.put('raw', 'c', 'v', b'cccc')
+
+    assert cache.get('raw', 'a', 'v') == b'aaaa'
+    assert cache.get('raw', 'b', 'v') is None
+    assert cache.get('raw', 'c', 'v') == b'cccc'
+    assert cache.total_bytes == 8
+
+
+def test_skips_objects_bigger_than_the_cache(tmp_path):
+    cache = LocalObjectCache(str(tmp_path), max_bytes=3)
+    cache.put('raw', 'a', 'v', b'aaaa')
+
+    assert cache.get('raw', 'a', 'v') is None
+    assert cache.total_bytes == 0
+
+
+def test_hit_survives_concurrent_eviction(tmp_path, monkeypatch):
+    cache = LocalObjectCache(str(tmp_path))
+    cache.put('raw', 'a', 'v', b'aaaa')
+
+    def evicted(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, 'utime', evicted)
+
+    assert cache.get('raw', 'a', 'v') == b'aaaa'
+
+
+def test_reloads_entries_of_previous_process(tmp_path):
+    LocalObjectCache(str(tmp_path)).put('raw', 'a', 'v', b'aaaa')
+    cache = LocalObjectCache(str(tmp_path))
+
+    assert cache.total_bytes == 4
+    assert cache.get('raw', 'a', 'v') == b'aaaa'
+
+
+def test_clear(tmp_path):
+    cache = LocalObjectCache(str(tmp_path))
+    cache.put('raw', 'a', 'v', b'aaaa')
+    cache.clear()
+
+    assert cache.get('raw', 'a', 'v') is None
+    assert cache.total_bytes == 0